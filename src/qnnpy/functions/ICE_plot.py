@@ -14,12 +14,13 @@ controller
 
 import datetime
 import os
-import sys
 
 import numpy as np
 import scipy.io
 from matplotlib import pyplot as plt
 
+from qnnpy.functions.ice_archive import IceArchive, local_datetime64
+
 path = r"S:\SC\InstrumentLogging\Cryogenics\Ice\_copy_of_ice_log\Results"
 
 
@@ -27,39 +28,31 @@ path = r"S:\SC\InstrumentLogging\Cryogenics\Ice\_copy_of_ice_log\Results"
 """ Plot all TIME-TEMP data"""
 
 
-def date_plot(path, date_start, date_end=datetime.date.today().isoformat(), plot=None):
-    sys.path.append(path)
-    folder_list = os.listdir(path)
-    folder_list.sort()
+def date_plot(
+    path,
+    date_start,
+    date_end=datetime.date.today().isoformat(),
+    plot=None,
+    max_points=None,
+):
+    """
+    Time and T1-T4 of the days strictly between date_start and date_end
+    (YYYY-MM-DD), points with T1 >= 290 K are left out.
 
+    The logs are read through the memory mapped IceArchive, which converts
+    each daily log once. Returns x as local datetime64 and y as (n, 4) float32
+    arrays. max_points takes every n-th point for long ranges.
+    """
+    archive = IceArchive(path)
     ds = datetime.datetime.strptime(date_start, "%Y-%m-%d")
     de = datetime.datetime.strptime(date_end, "%Y-%m-%d")
-
-    """ Convert strings to dates for boolean condition """
-    date_list = [
-        datetime.datetime.strptime(folder_list[i], "%Y-%m-%d")
-        for i in range(len(folder_list))
-        if datetime.datetime.strptime(folder_list[i], "%Y-%m-%d") > ds
-        and datetime.datetime.strptime(folder_list[i], "%Y-%m-%d") < de
+    days = [
+        d for d in archive.days() if ds < datetime.datetime.strptime(d, "%Y-%m-%d") < de
     ]
-
-    """ Convert dates back to strings """
-    date_list_str = [d.strftime("%Y-%m-%d") for d in date_list]
-
-    x = []
-    y = []
-    for r in date_list_str:
-        new_path = os.path.join(path, r, r + ".log")
-        f = open(new_path)
-        lines = f.readlines()
-        for line in lines:
-            cells = line.split(",")
-            date = datetime.datetime.strptime(cells[3], "%m/%d/%Y %I:%M:%S %p")
-            data = [float(cells[4]), float(cells[5]), float(cells[6]), float(cells[7])]
-
-            if data[0] < 290:
-                x.append(date)
-                y.append(data)
+    epoch, y = archive.query(days=days, max_points=max_points)
+    keep = y[:, 0] < 290
+    x = local_datetime64(epoch[keep])
+    y = y[keep]
     if plot:
         plt.plot(x, y, marker="o", ls="None")
         plt.legend(["Sensor 1", "Sensor 2", "Sensor 3", "Sensor 4"], loc="upper right")
@@ -79,19 +72,17 @@ def save_cycle(x, y):
     """
 
     """ Extract START-END points of temperature sweeps """
-    time_diff_index = []
-    dx = np.diff(x)
-    for t in range(len(np.diff(x))):
-        td = dx[t].total_seconds()
-        if td > 10000:  # finds when the log was off.
-            time_diff_index.append(t)
-            print(x[t])
+    x = np.asarray(x, dtype="datetime64[s]")
+    y = np.asarray(y, dtype=np.float64)
+    # finds when the log was off
+    time_diff_index = np.flatnonzero(np.diff(x) > np.timedelta64(10000, "s"))
+    for t in time_diff_index:
+        print(x[t])
 
     """ Filter lists such that each sweep has High temp and Low temp"""
     trace_list = []
     for i in range(len(time_diff_index) - 1):
-        temp = y[time_diff_index[i] + 1 : time_diff_index[i + 1] + 1]
-        temp_array = np.asarray(temp, dtype=np.float64)
+        temp_array = y[time_diff_index[i] + 1 : time_diff_index[i + 1] + 1]
         if (
             temp_array[0, 0] > 150
             and temp_array[-1, 0] > 150
@@ -101,12 +92,8 @@ def save_cycle(x, y):
 
     """ Plot Sweeps """
     for i in trace_list:
-        time = np.asarray(
-            x[time_diff_index[i] + 1 : time_diff_index[i + 1]], dtype=np.datetime64
-        )
-        temp = np.asarray(
-            y[time_diff_index[i] + 1 : time_diff_index[i + 1]], dtype=np.float64
-        )
+        time = x[time_diff_index[i] + 1 : time_diff_index[i + 1]]
+        temp = y[time_diff_index[i] + 1 : time_diff_index[i + 1]]
         time_str = str(time[0])[0:10]
         network_path = r"S:\SC\InstrumentLogging\Cryogenics\Ice"
         file_name = os.path.join(network_path, time_str)
@@ -0,0 +1,320 @@
+"""Hardware-free benchmark of the measurement classes.
+
+    python -m qnnpy.functions.benchmark
+    python -m qnnpy.functions.benchmark --json new.json --compare old.json
+
+Every case runs a measurement class end to end on the simulated instruments
+(qnnpy.instruments.simulated) with the instrument latency and all sleeps in
+qnnpy switched off, so the wall time is qnnpy's own software overhead.  The
+sleeps and instrument time the same run would take on hardware are added up
+separately and reported as the projected run time.  Peak memory is measured
+in a second run under tracemalloc.
+
+With --compare, cases whose overhead per point grew by more than --tolerance
+against an earlier --json output are listed and the exit status is 1.
+
+tests/test_benchmark.py runs every case on a few points with pytest.
+
+    python -m qnnpy.functions.benchmark --imports
+
+times `import qnnpy.functions.functions` in a fresh interpreter with
+python -X importtime and exits with 1 if it takes longer than --import-budget
+ms or loads one of heavy_modules, which are only imported when used.
+tests/test_benchmark.py checks the same budget.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+from qnnpy.instruments import simulated
+
+
+def base_properties(save_root):
+    return {
+        "User": {"name": "benchmark"},
+        "Save File": {
+            "sample name": "SIM001",
+            "device name": "benchmark",
+            "device type": "snspd",
+        },
+        "Save Root": save_root,
+        "Simulation": {"time_scale": 0, "seed": 0},
+        "Source": {"name": "SIM928", "port": "SIM::SIM928", "port_alt": 1},
+        "Meter": {"name": "Keithley2700", "port": "SIM::Keithley2700"},
+    }
+
+
+def iv_sweep(points):
+    properties = {
+        "iv_sweep": {
+            "start": 0,
+            "stop": 15e-6,
+            "steps": points // 4,
+            "sweep": 1,
+            "full_sweep": True,
+            "series_resistance": 10e3,
+        }
+    }
+
+    def run(measurement):
+        measurement.run_sweep_fixed()
+        return len(measurement.v_read)
+
+    return "IvSweep", properties, run
+
+
+def photon_counts(points):
+    properties = {
+        "Counter": {
+            "name": "Keysight53230a",
+            "port": "SIM::Keysight53230a",
+            "impedance": 0,
+            "coupling": "DC",
+        },
+        "Attenuator": {"name": "JDSHA9", "port": "SIM::JDSHA9"},
+        "Laser": {"wavelength_nm": 1550},
+        "iv_sweep": {"series_resistance": 10e3},
+        "photon_counts": {
+            "start": 1e-6,
+            "stop": 9.5e-6,
+            "step": 8.5e-6 / (points // 2),
+            "trigger_v": 0.05,
+            "counting_time": 0.1,
+            "iterations": 10,
+            "attenuation_db": 30,
+        },
+    }
+
+    def run(measurement):
+        measurement.dark_counts()
+        measurement.light_counts()
+        return len(measurement.DCR) + len(measurement.LCR)
+
+    return "PhotonCounts", properties, run
+
+
+def pulse_trace_segments(points):
+    properties = {
+        "Scope": {"name": "LeCroy620Zi", "port": "SIM::LeCroy620Zi", "channel": "C1"},
+        "pulse_trace": {
+            "channel": ["C1", "C2"],
+            "trigger_level": 0.05,
+            "number_of_traces": points,
+            "bias_voltage": 0.08,
+            "attenuation": 100,
+        },
+    }
+
+    def run(measurement):
+        data = measurement.trace_data()
+        return data["C1y"].shape[0]
+
+    return "PulseTraceSegments", properties, run
+
+
+cases = {
+    "iv_sweep": ("IvSweep", iv_sweep, 400),
+    "photon_counts": ("PhotonCounts", photon_counts, 100),
+    "pulse_trace_segments": ("PulseTraceSegments", pulse_trace_segments, 5000),
+}
+
+
+@contextlib.contextmanager
+def no_sleep():
+    """Replaces time.sleep, also where qnnpy modules imported it by name,
+    and adds up the time asked for"""
+    original = time.sleep
+    requested = [0.0]
+
+    def sleep(seconds):
+        requested[0] += seconds
+
+    patched = [
+        module
+        for name, module in list(sys.modules.items())
+        if name.startswith("qnnpy.") and getattr(module, "sleep", None) is original
+    ]
+    time.sleep = sleep
+    for module in patched:
+        module.sleep = sleep
+    try:
+        yield requested
+    finally:
+        time.sleep = original
+        for module in patched:
+            module.sleep = original
+
+
+def run_case(name, points, latency=1e-3, memory=True):
+    """Runs one case and returns its figures, see the module docstring"""
+    import qnnpy.functions.snspd as snspd
+
+    class_name, build, default_points = cases[name]
+    class_name, properties, run = build(points or default_points)
+    with tempfile.TemporaryDirectory() as save_root:
+        properties = dict(base_properties(save_root), **properties)
+        properties["Simulation"]["latency"] = latency
+        config = os.path.join(save_root, "benchmark.yaml")
+        with open(config, "w") as f:
+            yaml.dump(properties, f)
+
+        def measure():
+            with contextlib.redirect_stdout(io.StringIO()), no_sleep() as slept:
+                measurement = getattr(snspd, class_name)(config)
+                simulated.device().reset_stats()
+                start = time.perf_counter()
+                n = run(measurement)
+                elapsed = time.perf_counter() - start
+            return measurement, n, elapsed, slept[0]
+
+        measurement, n, elapsed, slept = measure()
+        stats = dict(simulated.device().stats)
+        result = {
+            "class": class_name,
+            "points": n,
+            "overhead_s": elapsed,
+            "overhead_per_point_ms": elapsed / n * 1e3,
+            "points_per_s": n / elapsed,
+            "transactions": stats["transactions"],
+            "bytes": stats["bytes"],
+            "sleep_s": slept,
+            "instrument_s": stats["instrument_time"],
+            "projected_s": elapsed + slept + stats["instrument_time"],
+        }
+        if memory:
+            tracemalloc.start()
+            try:
+                measure()
+                result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+            finally:
+                tracemalloc.stop()
+    return result
+
+
+# modules that importing qnnpy.functions.functions must not load
+heavy_modules = ("mariadb", "matplotlib.pyplot", "scipy.io", "yaml", "win32com")
+
+
+def import_time(module="qnnpy.functions.functions"):
+    """Imports module in a fresh interpreter and returns the cumulative import
+    time in ms and the names of all modules it loaded"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    loaded = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            loaded[name.strip()] = int(cumulative) / 1e3
+    return loaded.get(module, 0.0), set(loaded)
+
+
+def check_imports(budget_ms=500, module="qnnpy.functions.functions"):
+    """Prints the import time of module and returns the problems found"""
+    elapsed, loaded = import_time(module)
+    problems = ["%s loaded" % name for name in heavy_modules if name in loaded]
+    print("import %s: %.0f ms, %d modules" % (module, elapsed, len(loaded)))
+    if elapsed > budget_ms:
+        problems.append("%.0f ms > %.0f ms budget" % (elapsed, budget_ms))
+    return problems
+
+
+def report(results, baseline=None, tolerance=0.25):
+    """Prints the results table and returns the names of the cases that got
+    slower than baseline by more than tolerance"""
+    columns = [
+        ("points", "%8d"),
+        ("overhead_per_point_ms", "%10.3f"),
+        ("points_per_s", "%10.0f"),
+        ("transactions", "%8d"),
+        ("peak_memory_mb", "%8.1f"),
+        ("sleep_s", "%9.1f"),
+        ("instrument_s", "%9.1f"),
+        ("projected_s", "%9.1f"),
+    ]
+    header = ("points", "ms/point", "points/s", "VISA tx", "peak MB", "sleep s")
+    header += ("instr s", "proj. s")
+    print(
+        "%-22s" % "case"
+        + "".join(" %*s" % (len(fmt % 0), h) for (_, fmt), h in zip(columns, header))
+    )
+    regressions = []
+    for name, result in results.items():
+        line = "%-22s" % name
+        for key, fmt in columns:
+            line += " " + (
+                fmt % result[key] if key in result else "%*s" % (len(fmt % 0), "-")
+            )
+        if baseline and name in baseline:
+            before = baseline[name]["overhead_per_point_ms"]
+            change = result["overhead_per_point_ms"] / before - 1
+            line += "  %+5.0f%%" % (100 * change)
+            if change > tolerance:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cases", nargs="*", help=", ".join(cases) + " (default all)")
+    parser.add_argument("--points", type=int, help="points per case")
+    parser.add_argument(
+        "--latency", type=float, default=1e-3, help="simulated s per transaction"
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results of an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--imports", action="store_true", help="only check the import time"
+    )
+    parser.add_argument("--import-budget", type=float, default=500, help="ms")
+    args = parser.parse_args(argv)
+    if args.imports:
+        problems = check_imports(args.import_budget)
+        if problems:
+            print("Import too heavy: " + ", ".join(problems))
+            return 1
+        return 0
+    for name in args.cases:
+        if name not in cases:
+            parser.error("unknown case %s" % name)
+
+    results = {}
+    for name in args.cases or cases:
+        results[name] = run_case(
+            name, args.points, latency=args.latency, memory=not args.no_memory
+        )
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline, args.tolerance)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1, default=float)
+    if regressions:
+        print("Slower than %s: %s" % (args.compare, ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Loading and checking of the .yaml measurement configuration files"""
+
+import os
+import re
+
+import yaml
+
+
+def load_config(filename=None):
+    """Load config accepts the full name of a .yaml file. The sample name is
+    check for correct format (XXX123).
+    If verified, the file is loaded and the parameters are returned.
+    """
+    # Check if there is a file
+    parameters = {}
+    if filename is None:
+        raise ValueError("Please enter filename")
+
+    # Open file
+    with open(filename) as f:
+        parameters = yaml.load(f, Loader=yaml.FullLoader)
+
+    if parameters.get("Save File"):
+        if parameters.get("Save File").get("sample name"):
+            sample_name = parameters["Save File"]["sample name"]
+            check_sample_name(sample_name)
+        elif parameters.get("Save File").get("sample name 1"):
+            for i in range(5):
+                if parameters["Save File"].get(f"sample name {i+1}") is None:
+                    break
+                check_sample_name(parameters["Save File"][f"sample name {i+1}"])
+
+    # No longer accepting path location. FIXED PATH TO NETWORK
+    #    file_path=parameters['Save File']['filepath']
+    #    check_file_path(file_path)
+
+    return parameters
+
+
+def check_sample_name(sample_name):
+    """The sample name is required to match the XXX123 format."""
+    result = re.match("^[A-Z]{3}[0-9]{3}$", sample_name)
+    if not result:
+        from qnnpy.functions.saving import lablog_error
+
+        lablog_error('Invalid Sample Name. Name entered: "%s"' % sample_name)
+        raise NameError("Invalid Sample Name. String must match XXX###")
+
+
+def check_file_path(file_path):
+    if not os.path.exists(file_path):
+        try:
+            os.makedirs(file_path)
+        except Exception:
+            from qnnpy.functions.saving import lablog_error
+
+            lablog_error('Invalid Path. Path entered: "%s"' % file_path)
+            raise NameError("Invalid Path")
@@ -0,0 +1,545 @@
+"""Logging to the qnndb MariaDB database"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import mariadb
+import numpy as np
+import yaml
+from mariadb import Connection
+
+
+def insert_measurement_event(
+    user, meas_type, sample_name, device_type, device_id, port=1
+):
+    """Logs a measurement to the measurement_events table and flushes it right away"""
+    logger = database_logger()
+    logger.log(
+        "measurement_events",
+        user=user,
+        meas_type=meas_type,
+        sample_name=sample_name,
+        device_type=device_type,
+        device_id=device_id,
+        port=port,
+    )
+    if not logger.flush():
+        raise ConnectionError("measurement event is buffered, database unreachable")
+
+
+database_config_cache = None
+
+
+def database_config() -> dict:
+    """Connection parameters from mariadb_conn.yml on the S: drive, only read once"""
+    global database_config_cache
+    if database_config_cache is None:
+        with open(r"S:\SC\mariadb_conn.yml") as f:
+            database_config_cache = yaml.load(f, Loader=yaml.FullLoader)
+    return database_config_cache
+
+
+def database_connection(**kwargs) -> Connection:
+    if kwargs is None or len(kwargs) == 0:
+        try:
+            conn = mariadb.connect(**database_config())
+        except mariadb.Error as e:
+            print(f"Error connecting to MariaDB Platform: {e}")
+            raise ConnectionError
+    else:
+        try:
+            conn: Connection = mariadb.connect(**kwargs)
+        except mariadb.Error as e:
+            print(f"Error connecting to MariaDB Platform: {e}")
+            raise ConnectionError
+    return conn
+
+
+def check_sql_name(name: str) -> str:
+    """Table and column names can't be sent as parameters, so only allow plain identifiers"""
+    if not re.match(r"^[A-Za-z0-9_]+$", str(name)):
+        raise ValueError(f"Invalid database table or column name: {name!r}")
+    return name
+
+
+# errors about the rows themselves, not the connection
+data_errors = (mariadb.DataError, mariadb.IntegrityError, mariadb.ProgrammingError)
+
+
+class DatabaseLogger:
+    """
+    Pooled, batched writer for the lab database.
+
+    Rows passed to log() are buffered and written with one parameterized
+    executemany() per table once batch_size rows are waiting or
+    flush_interval seconds have passed (checked by a background thread).
+    Connections come from a mariadb.ConnectionPool built from the cached
+    database_config() parameters, or from the connection passed in.
+    If a flush fails the connection is dropped and re-opened once; rows
+    that still can't be written stay buffered (up to max_buffer rows) and
+    are retried on the next flush.
+
+    Parameters
+    ----------
+    connection : mariadb.Connection, optional
+        use this connection instead of the shared pool. It is not closed by close().
+    batch_size : int, optional
+        number of buffered rows that triggers a flush. The default is 100.
+    flush_interval : float, optional
+        maximum time (s) a row waits in the buffer. 0 disables the timer. The default is 10.
+    commit_interval : float, optional
+        minimum time (s) between commits, 0 commits after every flush. The default is 0.
+        rows sent but not yet committed are lost if the connection drops.
+    max_buffer : int, optional
+        maximum number of rows kept while the database is unreachable,
+        the oldest rows are dropped after that. The default is 100000.
+    pool_size : int, optional
+        size of the connection pool. The default is 2.
+    spill_file : str, optional
+        local file the buffered rows are appended to (one JSON row per line)
+        when a flush fails, instead of keeping them in memory. They are
+        written to the database, oldest first, on the next successful flush.
+        Rows the database rejects go to spill_file + ".rejected".
+        The default is None, rows stay buffered up to max_buffer.
+    ignore_duplicates : bool, optional
+        write with INSERT IGNORE, so rows that are already in the table (same
+        unique key) are skipped instead of failing the whole flush, ie: log
+        file rows imported again after a crash. The default is False.
+    """
+
+    pool = None
+
+    def __init__(
+        self,
+        connection=None,
+        batch_size: int = 100,
+        flush_interval: float = 10,
+        commit_interval: float = 0,
+        max_buffer: int = 100000,
+        pool_size: int = 2,
+        spill_file: str = None,
+        ignore_duplicates: bool = False,
+    ):
+        self.external_connection = connection
+        self.connection = connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.commit_interval = commit_interval
+        self.max_buffer = max_buffer
+        self.pool_size = pool_size
+        self.spill_file = spill_file
+        self.ignore_duplicates = ignore_duplicates
+        # buffer: dict[(table, columns), list[tuple]]
+        self.buffer = {}
+        self.num_buffered = 0
+        self.uncommitted = False
+        self.last_commit = time.time()
+        self.lock = threading.RLock()
+        self.closed = threading.Event()
+        self.thread = None
+        if flush_interval > 0:
+            self.thread = threading.Thread(
+                target=self._run, name="qnnpy-db-logger", daemon=True
+            )
+            self.thread.start()
+
+    def _run(self):
+        while not self.closed.wait(self.flush_interval):
+            self.flush()
+
+    def _connect(self):
+        if self.external_connection is not None:
+            if self.connection is None:
+                self.external_connection.reconnect()
+                self.connection = self.external_connection
+            return self.connection
+        if self.connection is None:
+            if DatabaseLogger.pool is None:
+                DatabaseLogger.pool = mariadb.ConnectionPool(
+                    pool_name="qnnpy", pool_size=self.pool_size, **database_config()
+                )
+            self.connection = DatabaseLogger.pool.get_connection()
+        return self.connection
+
+    def _disconnect(self):
+        if self.external_connection is None:
+            try:
+                # returns the connection to the pool
+                self.connection.close()
+            except Exception:
+                pass
+        # the caller's connection stays open, _connect reconnects it
+        self.connection = None
+
+    def _trim(self):
+        """drops the oldest rows while more than max_buffer are buffered"""
+        while self.num_buffered > self.max_buffer:
+            oldest_key = next(iter(self.buffer))
+            oldest = self.buffer[oldest_key]
+            dropped = min(len(oldest), self.num_buffered - self.max_buffer)
+            del oldest[:dropped]
+            if not oldest:
+                del self.buffer[oldest_key]
+            self.num_buffered -= dropped
+            logging.warning(f"database buffer full, dropping {dropped} oldest rows")
+
+    def log(self, table_name: str, **kwargs) -> bool:
+        """
+        buffers one row, ie: log('probe_station_logging', sample_stage=4.2)
+        returns False if this filled the batch and the flush failed.
+        """
+        key = (check_sql_name(table_name), tuple(check_sql_name(k) for k in kwargs))
+        row = tuple(
+            v.item() if isinstance(v, np.generic) else v for v in kwargs.values()
+        )
+        with self.lock:
+            self.buffer.setdefault(key, []).append(row)
+            self.num_buffered += 1
+            self._trim()
+            if self.num_buffered >= self.batch_size:
+                return self.flush()
+        return True
+
+    def log_rows(self, table_name: str, columns, rows) -> bool:
+        """
+        buffers many rows with the same columns at once, ie: rows read from a
+        log file. rows is a list of tuples in the order of columns.
+        returns False if this filled the batch and the flush failed.
+        """
+        key = (check_sql_name(table_name), tuple(check_sql_name(c) for c in columns))
+        with self.lock:
+            self.buffer.setdefault(key, []).extend(rows)
+            self.num_buffered += len(rows)
+            self._trim()
+            if self.num_buffered >= self.batch_size:
+                return self.flush()
+        return True
+
+    def insert_command(self, table_name, columns) -> str:
+        return "INSERT %sINTO `%s` (%s) VALUES (%s)" % (
+            "IGNORE " if self.ignore_duplicates else "",
+            table_name,
+            ", ".join(f"`{c}`" for c in columns),
+            ", ".join("?" * len(columns)),
+        )
+
+    def _write(self, row_by_row=False):
+        """
+        sends the buffer. row_by_row inserts one row at a time and drops the
+        rows the database rejects instead of failing the whole batch.
+        """
+        conn = self._connect()
+        cur = conn.cursor()
+        written = []
+        for key, rows in self.buffer.items():
+            table_name, columns = key
+            command = self.insert_command(table_name, columns)
+            if row_by_row:
+                for row in rows:
+                    try:
+                        cur.execute(command, row)
+                    except data_errors as e:
+                        logging.error(f"database rejected {table_name} {row} ({e})")
+            else:
+                cur.executemany(command, rows)
+            written.append(key)
+        if time.time() - self.last_commit >= self.commit_interval:
+            conn.commit()
+            self.uncommitted = False
+            self.last_commit = time.time()
+        else:
+            self.uncommitted = True
+        # only forget rows once they are sent, so a failed flush retries them
+        for key in written:
+            self.num_buffered -= len(self.buffer.pop(key))
+        cur.close()
+
+    def flush(self) -> bool:
+        """
+        writes every buffered row.
+
+        Returns
+        -------
+        bool
+            True if the buffer was written, False if the rows are still buffered.
+        """
+        with self.lock:
+            spilled = self.spill_file is not None and os.path.exists(self.spill_file)
+            if self.num_buffered == 0 and not self.uncommitted and not spilled:
+                return True
+            rejected = False
+            for attempt in range(2):
+                try:
+                    if spilled:
+                        self._replay()
+                        spilled = False
+                    self._write(row_by_row=rejected)
+                    return True
+                except data_errors as e:
+                    # the database is up but refuses a row, retrying the same
+                    # batch fails again: let _replay sort out the bad rows, or
+                    # without a spill file retry row by row and drop them
+                    logging.error(f"database rejected rows ({e})")
+                    self._rollback()
+                    if self.spill_file is None:
+                        rejected = True
+                    else:
+                        self._spill()
+                        spilled = True
+                except (mariadb.Error, ConnectionError, OSError) as e:
+                    logging.error(f"database flush failed ({e}), reconnecting")
+                    self._disconnect()
+                    self.uncommitted = False
+            if self.spill_file is not None:
+                self._spill()
+            return False
+
+    def _rollback(self):
+        try:
+            self.connection.rollback()
+        except Exception:
+            self._disconnect()
+        self.uncommitted = False
+
+    def _append(self, file_name, groups, error=None):
+        """appends rows, {(table, columns): [row, ...]}, as JSON lines"""
+        with open(file_name, "a") as f:
+            for (table_name, columns), rows in groups.items():
+                for row in rows:
+                    line = {"table": table_name, "columns": columns, "row": row}
+                    if error is not None:
+                        line["error"] = error
+                    f.write(json.dumps(line, default=str) + "\n")
+
+    def _spill(self):
+        """appends the buffered rows to the spill file and forgets them"""
+        try:
+            self._append(self.spill_file, self.buffer)
+        except OSError as e:
+            logging.error(f"could not write {self.spill_file} ({e})")
+            return
+        logging.warning(f"database unreachable, {self.num_buffered} rows spilled")
+        self.buffer = {}
+        self.num_buffered = 0
+
+    def _replay(self):
+        """
+        writes the rows of the spill file one table at a time, then removes
+        it. Rows the database rejects (bad value, changed table, duplicate
+        key) are moved to spill_file + ".rejected" so they don't block the
+        others. If the connection drops, the tables not written yet are kept
+        in the spill file.
+        """
+        spilled = {}
+        with open(self.spill_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:  # cut off by a crash while spilling
+                    continue
+                key = (entry["table"], tuple(entry["columns"]))
+                spilled.setdefault(key, []).append(tuple(entry["row"]))
+        written = 0
+        rejected = 0
+        conn = self._connect()
+        cur = conn.cursor()
+        try:
+            for key in list(spilled):
+                table_name, columns = key
+                command = self.insert_command(table_name, columns)
+                rows = spilled[key]
+                try:
+                    cur.executemany(command, rows)
+                except data_errors:
+                    conn.rollback()
+                    good = []
+                    for row in rows:
+                        try:
+                            cur.execute(command, row)
+                            good.append(row)
+                        except data_errors as e:
+                            self._append(
+                                self.spill_file + ".rejected", {key: [row]}, str(e)
+                            )
+                            rejected += 1
+                    rows = good
+                conn.commit()
+                written += len(rows)
+                del spilled[key]
+        except BaseException:
+            # keep only the tables that were not committed
+            temp = self.spill_file + ".tmp"
+            if os.path.exists(temp):
+                os.remove(temp)
+            self._append(temp, spilled)
+            os.replace(temp, self.spill_file)
+            raise
+        finally:
+            cur.close()
+        os.remove(self.spill_file)
+        logging.info(f"wrote {written} spilled rows")
+        if rejected:
+            logging.error(
+                f"{rejected} spilled rows rejected, see {self.spill_file}.rejected"
+            )
+
+    def close(self):
+        """flushes and releases the connection"""
+        self.closed.set()
+        self.flush()
+        if self.external_connection is None and self.connection is not None:
+            self._disconnect()
+
+
+database_logger_instance = None
+
+
+def database_logger() -> DatabaseLogger:
+    """Returns the shared DatabaseLogger used by log_data_to_database"""
+    global database_logger_instance
+    if database_logger_instance is None:
+        database_logger_instance = DatabaseLogger()
+        atexit.register(database_logger_instance.close)
+    return database_logger_instance
+
+
+def log_data_to_database(table_name: str, connection=None, **kwargs):
+    """
+    Logs one row to table_name. Without a connection the row goes to the
+    shared DatabaseLogger and is written in a batch (see DatabaseLogger).
+    With a connection the row is inserted and committed right away.
+    """
+    if connection is None:
+        database_logger().log(table_name, **kwargs)
+        return
+    columns = [check_sql_name(k) for k in kwargs]
+    command = "INSERT INTO `%s` (%s) VALUES (%s)" % (
+        check_sql_name(table_name),
+        ", ".join(f"`{c}`" for c in columns),
+        ", ".join("?" * len(columns)),
+    )
+    cur = connection.cursor()
+    cur.execute(
+        command,
+        tuple(v.item() if isinstance(v, np.generic) else v for v in kwargs.values()),
+    )
+    connection.commit()
+
+
+def update_table(
+    table_name: str, set_col: str, conditional: str = "NULL", connection=None
+):
+    """
+
+    Parameters
+    ----------
+    table_name : str
+        name of table to update.
+    set_col : str
+        SET sql command, for example set_col = 'thickness=0, tc=0'.
+    conditional : str
+        WHERE sql command, arguments without '=' will simpily get matched using '=' operator to columns in set_col.
+        to update an entire column without conditional, 'ALL'
+    connection : TYPE, optional
+        connection to database. The default is qnndb database.
+    Returns
+    -------
+    None.
+
+    """
+    if connection is None:
+        connection = database_connection()
+    command: str = "UPDATE %s SET %s" % (table_name, insert_quotes(set_col))
+    if not conditional == "ALL":
+        conditional = insert_quotes(conditional)
+        command += " WHERE "
+        conditional_operators: list[str] = [
+            "=",
+            ">",
+            "<",
+            ">=",
+            "<=",
+            "!=",
+            "BETWEEN",
+            "LIKE",
+            "IN",
+        ]
+        if any(op in conditional for op in conditional_operators):
+            command += conditional
+        else:
+            cols: list[str] = get_column_names(set_col)
+            vals: list[str] = conditional.split(",")
+            for c, v in zip(cols, vals):
+                command += f"{c}={v.strip()}, "
+            command = command.rstrip(", ")
+    cur = connection.cursor()
+    print(command)
+    cur.execute(command)
+    connection.commit()
+    connection.close()
+
+
+def get_column_names(string: str):
+    """
+    Helper method for update_table to get the column names when an input is formatted as 'col=val, col2=val2, col3=val3' etc
+    Parameters
+    ----------
+    string : str
+        sql command formatted as 'column=value, column=value...'
+
+    Returns
+    -------
+    list of column names
+    """
+    res = []
+    builder = ""
+    build = True
+    for c in string:
+        if c == "=":
+            res.append(builder)
+            builder = ""
+            build = False
+        elif build:
+            if not c.isspace():
+                builder += c
+        elif c == ",":
+            build = True
+    return res
+
+
+def insert_quotes(string: str) -> str:
+    res: str = ""
+    i: int = 0
+    while i < len(string):
+        c = string[i]
+        res += c
+        if c == "=":
+            is_string = False
+            builder = ""
+            end: int = i
+            for j in range(i + 1, len(string)):
+                end = j
+                if string[j] == "," or (is_string and string[j] == " "):
+                    end = j - 1
+                    break
+                if not (
+                    string[j].isnumeric()
+                    or string[j] == "."
+                    or string[j] == "-"
+                    or string[j].isspace()
+                ):
+                    is_string = True
+                builder += string[j]
+            builder = builder.strip()
+            if not is_string or builder.upper() == "NULL":
+                res += builder
+            else:
+                res += f"'{builder}'"
+            i = end
+        i += 1
+    return res
@@ -6,896 +6,343 @@ Created on Thu May  7 10:16:58 2020
 """
 
 import csv
-import datetime as dt
-import logging
 import os
-import re
-import sys
+import threading
 import time
 from datetime import datetime
-from enum import Enum
 from time import sleep
 from typing import List
 
-import mariadb
 import numpy as np
-import scipy.io
-import yaml
-from mariadb import Connection
-from matplotlib import pyplot as plt
 
-if sys.platform == "win32":
-    import win32com.client
-
-###############################################################################
-# Plotting
-###############################################################################
-
-
-class LogLevel(Enum):
-    all_logs = 0
-    debugging = 1
-    warn = 2
-    error = 3
-    silent = 4
-
-
-def plot(
-    xdata,
-    ydata,
-    x_scale="linear",
-    y_scale="linear",
-    title="",
-    xlabel="",
-    ylabel="",
-    label="",
-    linestyle="o",
-    path="",
-    close=True,
-    show=True,
-):
-    """
-    update to using **kwargs https://book.pythontips.com/en/latest/args_and_kwargs.html
-
-    accepts arrays or lists of arrays. Scale is the same as plt.xscale().
-    If path is specified the figure will be saved to that location.
-    Close and Show are true by default.
-
-    """
-
-    if close:
-        plt.close()
-
-    if isinstance(ydata, list) and not isinstance(xdata, list):
-        if label:
-            for i in np.arange(0, len(ydata), 1):
-                plt.plot(xdata, ydata[i], linestyle, label=label[i])
-        else:
-            for i in np.arange(0, len(ydata), 1):
-                plt.plot(xdata, ydata[i], linestyle)
-
-    elif isinstance(ydata, list) and isinstance(xdata, list):
-        if label:
-            for i in np.arange(0, len(ydata), 1):
-                plt.plot(xdata[i], ydata[i], linestyle, label=label[i])
-        else:
-            for i in np.arange(0, len(ydata), 1):
-                plt.plot(xdata[i], ydata[i], linestyle)
-    else:
-        plt.plot(xdata, ydata, linestyle)
-
-    plt.xscale(x_scale)
-    plt.yscale(y_scale)
-
-    if xlabel:
-        plt.xlabel(xlabel)
-    if ylabel:
-        plt.ylabel(ylabel)
-    if title:
-        plt.title(title)
-    if label:
-        plt.legend()
-    if not path == "":
-        if isinstance(path, tuple):
-            path = path[0]
-        plt.savefig(path + ".png", bbox_inches="tight")
-        print("File Saved:\n %s" % path)
-    if show:  # show should always be after save
-        plt.show()
-    return plt
-
-
-def plot_new(x, y, **kwargs):
-    plt.plot(x, y)
-    for key, value in kwargs.items():
-        plt.__dict__[key](value)
-
-    return plt
-
-
-# Requires IPython for interactive shell
-class LivePlotter:
-    """
-    Automatically updating plotter
-    Requires IPython to be enabled for interactive shell
-    Simpily call plot(x, y) and the plot will add your points live
-    Once you're done, you can save by calling save()
-    """
-
-    # data: dict[str, (list[float],list[float],list[float])]
-    data: dict
-
-    # __subplots: dict[str, plt.Subplot]
-    def __init__(
-        self,
-        *,
-        title: str = "",
-        xlabel: str = "",
-        ylabel: str = "",
-        legend: bool = False,
-        legend_loc: str = "best",
-        max_len: int = -1,
-    ):
-        self.data = {}
-        if not plt.isinteractive():
-            plt.ion()
-        self.fig, self.ax = plt.subplots()
-        # self.__subplots = {}
-        # self.start_time: float = 0
-        plt.title(title)
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
-        self.show_legend: bool = legend
-        self.legend_loc: str = legend_loc
-        self.max_len = max_len
-        self.def_col_idx = 0
-        self.colors = ["r", "g", "b", "c", "m", "y", "k"]
-        # plt.xlim(0,1)
-        # plt.ylim(0,1)
-        plt.draw()
-
-    def plot(
-        self,
-        x: float,
-        y: float,
-        label: str = "",
-        *,
-        linestyle="solid",
-        color=None,
-        marker="o",
-        linewidth=3,
-        markercolor=None,
-    ):
-        # if self.start_time == 0:
-        # self.start_time = time.time()
-        if markercolor is None:
-            markercolor = color
-        if self.data.get(label) is None:
-            self.data[label] = ([x], [y], self.colors[self.def_col_idx])
-            self.def_col_idx += 1
-            # self.data[label]=([x],[y],[time.time()-self.start_time])
-        else:
-            self.data[label][0].append(x)
-            self.data[label][1].append(y)
-            if color is None:
-                color = self.data[label][2]
-            if self.max_len > 1 and len(self.data[label][0]) > self.max_len:
-                self.data[label][0].pop(0)
-                self.data[label][1].pop(0)
-            # self.data[label][2].append(time.time()-self.start_time)
-        if len(self.ax.lines) >= len(self.data):
-            self.ax.lines.pop(0)  # beware memory leaks and other shenanagins
-        self.ax.plot(
-            self.data[label][0],
-            self.data[label][1],
-            label=label,
-            linestyle=linestyle,
-            color=color,
-            marker=marker,
-            linewidth=linewidth,
-            markerfacecolor=markercolor,
-            markeredgecolor=markercolor,
-        )
-        self.fig.canvas.draw_idle()
-        self.fig.canvas.flush_events()
-        if self.show_legend:
-            self.ax.legend(loc=self.legend_loc)
-
-    def save(self, path: str = None, name: str = None, file_type: str = "jpg"):
-        if path is not None:
-            if "." in path:
-                temp = path.rsplit(os.sep, 1)
-                path = temp[0]
-                if name is None:
-                    name = temp[1]
-            if not os.path.exists(path):
-                os.makedirs(path)
-            sys.path.append(path)
-        if name is None:
-            name: str = time.strftime(
-                f"plot_%Y-%m-%d_%H-%M-%S.{file_type}", time.gmtime()
-            )
-        elif "." not in name:
-            name = f"{name}.{file_type}"
-        self.fig.savefig(f"{path}{os.sep}{name}")
-
-
-###############################################################################
-# Configuration
-###############################################################################
-
-
-def load_config(filename=None):
-    """Load config accepts the full name of a .yaml file. The sample name is
-    check for correct format (XXX123).
-    If verified, the file is loaded and the parameters are returned.
-    """
-    # Check if there is a file
-    parameters = {}
-    if filename is None:
-        raise ValueError("Please enter filename")
-
-    # Open file
-    with open(filename) as f:
-        parameters = yaml.load(f, Loader=yaml.FullLoader)
-
-    if parameters.get("Save File"):
-        if parameters.get("Save File").get("sample name"):
-            sample_name = parameters["Save File"]["sample name"]
-            check_sample_name(sample_name)
-        elif parameters.get("Save File").get("sample name 1"):
-            for i in range(5):
-                if parameters["Save File"].get(f"sample name {i+1}") is None:
-                    break
-                check_sample_name(parameters["Save File"][f"sample name {i+1}"])
-
-    # No longer accepting path location. FIXED PATH TO NETWORK
-    #    file_path=parameters['Save File']['filepath']
-    #    check_file_path(file_path)
-
-    return parameters
-
-
-def check_sample_name(sample_name):
-    """The sample name is required to match the XXX123 format."""
-    result = re.match("^[A-Z]{3}[0-9]{3}$", sample_name)
-    if not result:
-        lablog_error('Invalid Sample Name. Name entered: "%s"' % sample_name)
-        raise NameError("Invalid Sample Name. String must match XXX###")
+###########################################################################
+# Measurement
+###########################################################################
 
 
-def check_file_path(file_path):
-    if not os.path.exists(file_path):
-        try:
-            os.makedirs(file_path)
-        except Exception:
-            lablog_error('Invalid Path. Path entered: "%s"' % file_path)
-            raise NameError("Invalid Path")
+def read_last_line(file_name, block_size=4096) -> str:
+    """Returns the last non-empty line of a text file, reading blocks
+    backwards from the end instead of the whole file"""
+    with open(file_name, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            lines = tail.rstrip(b"\r\n").rsplit(b"\n", 1)
+            if len(lines) == 2 and lines[1].strip():
+                return lines[1].decode().strip()
+        return tail.decode().strip()
 
 
-###############################################################################
-# Saving
-###############################################################################
+def ice_get_temp(select=None):
+    """Access ICE log to return lakeshore 336 temperature.
 
+    If the optional input 'select' is specified (as an int between 0-4)
+    the dictionary index is returned. Else all of the
+    values are returned as a dictionary.
 
-def save(
-    parameters, measurement, data_dict={}, instrument_list=None, db=False, meas_txt=None
-):
-    """Save follows the typical format of defining a data dictionary (data_dict) and saving as a .mat .
-    This function requires prameters from a loaded config file. The file is saved on the S:\ drive according to the configuration settings.
-    If the data_dict is not included this function returns the path created from the configuration file.
+    data_dict = {'date1':date1,
+                   'temp1':temp1,
+                   'temp2':temp2,
+                   'temp3':temp3,
+                   'temp4':temp4}
 
+    The values are the latest sample of the shared ICE telemetry (see
+    qnnpy.functions.telemetry), the values are "" if it is older than a
+    minute.
     """
-    if not isinstance(parameters, dict):
-        raise ValueError("save accepts dict from configured .yml file")
+    from qnnpy.functions import telemetry
 
-    if "Save Root" in parameters:
-        file_path = parameters["Save Root"]
-    else:
-        file_path = "S:\SC\Measurements"
-    # Setup variables from parameters for file path
-    user = parameters["User"]["name"]
-    sample_name = parameters["Save File"][
-        "sample name"
-    ]  # this field should describe the material SPX111 or GaN_ID#20
-    device_name = parameters["Save File"][
-        "device name"
-    ]  # this field should describe which device is being tested
-    device_type = parameters["Save File"][
-        "device type"
-    ]  # this field should describe device type ntron, snspd, coupler, memory
-
-    if parameters["Save File"].get("port"):
-        device_type_ext = device_type + "_" + parameters["Save File"]["port"]
-        port = parameters["Save File"]["port"]
+    sample = telemetry.latest("ICE", max_age=60)
+    if sample is None:
+        date1 = temp1 = temp2 = temp3 = temp4 = ""
+        print("TEMPERATURE: ICE Logging is off")
     else:
-        device_type_ext = device_type
-        port = 1
+        then = datetime.fromtimestamp(sample.time)
+        date1 = then.strftime("%m/%d/%Y %I:%M:%S %p")
+        temp1, temp2, temp3, temp4 = sample.values[:4]
 
-    if parameters["Save File"].get("cell"):
-        cell_name = parameters["Save File"]["cell"] + "_"
+    data_dict = {
+        "date1": date1,
+        "temp1": temp1,
+        "temp2": temp2,
+        "temp3": temp3,
+        "temp4": temp4,
+    }
+    data_list = [date1, temp1, temp2, temp3, temp4]
+    if select:
+        select_temp = data_list[select]
+        return select_temp
     else:
-        cell_name = ""
-
-    time_str = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
-
-    """ Shorten parameter list to only include current measurement and the instruments used"""
-    if instrument_list:
-        new_parameters = {}
-        new_parameters["User"] = parameters["User"]
-        new_parameters["Save File"] = parameters["Save File"]
-        new_parameters[measurement] = parameters[measurement]
-        for i in range(len(instrument_list)):
-            new_parameters[instrument_list[i]] = parameters[instrument_list[i]]
-        parameters = new_parameters
-
-    """ Create folder and save .mat file. """
-    while os.path.exists(file_path):
-        if meas_txt:
-            measurement_alt = measurement + meas_txt
-        else:
-            measurement_alt = measurement
-
-        file_name = (
-            sample_name
-            + "_"
-            + measurement_alt
-            + "_"
-            + device_type_ext
-            + "_"
-            + device_name
-            + "_"
-            + cell_name
-            + time_str
-        )
-        if parameters["Save File"].get("cell"):
-            file_path = os.path.join(
-                file_path,
-                sample_name,
-                device_type,
-                device_name,
-                measurement,
-                parameters["Save File"]["cell"],
-            )
-        else:
-            file_path = os.path.join(
-                file_path, sample_name, device_type, device_name, measurement
-            )
-        os.makedirs(file_path, exist_ok=True)
-        full_path = os.path.join(file_path, file_name)
-        if data_dict:
-            scipy.io.savemat(full_path + ".mat", mdict=data_dict)
-            output_log(parameters, full_path)
-            print("File Saved:\n %s" % full_path)
-            try:
-                insert_measurement_event(
-                    user, measurement, sample_name, device_type, device_name, port
-                )
-            except Exception as e:
-                print(f"Logging to qnndb failed. ({e})")
-
-        break
-
-    return full_path, time_str
+        return data_dict
 
 
-# same as save but uses data instruments and liveplotter class
-def data_saver(
-    parameters: dict,
-    measurement: str,
-    meas_path: str = r"S:\SC\Measurements",
-    data=None,
-    inst=None,
-    plot=None,
-    file_name_append: str = "",
-):
+def iv_branch_adaptive(
+    set_voltage,
+    read_voltage,
+    R_srs: float,
+    stop: float,
+    start: float = 0,
+    step_coarse: float = None,
+    step_fine: float = None,
+    v_threshold: float = 0.005,
+    estimate: float = None,
+    margin: float = 0.1,
+    settle: float = 0.1,
+) -> dict:
     """
+    Measures one IV branch (the sign of stop sets the polarity) spending
+    fine steps only around the switching and retrapping currents.
+
+    The bias is ramped up in coarse steps, or in fine steps above
+    (1 - margin)*estimate when an Isw estimate is known. A voltage above
+    v_threshold marks the switch. If it was found with a coarse step, the
+    device is reset at zero bias and re-approached from the last
+    superconducting point in fine steps. From the latched state the bias is
+    then stepped down until the device retraps, and that interval is refined
+    the same way after re-latching. The branch ends there instead of
+    continuing to stop.
 
     Parameters
     ----------
-    parameters : dict
-        parameters from loaded yaml config file.
-    measurement : str
-        name of the measurement: ie, iv_sweep.
-    meas_path : str, optional
-        root folder location for measurements to be saved to. The default is r'S:\SC\Measurements'.
-    data : Data or List[Data], optional
-        data class to save. The default is None.
-        if a list is provided, then iteratively saves each element seperately. If multiple samples are defined in parameters, each iterative save will use the next sample
-    inst : Instruments, optional
-        instruments that were used. The default is None.
-    plot : LivePlotter or List[LivePlotter], optional
-        optionally save the live plotter which was used. The default is None.
-        if a list is provided, does the same thing as data if data is a list
-    Raises
-    ------
-    ValueError
-        if there is an error in parameters.
+    set_voltage : callable
+        sets the bias source voltage, ie: inst.source.set_voltage.
+    read_voltage : callable
+        returns the device voltage, ie: inst.meter.read_voltage.
+    R_srs : float
+        series resistance between source and device.
+    stop : float
+        highest bias current of the branch.
+    start : float, optional
+        first bias current. The default is 0.
+    step_coarse : float, optional
+        coarse current step. The default is (stop - start)/20.
+    step_fine : float, optional
+        fine current step. The default is step_coarse/10.
+    v_threshold : float, optional
+        device voltage that counts as switched. The default is 5 mV.
+    estimate : float, optional
+        Isw estimate from previous sweeps. The default is None.
+    margin : float, optional
+        fraction below estimate where fine steps start. The default is 0.1.
+    settle : float, optional
+        wait between setting the bias and reading. The default is 0.1 s.
 
     Returns
     -------
-    full_path : str or list[str]
-        full path of where data was saved.
-        if multiple samples are used, an array of paths for each sample save location is given back
+    dict
+        v_set, v_read, i_read lists of every point taken, in order, and
+        isw, ir (absolute, nan if not found).
 
     """
-    # for saving multiple samples
-    if (
-        parameters.get("Save File")
-        and parameters.get("Save File").get("sample name") is None
-    ):
-        res: list = []
-        for i in range(4):  # maximum of 4 samples can be saved at a time
-            if parameters["Save File"].get(f"sample name {i+1}") is None:
+    sign = -1 if stop < 0 else 1
+    start, stop = abs(start), abs(stop)
+    if step_coarse is None:
+        step_coarse = (stop - start) / 20
+    if step_fine is None:
+        step_fine = step_coarse / 10
+    fine_from = (1 - margin) * abs(estimate) if estimate else stop
+    result = {"v_set": [], "v_read": [], "i_read": [], "isw": np.nan, "ir": np.nan}
+
+    def measure(i):
+        v_set = sign * i * R_srs
+        set_voltage(v_set)
+        sleep(settle)
+        vread = read_voltage()
+        iread = (v_set - vread) / R_srs
+        print("V=%.4f V, I=%.2f uA" % (vread, iread * 1e6))
+        result["v_set"].append(v_set)
+        result["v_read"].append(vread)
+        result["i_read"].append(iread)
+        return abs(vread) > v_threshold, abs(iread)
+
+    # Superconducting branch up to the switch
+    last_sc = None
+    switched = None
+    i = start
+    while i <= stop + step_fine / 2:
+        is_normal, iread = measure(i)
+        if is_normal:
+            switched = i
+            break
+        last_sc = (i, iread)
+        i += step_fine if i >= fine_from else step_coarse
+
+    if switched is not None and last_sc is not None:
+        if switched - last_sc[0] > 1.5 * step_fine:
+            set_voltage(0)  # Retrap, then approach the switch in fine steps
+            sleep(settle)
+            i = last_sc[0] + step_fine
+            while i < switched:
+                is_normal, iread = measure(i)
+                if is_normal:
+                    switched = i
+                    break
+                last_sc = (i, iread)
+                i += step_fine
+            else:
+                is_normal, _ = measure(switched)
+                if not is_normal:
+                    switched = None
+        if switched is not None:
+            result["isw"] = last_sc[1]
+
+    # Normal branch down to the retrap
+    if switched is not None:
+        last_n = switched
+        retrap = None
+        i = switched - step_coarse
+        while i > 0:
+            is_normal, iread = measure(i)
+            if not is_normal:
+                retrap = (i, iread)
                 break
-            d = data[i % len(data)] if isinstance(data, list) else data
-            p = plot[i % len(plot)] if isinstance(plot, list) else plot
-            parameters["Save File"] = (
-                {} if parameters.get("Save File") is None else parameters["Save File"]
-            )
-            parameters["Save File"]["sample name"] = (
-                parameters["Save File"][f"sample name {i+1}"]
-                if parameters["Save File"].get(f"sample name {i+1}")
-                else (
-                    parameters.get("Save File").get("sample name")
-                    if parameters.get("Save File").get("sample name")
-                    else ""
-                )
-            )
-            res.append(
-                data_saver(
-                    parameters,
-                    measurement,
-                    meas_path,
-                    data=d,
-                    inst=inst,
-                    plot=p,
-                    file_name_append=str(i),
-                )
-            )
-        return res
-    # if type(data) == list or type(plot) == list:
-    if isinstance(data, list) or isinstance(plot, list):
-        res: list = []
-        for i in range(max(len(data), len(plot))):
-            d = data[i % len(data)] if isinstance(data, list) else data
-            p = plot[i % len(plot)] if isinstance(plot, list) else plot
-            res.append(
-                data_saver(
-                    parameters,
-                    measurement,
-                    meas_path,
-                    data=d,
-                    inst=inst,
-                    plot=p,
-                    file_name_append=str(i),
-                )
-            )
-        return res
-
-    # ensure parameters is dict
-    # if type(parameters) != dict:
-    if isinstance(parameters, dict) is False:
-        try:
-            parameters = load_config(parameters)
-        except Exception as e:
-            raise ValueError(
-                "save accepts dict from configured .yml file, try using load_config(parameters) first!"
-            )
-    file_path = meas_path
-    # Setup variables from parameters for file path
-    user = (
-        parameters["User"]["name"]
-        if parameters.get("User") and parameters.get("User").get("name")
-        else ""
-    )
-    if parameters.get("Save File"):
-        sample_name = (
-            parameters["Save File"]["sample name"]
-            if parameters.get("Save File").get("sample name")
-            else ""
-        )  # this field should describe the material SPX111 or GaN_ID#20
-        device_name = (
-            parameters["Save File"]["device name"]
-            if parameters.get("Save File").get("device name")
-            else ""
-        )  # this field should describe which device is being tested
-        device_type = (
-            parameters["Save File"]["device type"]
-            if parameters.get("Save File").get("device type")
-            else ""
-        )  # this field should describe device type ntron, snspd, coupler, memory
-    else:
-        sample_name, device_name, device_type = "", "", ""
-    if parameters["Save File"].get("port"):
-        device_type_ext = device_type + "_" + f"port{parameters['Save File']['port']}"
-        port = parameters["Save File"]["port"]
-    else:
-        device_type_ext = device_type
-        port = 1
-    # Shorten parameter list to only include current measurement and the instruments used
-    if inst and len(inst.instrument_list) > 0:
-        new_parameters = {
-            "User": parameters.get("User"),
-            "Save File": parameters.get("Save File"),
-            "Measurement": parameters.get(measurement),
-        }
-        new_parameters = {key: parameters[key] for key in inst.instrument_list}
-        # for i in range(len(inst.instrument_list)):
-        #     new_parameters[inst.instrument_list[i]] = parameters[inst.instrument_list[i]]
-        parameters = new_parameters
-    # Create folder and save .mat file
-    full_path = file_path
-    if os.path.exists(file_path):
-        # if meas_txt:
-        #     measurement_alt = measurement+meas_txt
-        # else:
-        #     measurement_alt = measurement
-        # makes file path
-        time_str = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
-        file_name = (
-            sample_name
-            + "_"
-            + measurement
-            + "_"
-            + device_type_ext
-            + "_"
-            + device_name
-            + "_"
-            + time_str
-            + (f"_({file_name_append})" if file_name_append != "" else "")
-        )
-        file_path = os.path.join(
-            file_path, sample_name, device_type, device_name, measurement
-        )
-        os.makedirs(file_path, exist_ok=True)
-        full_path = os.path.join(file_path, file_name)
-        if data:
-            # scipy.io.savemat(full_path + '.mat', mdict=data.data)
-            data.save(path=f"{full_path}.mat")
-            output_log(parameters, full_path)
-            print("File Saved:\n %s" % full_path)
-            # make "recents" shortcut
-            try:
-                if sys.platform == "win32":
-                    recents = os.path.join(meas_path, "recents")
-                    os.makedirs(recents, exist_ok=True)
-                    recents_path = os.path.join(
-                        recents, f"{sample_name}_measurement_{time_str}.lnk"
-                    )
-                    target = file_path
-                    shell = win32com.client.Dispatch("WScript.Shell")
-                    shortcut = shell.CreateShortCut(recents_path)
-                    shortcut.Targetpath = target
-                    shortcut.save()
-                else:
-                    print("Only windows is supported for recent measurement shortcut")
-            except Exception as e:
-                print(f"failed to make shortcut in for recents: {e}")
-            # saving to database
-            try:
-                log_data_to_database(
-                    "measurement_events",
-                    connection=None,
-                    user=user,
-                    meas_type=measurement,
-                    sample_name=sample_name,
-                    device_type=device_type,
-                    device_id=device_name,
-                    port=port,
-                )
-                # insert_measurement_event(user, measurement, sample_name, device_type, device_name, port)
-            except Exception as e:
-                print(f"Logging to qnndb failed: {e}")
-        if plot:
-            plot.save(path=f"{full_path}.png")
-    else:
-        print(
-            "\033[1;31;49mmeas_path does not exist, forcing a save elsewhere: \033[1;37;49m"
-        )
-        data.save(printloc=True)
-        plot.save(name="forced_plot_save")
-    return full_path
-
-
-###########################################################################
-# Loggging
-###########################################################################
-
-
-def insert_measurement_event(
-    user, meas_type, sample_name, device_type, device_id, port=1
-):
-    """ """
-    conn = database_connection()
-    # Get Cursor
-    cur = conn.cursor()
-
-    sql = (
-        "INSERT INTO `measurement_events` (`user`, `meas_type`, `sample_name`, `device_type`, `device_id`, `port`) VALUES ('%s', '%s', '%s', '%s', '%s', '%s')"
-        % (user, meas_type, sample_name, device_type, device_id, port)
-    )
-    cur.execute(sql)
-    conn.commit()
-    return cur
-
-
-def lablog_error(message):
-    """
-    The lablog method logs errors to 'S:\SC\ErrorLogging'
+            last_n = i
+            i -= step_coarse
+        if retrap is not None and last_n - retrap[0] > 1.5 * step_fine:
+            if measure(switched)[0]:  # Re-latch, then step down finely
+                i = last_n - step_fine
+                while i > retrap[0]:
+                    is_normal, iread = measure(i)
+                    if not is_normal:
+                        retrap = (i, iread)
+                        break
+                    i -= step_fine
+        if retrap is not None:
+            result["ir"] = retrap[1]
+
+    set_voltage(0)
+    return result
+
+
+def adaptive_iv_sweep(
+    set_voltage, read_voltage, R_srs: float, iv_sweep: dict, estimate: float = None
+) -> dict:
     """
-    # formatter = logging.Formatter('%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
-    # log = logging.getLogger('lablog')
-    # if not log.handlers:
-    #     handler = logging.FileHandler('S:\SC\Logging\qnn-lablog.log')
-    #     handler.setFormatter(formatter)
+    Repeated adaptive IV sweeps (see iv_branch_adaptive) that stop once
+    the Isw estimate converges.
 
-    #     log.setLevel(logging.ERROR)
-    #     log.addHandler(handler)
-    #     log.propagate = False
-
-    # log.error(message)
-
-    timestamp = str(datetime.now()) + " "
-    path = r"S:\SC\ErrorLogging\lablog_error.txt"
-    file = open(path, "a")
-
-    file.write(timestamp + message + " \n")
-    file.close()
-
-
-def lablog_measurement(parameters, measurement=None):
-    """
-    The lablog_measurement method logs the measurement history within the lab.
-
-    """
-    if isinstance(parameters, dict) is False:
-        raise ValueError("log_measurement accepts dictionary from configured .yml file")
-    formatter = logging.Formatter(
-        "%(asctime)s %(message)s", datefmt="%m/%d/%Y %I:%M:%S %p"
-    )
-    lab_measurement_log = logging.getLogger("lab_measurement_log")
-    if not lab_measurement_log.handlers:
-        handler = logging.FileHandler(
-            "S:\SC\MeasurementLogging\qnn-lablog-measurement.log"
-        )
-        handler.setFormatter(formatter)
-
-        lab_measurement_log.setLevel(logging.INFO)
-        lab_measurement_log.addHandler(handler)
-        lab_measurement_log.propagate = False
-
-    if measurement:
-        parameters["Save File"]["measurement"] = measurement
-    lab_measurement_log.info(parameters)
-
-
-def output_log(parameters, path):
-    """
-    The output_log method logs the configuration file used for each measurement
-    to the file location where that measurement is saved.
-
-    """
-    # formatter = logging.Formatter('%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
-
-    # output_log = logging.getLogger('output_log')
-    # formatter = logging.Formatter('%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
-    # handler = logging.FileHandler(path+'.txt')
-    # handler.setFormatter(formatter)
-
-    # output_log.setLevel(logging.INFO)
-    # output_log.addHandler(handler)
-
-    # output_log.info(parameters)
-
-    file = open(path + ".txt", "w")
-    file.write("\n".join("{}\t\t{}".format(k, v) for k, v in parameters.items()))
-    file.close()
-
-
-def database_connection(**kwargs) -> Connection:
-    if kwargs is None or len(kwargs) == 0:
-        try:
-            with open(r"S:\SC\mariadb_conn.yml") as f:
-                conn_params = yaml.load(f, Loader=yaml.FullLoader)
-                conn = mariadb.connect(**conn_params)
-        except mariadb.Error as e:
-            print(f"Error connecting to MariaDB Platform: {e}")
-            raise ConnectionError
-    else:
-        try:
-            conn: Connection = mariadb.connect(kwargs)
-        except mariadb.Error as e:
-            print(f"Error connecting to MariaDB Platform: {e}")
-            raise ConnectionError
-    return conn
-
-
-def log_data_to_database(table_name: str, connection=None, **kwargs):
-    if connection is None:
-        connection = database_connection()
-    cur = connection.cursor()
-    column_names = "`" + "`, `".join(kwargs.keys()) + "`"
-    values = "'" + "', '".join([str(v) for v in kwargs.values()]) + "'"
-    command = "INSERT INTO `%s` (%s) VALUES (%s)" % (table_name, column_names, values)
-    cur.execute(command)
-    connection.commit()
-    connection.close()
-
-
-def update_table(
-    table_name: str, set_col: str, conditional: str = "NULL", connection=None
-):
-    """
+    Each sweep runs the positive branch, and the negative one for
+    full_sweep. The mean Isw of each sweep is the estimate for the next one,
+    and the remaining sweeps are skipped once two consecutive estimates agree
+    within tolerance.
 
     Parameters
     ----------
-    table_name : str
-        name of table to update.
-    set_col : str
-        SET sql command, for example set_col = 'thickness=0, tc=0'.
-    conditional : str
-        WHERE sql command, arguments without '=' will simpily get matched using '=' operator to columns in set_col.
-        to update an entire column without conditional, 'ALL'
-    connection : TYPE, optional
-        connection to database. The default is qnndb database.
+    set_voltage : callable
+        sets the bias source voltage.
+    read_voltage : callable
+        returns the device voltage.
+    R_srs : float
+        series resistance between source and device.
+    iv_sweep : dict
+        iv_sweep section of the configuration: start, stop, sweep, full_sweep
+        and the optional step_coarse, step_fine, v_threshold and tolerance
+        (default step_fine).
+    estimate : float, optional
+        Isw estimate, ie: from a previous device. The default is None.
+
     Returns
     -------
-    None.
+    dict
+        v_set, v_read, i_read arrays of every point, isw and ir (mean over
+        branches and sweeps), isws and irs per branch.
 
     """
-    if connection is None:
-        connection = database_connection()
-    command: str = "UPDATE %s SET %s" % (table_name, insert_quotes(set_col))
-    if not conditional == "ALL":
-        conditional = insert_quotes(conditional)
-        command += " WHERE "
-        conditional_operators: list[str] = [
-            "=",
-            ">",
-            "<",
-            ">=",
-            "<=",
-            "!=",
-            "BETWEEN",
-            "LIKE",
-            "IN",
-        ]
-        if any(op in conditional for op in conditional_operators):
-            command += conditional
-        else:
-            cols: list[str] = get_column_names(set_col)
-            vals: list[str] = conditional.split(",")
-            for c, v in zip(cols, vals):
-                command += f"{c}={v.strip()}, "
-            command = command.rstrip(", ")
-    cur = connection.cursor()
-    print(command)
-    cur.execute(command)
-    connection.commit()
-    connection.close()
-
-
-def get_column_names(string: str):
+    start = iv_sweep["start"]
+    stop = iv_sweep["stop"]
+    step_coarse = iv_sweep.get("step_coarse", (stop - start) / 20)
+    step_fine = iv_sweep.get("step_fine", step_coarse / 10)
+    tolerance = iv_sweep.get("tolerance", step_fine)
+    signs = [1, -1] if iv_sweep.get("full_sweep") else [1]
+
+    data = {"v_set": [], "v_read": [], "i_read": [], "isws": [], "irs": []}
+    for n in range(iv_sweep.get("sweep", 1)):
+        isws = []
+        for sign in signs:
+            branch = iv_branch_adaptive(
+                set_voltage,
+                read_voltage,
+                R_srs,
+                sign * stop,
+                start=sign * start,
+                step_coarse=step_coarse,
+                step_fine=step_fine,
+                v_threshold=iv_sweep.get("v_threshold", 0.005),
+                estimate=estimate,
+            )
+            for key in ["v_set", "v_read", "i_read"]:
+                data[key].extend(branch[key])
+            data["isws"].append(branch["isw"])
+            data["irs"].append(branch["ir"])
+            isws.append(branch["isw"])
+        if np.all(np.isnan(isws)):
+            continue
+        previous, estimate = estimate, np.nanmean(isws)
+        if n > 0 and previous is not None and abs(estimate - previous) < tolerance:
+            print("Isw converged to %.2f uA after %d sweeps" % (estimate * 1e6, n + 1))
+            break
+
+    for key in data:
+        data[key] = np.asarray(data[key])
+    data["isw"] = np.nanmean(data["isws"]) if np.any(~np.isnan(data["isws"])) else 0
+    data["ir"] = np.nanmean(data["irs"]) if np.any(~np.isnan(data["irs"])) else 0
+    return data
+
+
+def run_sweep_adaptive(measurement, source, meter):
     """
-    Helper method for update_table to get the column names when an input is formatted as 'col=val, col2=val2, col3=val3' etc
+    adaptive_iv_sweep of an IvSweep measurement (snspd, ntron, resonators)
+    with the source output on, configured by its iv_sweep section.
+
+    Sets v_set, v_read, i_read, isw and ir of measurement. The Isw found is
+    kept in measurement.isw_estimate and seeds its next call, the first one
+    uses the optional isw_estimate key of iv_sweep.
+
     Parameters
     ----------
-    string : str
-        sql command formatted as 'column=value, column=value...'
+    measurement : object
+        measurement with properties, R_srs and isw_estimate.
+    source : object
+        bias source with set_output and set_voltage.
+    meter : object
+        voltmeter with read_voltage.
 
     Returns
     -------
-    list of column names
-    """
-    res = []
-    builder = ""
-    build = True
-    for c in string:
-        if c == "=":
-            res.append(builder)
-            builder = ""
-            build = False
-        elif build:
-            if not c.isspace():
-                builder += c
-        elif c == ",":
-            build = True
-    return res
-
-
-def insert_quotes(string: str) -> str:
-    res: str = ""
-    i: int = 0
-    while i < len(string):
-        c = string[i]
-        res += c
-        if c == "=":
-            is_string = False
-            builder = ""
-            end: int = i
-            for j in range(i + 1, len(string)):
-                end = j
-                if string[j] == "," or (is_string and string[j] == " "):
-                    end = j - 1
-                    break
-                if not (
-                    string[j].isnumeric()
-                    or string[j] == "."
-                    or string[j] == "-"
-                    or string[j].isspace()
-                ):
-                    is_string = True
-                builder += string[j]
-            builder = builder.strip()
-            if not is_string or builder.upper() == "NULL":
-                res += builder
-            else:
-                res += f"'{builder}'"
-            i = end
-        i += 1
-    return res
-
-
-###########################################################################
-# Measurement
-###########################################################################
-
-
-def ice_get_temp(select=None):
-    """Access ICE log to return lakeshore 336 temperature.
-
-    If the optional input 'select' is specified (as an int between 0-4)
-    the dictionary index is returned. Else all of the
-    values are returned as a dictionary.
-
-    data_dict = {'date1':date1,
-                   'temp1':temp1,
-                   'temp2':temp2,
-                   'temp3':temp3,
-                   'temp4':temp4}
+    dict
+        the adaptive_iv_sweep data.
 
     """
-    now = datetime.now()
-    while not os.path.exists(
-        r"S:\SC\InstrumentLogging\Cryogenics\Ice\ice-log\Results\%s" % str(now)[:10]
-    ):
-        sleep(1)
-
-    f = (
-        r"S:\SC\InstrumentLogging\Cryogenics\Ice\ice-log\Results\%s\%s"
-        % (str(now)[:10], str(now)[:10])
-        + ".log"
-    )
-
-    with open(f) as f:  # Get txt from log file and split the last (most recent) entry
-        last = f.readlines()[-1].split(",")
-
-        then = datetime.strptime(last[0] + " " + last[1], "%m/%d/%Y %I:%M:%S %p")
-
-        if now - then > dt.timedelta(minutes=1):
-            temp1 = ""
-            print("TEMPERATURE: ICE Logging is off")
-        else:
-            date1 = last[3]
-            temp1 = float(last[4])  # A
-            temp2 = float(last[5])
-            temp3 = float(last[6])
-            temp4 = float(last[7])
+    iv_sweep = measurement.properties["iv_sweep"]
+    source.set_output(False)
+    source.set_voltage(0)
+    source.set_output(True)
+    sleep(1)
+
+    estimate = measurement.isw_estimate or iv_sweep.get("isw_estimate")
+    try:
+        data = adaptive_iv_sweep(
+            source.set_voltage,
+            meter.read_voltage,
+            measurement.R_srs,
+            iv_sweep,
+            estimate=estimate,
+        )
+    finally:
+        source.set_output(False)
 
-    data_dict = {
-        "date1": date1,
-        "temp1": temp1,
-        "temp2": temp2,
-        "temp3": temp3,
-        "temp4": temp4,
-    }
-    data_list = [date1, temp1, temp2, temp3, temp4]
-    if select:
-        select_temp = data_list[select]
-        return select_temp
-    else:
-        return data_dict
+    measurement.v_set = data["v_set"]
+    measurement.v_read = data["v_read"]
+    measurement.i_read = data["i_read"]
+    measurement.isw = data["isw"]
+    measurement.ir = data["ir"]
+    measurement.isw_estimate = measurement.isw or None
+    print("Isw = %.4f µA :--: Ir = %.4f µA" % (data["isw"] * 1e6, data["ir"] * 1e6))
+    return data
 
 
 #######################################################################
@@ -945,233 +392,212 @@ class Instruments:
     of that instrument is used, and that instrument is accessed normally using
     inst.source (without number).
 
+    Instruments are connected on first use: inst.meter opens and sets up the
+    meter the first time it is accessed, so a measurement never waits on
+    instruments it does not touch. connect() sets up several instruments in
+    parallel, and lazy=False (or "Instruments: {lazy: False}" in the yaml)
+    connects all of them up front. Temperature controllers are always
+    connected up front because their initial temperature is saved with the
+    data. The driver class of each name comes from qnnpy.instruments.registry,
+    where other packages can add their own instruments.
+
     """
 
-    attenuator = None
-    counter = None
-    scope = None
-    meter = None
-    source = None
-    awg = None
-    VNA = None
-    temp = None
-
-    def __init__(self, properties: dict):
-        self.attenuator = None
-        self.counter = None
-        self.scope = None
-        self.meter = None
-        self.source = None
-        self.awg = None
-        self.VNA = None
-        self.temp = None
+    # yaml key -> (attribute, setup method)
+    kinds = {
+        "Attenuator": ("attenuator", "attenuator_setup"),
+        "Counter": ("counter", "counter_setup"),
+        "Scope": ("scope", "scope_setup"),
+        "Meter": ("meter", "meter_setup"),
+        "Source": ("source", "source_setup"),
+        "AWG": ("awg", "AWG_setup"),
+        "VNA": ("VNA", "VNA_setup"),
+        "PNA": ("pna", "PNA_setup"),
+        "Temperature": ("temp", "temp_setup"),
+        "Sourcemeter": ("sourcemeter", "sourcemeter_setup"),
+    }
+    eager_kinds = ("Temperature",)
+
+    def __init__(self, properties: dict, lazy: bool = None):
+        from qnnpy.instruments import registry
+
+        self.properties = properties
         self.instrument_list: List[str] = []
         self.instrument_dict: dict[str, object] = {}
-        # Attenuator
-        if properties.get("Attenuator"):
-            self.attenuator_setup(properties)
-        elif properties.get("Attenuator1"):
-            for i in range(
-                1, 100
-            ):  # if you're using 100 or more attenuators then maybe don't use 100 attenuators? idk man
-                if properties.get(f"Attenuator{i}"):
-                    self.attenuator_setup(properties, i)
-                else:
-                    break
+        self.pending: dict[str, tuple] = {}  # attribute -> (kind, instrument_num)
+        self.setup_locks: dict[str, threading.Lock] = {}
+        # Simulated instruments (ports named SIM::<model>)
+        if properties.get("Simulation") is not None:
+            from qnnpy.instruments.simulated import configure
+
+            configure(**(properties["Simulation"] or {}))
+        # VISA tracing, saved next to the data by save() and data_saver()
+        if properties.get("Tracing") is not None:
+            from qnnpy.instruments import tracing
+
+            tracing.enable(**(properties["Tracing"] or {}))
+
+        for kind, (attribute, _) in self.kinds.items():
+            for instrument_num in self.configured(properties, kind):
+                appender = str(instrument_num) if instrument_num else ""
+                inst_name = f"{kind}{appender}"
+                registry.check(kind, properties[inst_name]["name"])
+                self.instrument_list.append(inst_name)
+                self.pending[attribute + appender] = (kind, instrument_num)
+                self.setup_locks[attribute + appender] = threading.Lock()
+                if kind == "Scope":
+                    setattr(
+                        self,
+                        f"scope{appender}_channel",
+                        properties[inst_name].get("channel"),
+                    )
+        if not self.configured(properties, "Temperature"):
+            properties["Temperature"] = {"initial temp": "None", "name": "None"}
 
-        # Counter
-        if properties.get("Counter"):
-            self.counter_setup(properties)
-        elif properties.get("Counter1"):
-            for i in range(1, 100):
-                if properties.get(f"Counter{i}"):
-                    self.counter_setup(properties, i)
-                else:
-                    break
+        if lazy is None:
+            lazy = (properties.get("Instruments") or {}).get("lazy", True)
+        eager = [a for a, (kind, _) in self.pending.items() if kind in self.eager_kinds]
+        if not lazy:
+            self.connect()
+        elif eager:
+            self.connect(*eager)
+
+    @staticmethod
+    def configured(properties: dict, kind: str) -> List[int]:
+        """instrument numbers of kind in properties: [0] for Meter, [1, 2] for Meter1, Meter2"""
+        if properties.get(kind):
+            return [0]
+        numbers = []
+        for i in range(1, 100):
+            if not properties.get(f"{kind}{i}"):
+                break
+            numbers.append(i)
+        return numbers
+
+    def __getattr__(self, name):
+        # only called for attributes that are not set yet: configured
+        # instruments are connected here on first use
+        pending = self.__dict__.get("pending", {})
+        if name in pending:
+            self._connect(name)
+            return self.__dict__[name]
+        if name in [attribute for attribute, _ in self.kinds.values()]:
+            return None  # kind not in the yaml file
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'"
+        )
 
-        # Scope
-        if properties.get("Scope"):
-            self.scope_setup(properties)
-        elif properties.get("Scope1"):
-            for i in range(1, 100):
-                if properties.get(f"Scope{i}"):
-                    self.scope_setup(properties, i)
-                else:
-                    break
+    def _connect(self, attribute: str):
+        with self.setup_locks[attribute]:
+            if attribute in self.__dict__:
+                return
+            kind, instrument_num = self.pending[attribute]
+            getattr(self, self.kinds[kind][1])(self.properties, instrument_num)
+            del self.pending[attribute]
 
-        # Meter
-        if properties.get("Meter"):
-            self.meter_setup(properties)
-        elif properties.get("Meter1"):
-            for i in range(1, 100):
-                if properties.get(f"Meter{i}"):
-                    self.meter_setup(properties, i)
-                else:
-                    break
+    def connect(self, *attributes: str):
+        """
+        Connects instruments that are not connected yet, in parallel with one
+        thread per VISA resource.
 
-        # Source
-        if properties.get("Source"):
-            self.source_setup(properties)
-        elif properties.get("Source1"):
-            for i in range(1, 100):
-                if properties.get(f"Source{i}"):
-                    self.source_setup(properties, i)
-                else:
-                    break
+        Parameters
+        ----------
+        *attributes : str
+            instruments to connect, ie: "meter", "source2". The default is all of them.
+            failures are printed and the instrument is retried on first use.
 
-        # AWG
-        if properties.get("AWG"):
-            self.AWG_setup(properties)
-        elif properties.get("AWG1"):
-            for i in range(1, 100):
-                if properties.get(f"AWG{i}"):
-                    self.AWG_setup(properties, i)
-                else:
-                    break
+        """
+        from qnnpy.instruments.visa_transport import executor, resource_key
+
+        groups: dict[str, list] = {}
+        for attribute in attributes or list(self.pending):
+            if attribute not in self.pending:
+                continue
+            kind, instrument_num = self.pending[attribute]
+            port = self.properties[f"{kind}{instrument_num or ''}"].get("port")
+            groups.setdefault(resource_key(str(port)), []).append(attribute)
+
+        def run(group):
+            for attribute in group:
+                try:
+                    self._connect(attribute)
+                except Exception:
+                    pass  # printed by the setup method
 
-        # VNA
-        if properties.get("VNA"):
-            self.VNA_setup(properties)
-        elif properties.get("VNA1"):
-            for i in range(1, 100):
-                if properties.get(f"VNA{i}"):
-                    self.VNA_setup(properties, i)
-                else:
-                    break
+        futures = [executor().submit(run, group) for group in groups.values()]
+        for future in futures:
+            future.result()
 
-        # Temperature Controller
-        if properties.get("Temperature"):
-            self.temp_setup(properties)
-        elif properties.get("Temperature1"):
-            for i in range(1, 100):
-                if properties.get(f"Temperature{i}"):
-                    self.temp_setup(properties, i)
-                else:
-                    break
-        else:
-            properties["Temperature"] = {"initial temp": "None", "name": "None"}
+    def add(self, inst_name: str, instrument: object, instrument_num: int = 0):
+        """stores a connected instrument as inst.<attribute> and in instrument_dict"""
+        kind = inst_name.rstrip("0123456789")
+        attribute = self.kinds[kind][0] + (
+            str(instrument_num) if instrument_num else ""
+        )
+        if inst_name not in self.instrument_list:
+            self.instrument_list.append(inst_name)
+        if instrument is not None:
+            self.instrument_dict[inst_name] = instrument
+        setattr(self, attribute, instrument)
 
-        # SourceMeter
-        if properties.get("Sourcemeter"):
-            self.sourcemeter_setup(properties)
-        elif properties.get("Sourcemeter1"):
-            for i in range(1, 100):
-                if properties.get(f"Sourcemeter{i}"):
-                    self.sourcemeter_setup(properties, i)
-                else:
-                    break
+    def driver_class(self, kind: str, name: str):
+        from qnnpy.instruments import registry
+
+        return registry.driver_class(kind, name)
 
     def attenuator_setup(self, properties: dict, instrument_num: int = 0):
-        appender: str = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender: str = str(instrument_num) if instrument_num else ""
         inst_name = f"Attenuator{appender}"
-        self.instrument_list.append(inst_name)
-
-        if properties[inst_name]["name"] == "JDSHA9":
-            from qnnpy.instruments.jds_ha9 import JDSHA9
-
-            attenuator_class = JDSHA9
-        elif properties[inst_name]["name"] == "N7752A":
-            from qnnpy.instruments.keysight_n7752a import N7752A
-
-            attenuator_class = N7752A
-        else:
-            raise NameError("Invalid Attenuator. Attenuator name is not configured")
 
         try:
+            attenuator_class = self.driver_class(
+                "Attenuator", properties[inst_name]["name"]
+            )
             attenuator = attenuator_class(properties[inst_name]["port"])
             attenuator.set_beam_block(True)
-            self.instrument_dict[inst_name] = attenuator
             print(f"ATTENUATOR{appender}: connected")
-        except Exception:
-            print(f"ATTENUATOR{appender}: failed to connect")
-
-        if instrument_num == 0:
-            self.attenuator = attenuator
-        if instrument_num == 1:
-            self.attenuator1 = attenuator
-        if instrument_num > 1:
-            raise NotImplementedError("More than 2 attenuators not supported yet")
+        except Exception as e:
+            print(f"ATTENUATOR{appender}: failed to connect ({e})")
+            raise
+        self.add(inst_name, attenuator, instrument_num)
 
     def counter_setup(self, properties: dict, instrument_num: int = 0):
-        appender: str = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender: str = str(instrument_num) if instrument_num else ""
         inst_name = f"Counter{appender}"
-        self.instrument_list.append(inst_name)
-
-        if properties[f"Counter{appender}"]["name"] == "Agilent53131a":
-            from qnnpy.instruments.agilent_53131a import Agilent53131a
-
-            counter_class = Agilent53131a
-        elif properties[f"Counter{appender}"]["name"] == "Keysight53230a":
-            from qnnpy.instruments.keysight_53230a import Keysight53230a
-
-            counter_class = Keysight53230a
-        else:
-            raise NameError(
-                f"Invalid counter. Counter name {properties[inst_name]['name']} is not configured"
-            )
 
         try:
+            counter_class = self.driver_class("Counter", properties[inst_name]["name"])
             counter = counter_class(properties[inst_name]["port"])
             # without the reset command this section will evaluate connected
             # even though the GPIB could be wrong
             # similary story for the other insturments
             counter.reset()
             counter.basic_setup()
-            self.instrument_dict[inst_name] = counter
             # self.counter.write(':EVEN:HYST:REL 100')
             print(f"COUNTER{appender}: connected")
-        except Exception:
-            print(f"COUNTER{appender}: failed to connect")
-        if instrument_num == 0:
-            self.counter = counter
-        if instrument_num == 1:
-            self.counter1 = counter
-        if instrument_num > 1:
-            raise NotImplementedError("More than 2 counters not supported yet")
+        except Exception as e:
+            print(f"COUNTER{appender}: failed to connect ({e})")
+            raise
+        self.add(inst_name, counter, instrument_num)
 
     def scope_setup(self, properties: dict, instrument_num: int = 0):
-        appender: str = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender: str = str(instrument_num) if instrument_num else ""
         inst_name = f"Scope{appender}"
-        self.instrument_list.append(inst_name)
-
-        if properties[inst_name]["name"] == "LeCroy620Zi":
-            from qnnpy.instruments.lecroy_620zi import LeCroy620Zi
 
-            scopeClass = LeCroy620Zi
-        elif properties[f"Scope{appender}"]["name"] == "KeysightDSOX":
-            from qnnpy.instruments.keysight_dsox import KeysightDSOX
-
-            scopeClass = KeysightDSOX
-        else:
-            raise NameError("Invalid Scope. Scope name is not configured")
-
-        if properties[inst_name]["port"][0:3] == "USB":
+        if properties[inst_name]["port"][0:3] in ("USB", "SIM"):
             visa_address = properties[inst_name]["port"]
         else:
             visa_address = f"TCPIP::{properties[inst_name]['port']}::INSTR"
 
         try:
-            scope = scopeClass(visa_address)
+            scope_class = self.driver_class("Scope", properties[inst_name]["name"])
+            scope = scope_class(visa_address)
             print(f"SCOPE{appender}: connected")
-        except Exception:
-            print(f"SCOPE{appender}: failed to connect")
-
-        if instrument_num == 0:
-            self.scope = scope
-            self.scope_channel = properties[inst_name]["channel"]
-            self.instrument_dict[inst_name] = scope
-        if instrument_num == 1:
-            self.scope1 = scope
-            self.scope1_channel = properties[inst_name]["channel"]
-            self.instrument_dict[inst_name] = scope
-        if instrument_num > 1:
-            raise NotImplementedError("More than 2 scopes not supported yet")
+        except Exception as e:
+            print(f"SCOPE{appender}: failed to connect ({e})")
+            raise
+        setattr(self, f"scope{appender}_channel", properties[inst_name]["channel"])
+        self.add(inst_name, scope, instrument_num)
 
     def meter_setup(self, properties: dict, instrument_num: int = 0):
         """
@@ -1185,47 +611,19 @@ class Instruments:
             NameError: If an invalid meter name is encountered in the configuration.
         """
 
-        appender = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender = str(instrument_num) if instrument_num else ""
         inst_name = f"Meter{appender}"
-        self.instrument_list.append(inst_name)
-
-        # Instrument selection and import based on configuration
-        meter_name = properties[inst_name]["name"]
-        if meter_name == "Keithley2700":
-            from qnnpy.instruments.keithley_2700 import Keithley2700
-
-            meter_class = Keithley2700
-        elif meter_name == "Keithley2400":
-            from qnnpy.instruments.keithley_2400 import Keithley2400
-
-            meter_class = Keithley2400
-        elif meter_name == "Keithley2001":
-            from qnnpy.instruments.keithley_2001 import Keithley2001
-
-            meter_class = Keithley2001
-        else:
-            raise NameError(
-                f'Invalid Meter. Meter name: "{meter_name}" is not configured'
-            )
 
         # Instrument connection and initialization
         try:
+            meter_class = self.driver_class("Meter", properties[inst_name]["name"])
             meter = meter_class(properties[inst_name]["port"])
             meter.reset()  # Assuming reset is a common function for all meters
-            self.instrument_dict[inst_name] = meter
             print(f"METER{appender}: connected")
         except Exception as e:
             print(f"METER{appender}: failed to connect ({e})")
-
-        # Assign meter object to class attributes based on instrument number
-        if instrument_num == 0:
-            self.meter = meter
-        elif instrument_num == 1:
-            self.meter1 = meter
-        else:
-            raise NotImplementedError("More than 2 meters not supported yet")
+            raise
+        self.add(inst_name, meter, instrument_num)
 
     def source_setup(self, properties: dict, instrument_num: int = 0):
         """
@@ -1239,56 +637,24 @@ class Instruments:
             NameError: If an invalid source name is encountered in the configuration.
         """
 
-        appender = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender = str(instrument_num) if instrument_num else ""
         inst_name = f"Source{appender}"
-        self.instrument_list.append(inst_name)
-
-        # Instrument selection and import based on configuration
-        source_name = properties[inst_name]["name"]
-        if source_name == "SIM928":
-            from qnnpy.instruments.srs_sim928 import SIM928
-
-            source_class = SIM928
-        elif source_name == "YokogawaGS200":
-            from qnnpy.instruments.yokogawa_gs200 import YokogawaGS200
-
-            source_class = YokogawaGS200
-        elif source_name == "Keithley2400":
-            from qnnpy.instruments.keithley_2400 import Keithley2400
-
-            source_class = Keithley2400
-        else:
-            raise NameError(
-                f'Invalid Source. Source name: "{source_name}" is not configured'
-            )
 
         # Instrument connection and initialization
         try:
+            source_class = self.driver_class("Source", properties[inst_name]["name"])
             source = source_class(
                 properties[inst_name]["port"],
                 properties[inst_name].get("port_alt", None),  # Handle optional port_alt
             )
-            try:
-                reset = properties[inst_name]["reset"]
-            except KeyError:
-                reset = True
-            if reset:
-                source.reset()  # Assuming reset is a common function for all sources 
+            if properties[inst_name].get("reset", True):
+                source.reset()  # Assuming reset is a common function for all sources
             source.set_output(False)  # Assuming this is a common configuration step
-            self.instrument_dict[inst_name] = source
             print(f"SOURCE{appender}: connected")
         except Exception as e:
             print(f"SOURCE{appender}: failed to connect ({e})")
-
-        # Assign source object to class attributes based on instrument number
-        if instrument_num == 0:
-            self.source = source
-        elif instrument_num == 1:
-            self.source1 = source
-        else:
-            raise NotImplementedError("More than 2 sources not supported yet")
+            raise
+        self.add(inst_name, source, instrument_num)
 
     def sourcemeter_setup(self, properties: dict, instrument_num: int = 0):
         """
@@ -1302,42 +668,24 @@ class Instruments:
             NameError: If an invalid sourcemeter name is encountered in the configuration.
         """
 
-        appender = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender = str(instrument_num) if instrument_num else ""
         inst_name = f"Sourcemeter{appender}"
-        self.instrument_list.append(inst_name)
-
-        # Instrument selection and import based on configuration
-        sourcemeter_name = properties[inst_name]["name"]
-        if sourcemeter_name == "KeysightB2912a":
-            from qnnpy.instruments.keysight_b2912a import KeysightB2912a
-
-            sourcemeter_class = KeysightB2912a
-        else:
-            raise NameError(
-                f'Invalid Sourcemeter. Sourcemeter name: "{sourcemeter_name}" is not configured'
-            )
 
         # Instrument connection and initialization
         try:
+            sourcemeter_class = self.driver_class(
+                "Sourcemeter", properties[inst_name]["name"]
+            )
             sourcemeter = sourcemeter_class(properties[inst_name]["port"])
             sourcemeter.reset()  # Assuming reset is a common function for all sourcemeters
             sourcemeter.set_output(
                 False
             )  # Assuming this is a common configuration step
-            self.instrument_dict[inst_name] = sourcemeter
             print(f"SOURCEMETER{appender}: connected")
         except Exception as e:
             print(f"SOURCEMETER{appender}: failed to connect ({e})")
-
-        # Assign sourcemeter object to class attributes based on instrument number
-        if instrument_num == 0:
-            self.sourcemeter = sourcemeter
-        elif instrument_num == 1:
-            self.sourcemeter1 = sourcemeter
-        else:
-            raise NotImplementedError("More than 2 sourcemeters not supported yet")
+            raise
+        self.add(inst_name, sourcemeter, instrument_num)
 
     def AWG_setup(self, properties: dict, instrument_num: int = 0):
         """
@@ -1349,44 +697,21 @@ class Instruments:
 
         Raises:
             NameError: If an invalid AWG name is encountered in the configuration.
-            NotImplementedError: If more than 2 AWGs are requested.
         """
 
-        appender = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender = str(instrument_num) if instrument_num else ""
         inst_name = f"AWG{appender}"
-        self.instrument_list.append(inst_name)
-
-        # Instrument selection and import based on configuration
-        awg_name = properties[inst_name]["name"]
-        if awg_name == "Agilent33250a":
-            from qnnpy.instruments.agilent_33250a import Agilent33250a
-
-            awg_class = Agilent33250a
-        elif awg_name == "Agilent33600a":
-            from qnnpy.instruments.agilent_33600a import Agilent33600a
-
-            awg_class = Agilent33600a
-        else:
-            raise NameError(
-                f"Invalid AWG. AWG name: {properties[inst_name]['name']} is not configured"
-            )
 
         # Instrument connection and initialization
         try:
+            awg_class = self.driver_class("AWG", properties[inst_name]["name"])
             awg = awg_class(properties[inst_name]["port"])
             awg.beep()  # Assuming beep is a common function for all AWGs
             print(f"AWG{appender}: connected")
-            self.instrument_dict[inst_name] = awg
-            if instrument_num == 0:
-                self.awg = awg
-            elif instrument_num == 1:
-                self.awg1 = awg
-            else:
-                raise NotImplementedError("More than 2 AWGs not supported yet")
         except Exception as e:
             print(f"AWG{appender}: failed to connect ({e})")
+            raise
+        self.add(inst_name, awg, instrument_num)
 
     # VNA
     def VNA_setup(self, properties: dict, instrument_num: int = 0):
@@ -1401,64 +726,51 @@ class Instruments:
             NameError: If an invalid VNA name is encountered in the configuration.
         """
 
-        appender = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
+        appender = str(instrument_num) if instrument_num else ""
         inst_name = f"VNA{appender}"
-        self.instrument_list.append(inst_name)
-
-        # Instrument selection and import based on configuration
-        vna_name = properties[inst_name]["name"]
-        if vna_name == "KeysightN5224a":
-            from qnnpy.instruments.keysight_n5224a import KeysightN5224a
-
-            vna_class = KeysightN5224a
-        else:
-            raise NameError(
-                f"Invalid VNA. VNA name: {properties[inst_name]['name']} is not configured"
-            )
 
         # Instrument connection and initialization
         try:
+            vna_class = self.driver_class("VNA", properties[inst_name]["name"])
             vna = vna_class(properties[inst_name]["port"])
             # Assuming reset is a common function for all VNAs, uncomment if needed
             # vna.reset()
-            self.instrument_dict[inst_name] = vna
             print(f"VNA{appender}: connected")
         except Exception as e:
             print(f"VNA{appender}: failed to connect ({e})")
+            raise
+        self.add(inst_name, vna, instrument_num)
 
-        if instrument_num == 0:
-            self.VNA = vna
-        if instrument_num > 0:
-            raise NotImplementedError("More than 1 VNA not supported yet")
+    def PNA_setup(self, properties: dict, instrument_num: int = 0):
+        """
+        Sets up a PNA (VNA used by the resonator measurements, inst.pna).
 
-    # Temperature Controller
-    def temp_setup(self, properties: dict, instrument_num: int = 0):
-        appender: str = str(instrument_num)
-        if instrument_num == 0:
-            appender = ""
-        inst_name = f"Temperature{appender}"
-        self.instrument_list.append(inst_name)
+        Args:
+            properties: A dictionary containing instrument configuration details.
+            instrument_num: An integer specifying the instrument number (optional, defaults to 0).
+        """
 
-        if properties[inst_name]["name"] == "Lakeshore336":
-            from qnnpy.instruments.lakeshore336 import Lakeshore336
+        appender = str(instrument_num) if instrument_num else ""
+        inst_name = f"PNA{appender}"
 
-            temp_class = Lakeshore336
-        elif properties[inst_name]["name"] == "Cryocon34":
-            from qnnpy.instruments.cryocon34 import Cryocon34
+        try:
+            pna_class = self.driver_class("PNA", properties[inst_name]["name"])
+            pna = pna_class(properties[inst_name]["port"])
+            # pna.set_power(0)
+            pna.set_scale_auto()
+            print(f"PNA{appender}: connected")
+        except Exception as e:
+            print(f"PNA{appender}: failed to connect ({e})")
+            raise
+        self.add(inst_name, pna, instrument_num)
 
-            temp_class = Cryocon34
-        elif properties[inst_name]["name"] == "ICE":
-            temp_class = None
-        elif properties[inst_name]["name"] == "DEWAR":
-            temp_class = None
-        else:
-            raise NameError(
-                'Invalid Temperature Controller. TEMP name: "%s" is not configured'
-                % properties[inst_name]["name"]
-            )
+    # Temperature Controller
+    def temp_setup(self, properties: dict, instrument_num: int = 0):
+        appender: str = str(instrument_num) if instrument_num else ""
+        inst_name = f"Temperature{appender}"
 
+        temp = None
+        temp_class = self.driver_class("Temperature", properties[inst_name]["name"])
         if temp_class is not None:
             try:
                 temp = temp_class(properties[inst_name]["port"])
@@ -1466,7 +778,6 @@ class Instruments:
                 properties[inst_name]["initial temp"] = temp.read_temp(
                     temp.channel
                 )  # Assuming read_temp is a common function for all temperature controllers
-                self.instrument_dict[inst_name] = temp
                 print(
                     "TEMPERATURE"
                     + appender
@@ -1474,11 +785,11 @@ class Instruments:
                     + str(properties[inst_name]["initial temp"])
                 )
             except Exception as e:
+                temp = None
                 properties[inst_name]["initial temp"] = 0
                 print(f"TEMPERATURE{appender} failed to connect with message ({e})")
         else:
             if properties[inst_name]["name"] == "ICE":
-                temp = None
                 try:
                     properties["Temperature" + appender]["initial temp"] = ice_get_temp(
                         select=1
@@ -1487,26 +798,16 @@ class Instruments:
                         "TEMPERATURE"
                         + appender
                         + ": connected T="
-                        + str(ice_get_temp(select=1))
+                        + str(properties["Temperature" + appender]["initial temp"])
                     )
                 except Exception:
                     properties["Temperature" + appender]["initial temp"] = 0
                     print("TEMPERATURE" + appender + ": failed to connect")
             if properties[inst_name]["name"] == "DEWAR":
-                temp = None
-                try:
-                    properties["Temperature" + appender]["initial temp"] = 4.2
-                    print("TEMPERATURE" + appender + ": ~connected~ 4.2K")
-                except Exception:
-                    properties["Temperature" + appender]["initial temp"] = 0
-                    print("TEMPERATURE" + appender + ": failed to connect")
+                properties["Temperature" + appender]["initial temp"] = 4.2
+                print("TEMPERATURE" + appender + ": ~connected~ 4.2K")
 
-        if instrument_num == 0:
-            self.temp = temp
-        if instrument_num > 0:
-            raise NotImplementedError(
-                "More than 1 temperature controller not supported yet"
-            )
+        self.add(inst_name, temp, instrument_num)
 
 
 #######################################################################
@@ -1514,6 +815,138 @@ class Instruments:
 #######################################################################
 
 
+class DataColumn:
+    """
+    Growable, typed column used by Data to store values without building
+    lists of python objects.
+
+    The dtype and per-row shape are inferred from the first stored value.
+    Scalars give a 1D buffer, arrays (ie: scope traces) give a buffer with
+    one row per store. The buffer is preallocated and doubled whenever it
+    fills up, so append() is amortized O(1). If a later value does not fit
+    the schema the column is promoted (ie: int -> float), or falls back to
+    an object column when the shape changes or strings are stored.
+
+    Missing cells (from preserve_pos_order) are tracked in a boolean mask.
+
+    Parameters
+    ----------
+    value : object
+        first value, used to infer the column schema.
+    missing : int, optional
+        number of missing cells to insert before value. The default is 0.
+    capacity : int, optional
+        initial number of preallocated rows. The default is 64.
+    """
+
+    def __init__(self, value, missing: int = 0, capacity: int = 64):
+        arr = np.asarray(value)
+        if arr.dtype.kind in "OUSV":
+            self.dtype = np.dtype(object)
+            self.shape = ()
+        else:
+            self.dtype = arr.dtype
+            self.shape = arr.shape
+        capacity = max(capacity, 2 * (missing + 1))
+        self.buffer = np.zeros((capacity,) + self.shape, dtype=self.dtype)
+        self.mask = np.zeros(capacity, dtype=bool)
+        self.has_missing = False
+        self.length = 0
+        for i in range(missing):
+            self.append_missing()
+        self.append(value)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def _grow(self):
+        capacity = 2 * len(self.buffer)
+        buffer = np.zeros((capacity,) + self.shape, dtype=self.dtype)
+        buffer[: self.length] = self.buffer[: self.length]
+        mask = np.zeros(capacity, dtype=bool)
+        mask[: self.length] = self.mask[: self.length]
+        self.buffer = buffer
+        self.mask = mask
+
+    def _to_object(self):
+        buffer = np.empty(len(self.buffer), dtype=object)
+        for i in range(self.length):
+            buffer[i] = self.buffer[i] if self.shape == () else self.buffer[i].copy()
+        self.buffer = buffer
+        self.dtype = buffer.dtype
+        self.shape = ()
+
+    def append(self, value):
+        if self.length == len(self.buffer):
+            self._grow()
+        if self.dtype.kind != "O":
+            arr = np.asarray(value)
+            if arr.dtype.kind in "OUSV" or arr.shape != self.shape:
+                self._to_object()
+            elif arr.dtype != self.dtype:
+                dtype = np.result_type(self.dtype, arr.dtype)
+                if dtype != self.dtype:
+                    self.buffer = self.buffer.astype(dtype)
+                    self.dtype = dtype
+        self.buffer[self.length] = value
+        self.length += 1
+
+    def append_missing(self):
+        if self.length == len(self.buffer):
+            self._grow()
+        self.buffer[self.length] = None if self.dtype.kind == "O" else 0
+        self.mask[self.length] = True
+        self.has_missing = True
+        self.length += 1
+
+    def values(self) -> np.ndarray:
+        """
+        zero-copy view of the stored values. If any cell is missing, a
+        numpy masked array wrapping the same buffers is returned instead.
+        """
+        view = self.buffer[: self.length]
+        if self.has_missing:
+            return np.ma.MaskedArray(view, mask=self.mask[: self.length], copy=False)
+        return view
+
+    def last(self):
+        if self.length == 0:
+            raise IndexError("column is empty")
+        if self.mask[self.length - 1]:
+            return np.ma.masked
+        return self.buffer[self.length - 1]
+
+    def tolist(self) -> list:
+        """list of the stored values, with missing cells as ''"""
+        res = self.buffer[: self.length].tolist()
+        if self.has_missing:
+            for i in np.flatnonzero(self.mask[: self.length]):
+                res[i] = ""
+        return res
+
+    def export(self) -> np.ndarray:
+        """
+        copy of the stored values. Missing cells are nan, so int and bool
+        columns with missing cells are exported as float (a filled 0 would
+        look like a measured value), NaT for datetimes and '' otherwise.
+        """
+        values = self.values()
+        if self.has_missing:
+            if self.dtype.kind in "fc":
+                return values.filled(np.nan)
+            if self.dtype.kind in "iub":
+                return values.astype(float).filled(np.nan)
+            if self.dtype.kind in "mM":
+                return values.filled(np.datetime64("NaT"))
+            return values.astype(object).filled("")
+        return values.copy()
+
+    def clear(self):
+        self.length = 0
+        self.mask[:] = False
+        self.has_missing = False
+
+
 class Data:
     """
     The data class is used to store and save any collected data
@@ -1523,7 +956,9 @@ class Data:
     data in a .mat file is stored. the only way to append to a mat file is
     to read the whole file into a python dictionary, modify, then re-write
     the entire thing, which defeats the purpose of "autosaving" to minimize
-    memory usage.
+    memory usage. Use file_type='h5' instead: every autosave then appends
+    only the new rows to chunked HDF5 datasets (requires h5py), and
+    hdf5_to_mat() converts the finished file for MATLAB.
 
     Parameters
     ----------
@@ -1537,7 +972,7 @@ class Data:
     name : str, optional
         file name to save to. if a name is already provided in path, it is overridden by this. The default is None.
     file_type : str, optional
-        file type to save to. The default is 'csv'.
+        file type to save to, 'csv', 'mat' or 'h5'. The default is 'csv'.
     preserve_pos_order : bool, optional
         if store(v1=1,v2=2) then store(v2=3, v3=4) is called, by default v1
         and v4 will be compressed into the first line, while v2 will appear
@@ -1545,19 +980,24 @@ class Data:
         columns to fix this ordering. The default is False.
     connection : mariadb.connection, optional
         If you want to auto-log data to a database, then you can set a connection here.
-        Just remember to run connection.close() after you're done!
+        Rows are buffered by a DatabaseLogger and written in batches of
+        save_increment rows, and on save() and close().
+        Just remember to run close() and connection.close() after you're done!
     table_name : str, optional
         database table name
     logtime: bool, optional
         logs the time in the data dict along with other variables whenever store() is called
+    columnar : bool, optional
+        stores each key in a typed, preallocated numpy buffer (see DataColumn)
+        instead of a list of python objects. get() and last() then return
+        views of the buffers without copying. Set to False to get the old
+        list-of-objects behaviour. The default is True.
     Returns
     -------
     None.
 
     """
 
-    # data: dict[str,list[object]]
-    data: dict
     numcalls: int  # number of times store is called, reset to 0 when empty() is called
 
     # save_increment = how often to save csv when calling store, every time (1), every other time (2)
@@ -1573,11 +1013,15 @@ class Data:
         table_name: str = None,
         connection=None,
         logtime=False,
+        columnar: bool = True,
     ):
-        self.data = {}
+        self.columnar = columnar
+        # columnar: dict[str, DataColumn], otherwise dict[str, list[object]]
+        self.columns = {}
         self.numcalls = 0
         self.preserve_pos = preserve_pos_order
         self.connection = None
+        self.db_logger = None
         self.connectionattempts = 0
         if path is not None:
             if "." in path:
@@ -1609,8 +1053,9 @@ class Data:
                 """
                 SELECT COUNT(*)
                 FROM information_schema.tables
-                WHERE table_name = '{0}'
-                """.format(table_name.replace("'", "''"))
+                WHERE table_name = ?
+                """,
+                (table_name,),
             )
             if not cursor.fetchone()[0] == 1:
                 print(f"Table {table_name} does not exist.")
@@ -1618,74 +1063,105 @@ class Data:
             else:
                 self.connection = connection
                 self.dbtable_name = table_name
+                from qnnpy.functions.db import DatabaseLogger
+
+                # no flush timer thread, store() flushes full batches and
+                # save()/close() the rest
+                self.db_logger = DatabaseLogger(
+                    connection=connection, batch_size=save_increment, flush_interval=0
+                )
         self.logtime = logtime
 
+    def __getattr__(self, key: str):
+        # stored keys are also accessible as attributes, ie: data.v1
+        columns = self.__dict__.get("columns")
+        if columns is not None and key in columns:
+            return self.get(key)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{key}'")
+
+    @property
+    def data(self) -> dict:
+        """dict of every stored key and its values (views in columnar mode)"""
+        if self.columnar:
+            return {key: col.values() for key, col in self.columns.items()}
+        return self.columns
+
     def store(self, **kwargs):
         if self.logtime:
             kwargs["time"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
-        for key in kwargs:
-            if self.data.get(key) is not None:
-                self.data[key].append(kwargs[key])
+        columns = self.columns
+        for key, value in kwargs.items():
+            col = columns.get(key)
+            if col is not None:
+                col.append(value)
+            elif self.columnar:
+                missing = self.numcalls if self.preserve_pos else 0
+                columns[key] = DataColumn(value, missing=missing)
+            elif self.preserve_pos and self.numcalls > 0:
+                columns[key] = [""] * self.numcalls
+                columns[key].append(value)
             else:
-                if self.preserve_pos and self.numcalls > 0:
-                    self.data[key] = [""] * self.numcalls
-                    self.data[key].append(kwargs[key])
-                else:
-                    self.data[key] = [kwargs[key]]
-                exec(f"self.{key}=self.data['{key}']")
-        if self.connection is not None:
+                columns[key] = [value]
+        if self.db_logger is not None:
             try:
-                log_data_to_database(self.dbtable_name, self.connection, **kwargs)
-                self.connectionattempts = 0
+                self.database_result(self.db_logger.log(self.dbtable_name, **kwargs))
             except Exception as e:
-                self.connectionattempts += 1
                 print(f"Data failed to log to database: {e}")
-                if (
-                    self.connectionattempts > 10
-                ):  # times out connection after 10 failed attempts
-                    print(
-                        "\033[1;31;49mDatabase connection has timed out, closing connection...\033[1;37;49m"
-                    )
-                    try:
-                        self.connection.close()
-                    except Exception:
-                        pass
-                    self.connection = None
-        if self.preserve_pos and len(kwargs) < len(self.data):
-            for key in self.data:
-                if kwargs.get(key) is None:
-                    self.data[key].append("")
+                self.database_result(False)
+        if self.preserve_pos and len(kwargs) < len(columns):
+            for key, col in columns.items():
+                if key not in kwargs:
+                    if self.columnar:
+                        col.append_missing()
+                    else:
+                        col.append("")
+        # counted before an autosave empties the columns, so rows stored
+        # after it are padded from the start of the new chunk
+        self.numcalls += 1
         if self.autosave:
             self.save_increment_counter += 1
             if self.save_increment_counter >= self.save_increment:
                 self.save(path=self.save_loc)
-                if self.connection is not None:
-                    try:
-                        self.connection.commit()
-                        self.connectionattempts = 0
-                    except Exception as e:
-                        self.connectionattempts += 1
-                        print(f"Data failed to commit to database: {e}")
-                        if (
-                            self.connectionattempts > 10
-                        ):  # times out connection after 10 failed attempts
-                            print(
-                                "\033[1;31;49mDatabase connection has timed out, closing connection...\033[1;37;49m"
-                            )
-                            try:
-                                self.connection.close()
-                            except Exception:
-                                pass
-                            self.connection = None
                 self.empty()
                 self.save_increment_counter = 0
-        self.numcalls += 1
+
+    def database_result(self, success: bool):
+        """counts failed database writes, and drops the connection after 10 in a row"""
+        if success:
+            self.connectionattempts = 0
+            return
+        self.connectionattempts += 1
+        print("Data failed to log to database")
+        if (
+            self.connectionattempts > 10
+        ):  # times out connection after 10 failed attempts
+            print(
+                "\033[1;31;49mDatabase connection has timed out, closing connection...\033[1;37;49m"
+            )
+            self.db_logger.closed.set()
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+            self.db_logger = None
+
+    def close(self):
+        """writes the rows still buffered for the database and stops logging
+        to it. The connection passed in is left open"""
+        if self.db_logger is not None:
+            self.db_logger.close()
+            self.db_logger = None
 
     def get(self, key: str) -> List[object]:
-        return self.data[key]
+        if self.columnar:
+            return self.columns[key].values()
+        return self.columns[key]
 
     def last(self, key: str) -> object:
-        return self.get(key)[-1]
+        if self.columnar:
+            return self.columns[key].last()
+        return self.columns[key][-1]
 
     def empty(self):
         """
@@ -1697,10 +1173,26 @@ class Data:
         None.
 
         """
-        for key in self.data:
-            self.data.get(key).clear()
+        for col in self.columns.values():
+            col.clear()
         self.numcalls = 0
 
+    def to_dict(self) -> dict:
+        """
+        copy of the stored data as a dict of numpy arrays (columnar) or
+        lists, ready to be passed to scipy.io.savemat.
+        missing cells are filled with nan for float columns.
+        """
+        if self.columnar:
+            return {key: col.export() for key, col in self.columns.items()}
+        return self.columns
+
+    def rows(self):
+        """iterates over the stored data row by row, as written to csv"""
+        if self.columnar:
+            return zip(*(col.tolist() for col in self.columns.values()))
+        return zip(*self.columns.values())
+
     def save(
         self,
         path: str = None,
@@ -1722,7 +1214,8 @@ class Data:
 
         also note: saving once to a .mat file works just fine, but attempting to
         append to a .mat file DOES NOT WORK. This also means that autosave does
-        not work with .mat files.
+        not work with .mat files. Appending to a .h5 file does work, and only
+        writes the rows currently stored (see append_hdf5).
 
         Parameters
         ----------
@@ -1731,13 +1224,15 @@ class Data:
         name : str, optional
             file name to use. if a name is already provided in path, it is overridden by this. The default is None.
         file_type : str, optional
-            file type. The default is 'csv'.
+            file type, 'csv', 'mat' or 'h5'. The default is 'csv'.
         override : bool, optional
             if to override previous file if it already exists. The default is False.
         Returns
         -------
         None
         """
+        if self.db_logger is not None:
+            self.database_result(self.db_logger.flush())
         if path is None and name is None and file_type == "csv":
             path = self.save_loc
         if path is not None and os.sep not in path:
@@ -1761,6 +1256,13 @@ class Data:
         if path is None:
             path = ""
         try:
+            if name.rsplit(".", 1)[1] in ("h5", "hdf5"):
+                from qnnpy.functions.saving import append_hdf5
+
+                append_hdf5(f"{path}{os.sep}{name}", self.to_dict(), override=override)
+                if printloc:
+                    print(f"{path}{os.sep}{name}")
+                return
             mode: str = "w"
             if os.path.exists(f"{path}{os.sep}{name}") and not override:
                 mode = "a"
@@ -1769,16 +1271,18 @@ class Data:
             # print(mode + " " + str(os.path.exists(f"{path}{os.sep}{name}")) + " " + f"{path}{os.sep}{name}")
             with open(f"{path}{os.sep}{name}", mode) as f:
                 if name.rsplit(".", 1)[1] == "mat":
+                    import scipy.io
+
                     # print(self.data)
                     if mode == "ab":
-                        scipy.io.savemat(f, mdict=self.data)
+                        scipy.io.savemat(f, mdict=self.to_dict())
                     else:
-                        scipy.io.savemat(f"{path}{os.sep}{name}", mdict=self.data)
+                        scipy.io.savemat(f"{path}{os.sep}{name}", mdict=self.to_dict())
                     return
                 writer = csv.writer(f)
                 if mode == "w":
-                    writer.writerow(self.data.keys())
-                writer.writerows(zip(*self.data.values()))
+                    writer.writerow(self.columns.keys())
+                writer.writerows(self.rows())
             if printloc:
                 print(f"{path}{os.sep}{name}")
         except IOError as e:
@@ -1789,10 +1293,77 @@ class Data:
             try:
                 with open("forced_data_save.csv", "a") as f:
                     writer = csv.writer(f)
-                    writer.writerow(self.data.keys())
-                    writer.writerows(zip(*self.data.values()))
+                    writer.writerow(self.columns.keys())
+                    writer.writerows(self.rows())
                 print("data saved at *this user*\\forced_data_save.csv")
             except Exception as e:
                 print(
                     f"Backup failed somehow, if you're seeing this things are really messed up: {e}"
                 )
+
+
+###############################################################################
+# Lazily imported helpers
+###############################################################################
+# Plotting, saving and database logging live in their own modules so that
+# importing qnnpy does not pull in matplotlib, scipy.io, yaml and mariadb.
+# They are still available as qf.plot, qf.save, qf.load_config, ... and are
+# imported the first time they are used.
+lazy_modules = {
+    "qnnpy.functions.plotting": [
+        "save_plot",
+        "save_multi_plots",
+        "LogLevel",
+        "plot",
+        "plot_new",
+        "LivePlotter",
+    ],
+    "qnnpy.functions.config": [
+        "load_config",
+        "check_sample_name",
+        "check_file_path",
+    ],
+    "qnnpy.functions.saving": [
+        "SaveWriter",
+        "save_writer",
+        "visa_trace",
+        "save_visa_trace",
+        "save",
+        "data_saver",
+        "append_hdf5",
+        "load_hdf5",
+        "hdf5_to_mat",
+        "lablog_error",
+        "lablog_measurement",
+        "output_log",
+    ],
+    "qnnpy.functions.db": [
+        "insert_measurement_event",
+        "database_config",
+        "database_connection",
+        "check_sql_name",
+        "DatabaseLogger",
+        "database_logger",
+        "log_data_to_database",
+        "update_table",
+        "get_column_names",
+        "insert_quotes",
+    ],
+    "qnnpy.functions.iv_analysis": ["analyze_iv", "isw_calc", "IvStream"],
+}
+lazy_names = {name: module for module, names in lazy_modules.items() for name in names}
+
+
+def __getattr__(name):
+    module = lazy_names.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(lazy_names))
@@ -5,6 +5,7 @@ import sys
 sys.path.append(r"Q:\qnnpy\qnnpy")
 
 import time
+from statistics import NormalDist
 
 import numpy as np
 from matplotlib import pyplot as plt
@@ -100,12 +101,78 @@ def gumbel_dist_error_fun(theta, data, min_prob=1e-2):
 
 def analyze_ic_values(ic_values):
     theta0 = [np.median(ic_values), np.std(ic_values) * 10]
-    thetaopt = fmin(gumbel_dist_error_fun, theta0, [ic_values])
+    thetaopt = fmin(gumbel_dist_error_fun, theta0, (ic_values,))
     ic = thetaopt[0]
     delta_ic = thetaopt[1]
     return ic, delta_ic
 
 
+def analyze_ic_sets(ic_values, confidence=0.95, tol=1e-9, max_iter=50):
+    """Maximum likelihood fit of gumbel_pdf to every row of ic_values at once.
+
+    ic_values is (n_sets, n_samples), or 1d for a single set; sets with fewer
+    samples are padded with nan. The scale is found by vectorized Newton
+    iterations on the likelihood equation, started from the method of moments
+    estimate, and the location follows from it in closed form. Confidence
+    intervals are from the Fisher information of the Gumbel distribution.
+
+    Returns a dict of arrays (floats for 1d input): ic, delta_ic (the
+    location and scale as returned by analyze_ic_values), ic_ci, delta_ic_ci
+    ((n_sets, 2) bounds), n_samples and converged.
+    """
+    x = np.asarray(ic_values, dtype=float)
+    single = x.ndim == 1
+    x = np.atleast_2d(x)
+    valid = np.isfinite(x)
+    n = valid.sum(1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(valid, x, 0).sum(1) / n
+        xc = np.where(valid, x - mean[:, None], 0)  # scale is shift invariant
+        std = np.sqrt((xc**2).sum(1) / n)
+        xmax = np.where(valid, xc, -np.inf).max(1)
+        shifted = np.where(valid, xc - xmax[:, None], -np.inf)
+
+        # Method of moments: std = pi*b/sqrt(6), mean = a - euler_gamma*b
+        b = std * np.sqrt(6) / np.pi
+        b[~(b > 0)] = np.nan
+        converged = np.zeros(len(x), dtype=bool)
+        for _ in range(max_iter):
+            # d(log L)/da = 0 gives a = b*log(mean(exp(x/b))), with it
+            # d(log L)/db = 0 becomes g(b) = b + mean(x) - E_w[x] = 0 with
+            # weights w = exp(x/b), and g'(b) = 1 + Var_w[x]/b**2
+            w = np.exp(shifted / b[:, None])
+            sw = w.sum(1)
+            w *= xc
+            m1 = w.sum(1) / sw
+            w *= xc
+            var = w.sum(1) / sw - m1**2
+            step = (b - m1) / (1 + var / b**2)
+            b_new = b - step
+            b = np.where(b_new > 0, b_new, b / 2)
+            converged = np.abs(step) <= tol * b
+            if np.all(converged | np.isnan(b)):
+                break
+        w = np.exp(shifted / b[:, None])
+        a = mean + xmax + b * np.log(w.sum(1) / n)
+
+        # Inverse Fisher information per sample: var(a) = b**2*(1 + 6*(1 -
+        # euler_gamma)**2/pi**2), var(b) = b**2*6/pi**2
+        sigma_a = b * np.sqrt((1 + 6 * (1 - np.euler_gamma) ** 2 / np.pi**2) / n)
+        sigma_b = b * np.sqrt(6 / np.pi**2 / n)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    result = {
+        "ic": a,
+        "delta_ic": b,
+        "ic_ci": np.stack([a - z * sigma_a, a + z * sigma_a], 1),
+        "delta_ic_ci": np.stack([b - z * sigma_b, b + z * sigma_b], 1),
+        "n_samples": n,
+        "converged": converged,
+    }
+    if single:
+        result = {key: value[0] for key, value in result.items()}
+    return result
+
+
 def calc_ramp_rate(vpp, R, repetition_hz, wf="HEARTBEAT"):
     if wf.upper() == "HEARTBEAT":
         T = 1.0 / repetition_hz
@@ -0,0 +1,205 @@
+"""Columnar archive of the ICE oxford temperature logs.
+
+The daily Results/YYYY-MM-DD/YYYY-MM-DD.log text files are converted once
+into two .npy files per day, the epoch time (int64) and the four
+temperatures (float32), and index.json with the time range, number of rows
+and source file size of every day. Queries memory map only the days in the
+range and binary search their epoch times, so a month of data loads in
+milliseconds instead of parsing every line again.
+
+    archive = IceArchive(r"S:\\SC\\InstrumentLogging\\Cryogenics\\Ice\\ice-log\\Results")
+    epoch, temps = archive.query("2021-03-30", "2021-04-03", max_points=100000)
+    plt.plot(local_datetime64(epoch), temps)
+
+A day is converted again when its log file changed size, ie: today's log.
+"""
+
+import datetime
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+day_pattern = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# columns of a log line: date, time, epoch time, date time, T1, T2, T3, T4, ...
+log_columns = (2, 4, 5, 6, 7)
+
+
+def parse_log(file_name):
+    """Reads the epoch times (int64) and temperatures ((n, 4) float32) of a
+    daily ICE log, malformed lines are skipped"""
+    try:
+        values = np.loadtxt(
+            file_name, delimiter=",", usecols=log_columns, ndmin=2, comments=None
+        )
+    except ValueError:  # a half written or corrupted line, go line by line
+        rows = []
+        with open(file_name) as f:
+            for line in f:
+                cells = line.split(",")
+                try:
+                    rows.append([float(cells[i]) for i in log_columns])
+                except (ValueError, IndexError):
+                    continue
+        values = np.array(rows, dtype=float).reshape(-1, len(log_columns))
+    order = np.argsort(values[:, 0], kind="stable")
+    values = values[order]
+    return values[:, 0].astype(np.int64), values[:, 1:].astype(np.float32)
+
+
+def to_epoch(value) -> int:
+    """Epoch seconds of an epoch number, a datetime or a YYYY-MM-DD string
+    (local midnight)"""
+    if isinstance(value, str):
+        value = datetime.datetime.strptime(value, "%Y-%m-%d")
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if isinstance(value, datetime.datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def local_datetime64(epoch):
+    """Local wall clock datetime64[s] of epoch times, as in the log files.
+    The UTC offset is looked up once per hour of data."""
+    epoch = np.asarray(epoch, dtype=np.int64)
+    if epoch.size == 0:
+        return epoch.astype("datetime64[s]")
+    hours = epoch // 3600
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(hours)) + 1])
+    offsets = [time.localtime(int(hours[s]) * 3600).tm_gmtoff for s in starts]
+    offsets = np.repeat(offsets, np.diff(np.append(starts, epoch.size)))
+    return (epoch + offsets).astype("datetime64[s]")
+
+
+class IceArchive:
+    """
+    Indexed, memory mapped archive of the daily ICE logs.
+
+    Parameters
+    ----------
+    results : str
+        folder with the YYYY-MM-DD/YYYY-MM-DD.log files.
+    archive : str, optional
+        folder for the converted days and index.json. The default is
+        results + "_archive" next to it.
+    """
+
+    def __init__(self, results: str, archive: str = None):
+        self.results = results
+        self.archive = archive or results.rstrip("\\/") + "_archive"
+        self.index_file = os.path.join(self.archive, "index.json")
+        # day -> {"rows", "first", "last", "size"}
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+
+    def log_file(self, day: str) -> str:
+        return os.path.join(self.results, day, day + ".log")
+
+    def days(self) -> list:
+        """Days with a log folder in results"""
+        return sorted(d for d in os.listdir(self.results) if day_pattern.match(d))
+
+    def save_index(self):
+        temp = self.index_file + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(temp, self.index_file)
+
+    def convert(self, day: str) -> dict:
+        """Converts the log of day and returns its index entry"""
+        file_name = self.log_file(day)
+        size = os.path.getsize(file_name)
+        epoch, temps = parse_log(file_name)
+        os.makedirs(self.archive, exist_ok=True)
+        for name, values in (("epoch", epoch), ("temp", temps)):
+            path = os.path.join(self.archive, f"{day}.{name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, values)
+            os.replace(path + ".tmp", path)
+        entry = {
+            "rows": len(epoch),
+            "first": int(epoch[0]) if len(epoch) else None,
+            "last": int(epoch[-1]) if len(epoch) else None,
+            "size": size,
+        }
+        self.index[day] = entry
+        return entry
+
+    def update(self, days=None) -> list:
+        """Converts the days (default all) that are new or whose log changed,
+        returns the converted days"""
+        converted = []
+        for day in self.days() if days is None else days:
+            file_name = self.log_file(day)
+            if not os.path.exists(file_name):
+                continue
+            entry = self.index.get(day)
+            if entry is None or entry["size"] != os.path.getsize(file_name):
+                print(f"Converting ICE log {day}")
+                self.convert(day)
+                converted.append(day)
+        if converted:
+            self.save_index()
+        return converted
+
+    def load(self, day: str):
+        """Memory mapped epoch times and temperatures of one day"""
+        return tuple(
+            np.load(os.path.join(self.archive, f"{day}.{name}.npy"), mmap_mode="r")
+            for name in ("epoch", "temp")
+        )
+
+    def query(self, start=None, end=None, max_points: int = None, days=None):
+        """
+        Epoch times and temperatures between start and end.
+
+        Parameters
+        ----------
+        start, end : str, datetime or float, optional
+            YYYY-MM-DD (local midnight), datetime or epoch time, the range is
+            start <= t < end. The default is the whole archive.
+        max_points : int, optional
+            return at most about max_points rows by taking every n-th row,
+            for plotting. The default is all rows.
+        days : list, optional
+            only look at these days (YYYY-MM-DD), ie: to keep the day
+            selection of date_plot. The default is the days overlapping the
+            range.
+
+        Returns
+        -------
+        epoch : ndarray
+            int64 epoch times, see local_datetime64.
+        temps : ndarray
+            float32 (n, 4) temperatures T1-T4.
+
+        """
+        start = -np.inf if start is None else to_epoch(start)
+        end = np.inf if end is None else to_epoch(end)
+        self.update(days)
+        selected = []
+        for day in sorted(self.index if days is None else days):
+            entry = self.index.get(day)
+            if not entry or not entry["rows"]:
+                continue
+            if entry["last"] < start or entry["first"] >= end:
+                continue
+            epoch, temps = self.load(day)
+            lo, hi = np.searchsorted(epoch, [start, end])
+            if hi > lo:
+                selected.append((epoch, temps, lo, hi))
+        total = sum(hi - lo for _, _, lo, hi in selected)
+        step = 1
+        if max_points and total > max_points:
+            step = -(-total // max_points)
+        # copy out of the memory maps so the day files are not held open
+        epochs = [e[lo:hi:step] for e, _, lo, hi in selected]
+        temps = [t[lo:hi:step] for _, t, lo, hi in selected]
+        if not selected:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+        return np.concatenate(epochs), np.concatenate(temps)
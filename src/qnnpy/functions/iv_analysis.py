@@ -0,0 +1,277 @@
+"""Switching (Isw) and retrapping (Ir) current, normal resistance and hotspot
+current from IV sweeps.
+
+analyze_iv takes a stack of sweeps (n_sweeps, n_points) and evaluates all of
+them in one vectorized pass, IvStream gives the same figures for points that
+arrive one at a time or in chunks (adaptive sweeps, live plots) without going
+over the earlier points again. Both are available as qf.analyze_iv and
+qf.IvStream.
+
+A point counts as normal once |V| rises above v_threshold and as
+superconducting again once |V| drops below v_retrap, in between it keeps the
+previous state, so noise around a single threshold does not create switches.
+Isw is |I| at the last superconducting point before a switch, Ir is |I| at
+the first superconducting point after it, as in qf.iv_branch_adaptive.
+"""
+
+import numpy as np
+
+# running sums kept per sweep, see iv_sums
+sum_keys = (
+    "n_switch",
+    "isw_sum",
+    "isw_sumsq",
+    "n_retrap",
+    "ir_sum",
+    "ir_sumsq",
+    "n_normal",
+    "i_sum",
+    "v_sum",
+    "ii_sum",
+    "iv_sum",
+)
+
+
+def normal_state(v, initial, v_threshold=0.005, v_retrap=None):
+    """
+    Superconducting (False) or normal (True) state of every point.
+
+    Parameters
+    ----------
+    v : ndarray
+        device voltages, (n_sweeps, n_points).
+    initial : ndarray
+        state before the first point of each sweep, (n_sweeps,).
+    v_threshold : float, optional
+        |V| above which a point is normal. The default is 5 mV.
+    v_retrap : float, optional
+        |V| below which a point is superconducting again. The default is
+        v_threshold/2.
+
+    Returns
+    -------
+    ndarray
+        bool, (n_sweeps, n_points).
+
+    """
+    if v_retrap is None:
+        v_retrap = v_threshold / 2
+    v = np.abs(v)
+    # 1 normal, 0 superconducting, -1 in the hysteresis band (or nan)
+    marker = np.where(v > v_threshold, 1, np.where(v < v_retrap, 0, -1))
+    marker = np.concatenate([np.asarray(initial, dtype=int)[:, None], marker], 1)
+    # forward fill the last decided state over the hysteresis band
+    index = np.where(marker >= 0, np.arange(marker.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    return np.take_along_axis(marker, index, axis=1)[:, 1:] == 1
+
+
+def iv_sums(i, v, state, skip_first=False):
+    """
+    Running sums of the switching and retrapping currents and of the line fit
+    through the normal points, per sweep.
+
+    Parameters
+    ----------
+    i, v : ndarray
+        absolute device current and voltage, (n_sweeps, n_points).
+    state : ndarray
+        normal_state of the points.
+    skip_first : bool, optional
+        leave the first point out of the fit sums because it was already
+        counted, ie: the last point of the previous chunk. The default is
+        False.
+
+    Returns
+    -------
+    dict
+        sum_keys, each an array of n_sweeps.
+
+    """
+    switch = ~state[:, :-1] & state[:, 1:]
+    retrap = state[:, :-1] & ~state[:, 1:]
+    isw = np.where(switch, i[:, :-1], 0)
+    ir = np.where(retrap, i[:, 1:], 0)
+
+    normal = state & np.isfinite(i) & np.isfinite(v)
+    if skip_first:
+        normal[:, 0] = False
+    i_n = np.where(normal, i, 0)
+    v_n = np.where(normal, v, 0)
+    return {
+        "n_switch": switch.sum(1),
+        "isw_sum": isw.sum(1),
+        "isw_sumsq": (isw**2).sum(1),
+        "n_retrap": retrap.sum(1),
+        "ir_sum": ir.sum(1),
+        "ir_sumsq": (ir**2).sum(1),
+        "n_normal": normal.sum(1),
+        "i_sum": i_n.sum(1),
+        "v_sum": v_n.sum(1),
+        "ii_sum": (i_n**2).sum(1),
+        "iv_sum": (i_n * v_n).sum(1),
+    }
+
+
+def iv_results(sums):
+    """Isw, Ir, normal resistance and hotspot current from iv_sums, see
+    analyze_iv for the keys"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = {}
+        for name, n in (("isw", "n_switch"), ("ir", "n_retrap")):
+            count = sums[n]
+            mean = sums[name + "_sum"] / count
+            variance = np.maximum(sums[name + "_sumsq"] / count - mean**2, 0)
+            result[name] = np.where(count > 0, mean, np.nan)
+            result[name + "_std"] = np.where(count > 0, np.sqrt(variance), np.nan)
+            result[n] = count
+            # over every switch (retrap) of all sweeps
+            total = count.sum()
+            mean = sums[name + "_sum"].sum() / total if total else np.nan
+            variance = sums[name + "_sumsq"].sum() / total - mean**2 if total else 0
+            result[name + "_avg"] = mean
+            result[name + "_avg_std"] = np.sqrt(max(variance, 0)) if total else np.nan
+
+        # least squares line V = r_normal*(I - i_hotspot) through the normal points
+        n = sums["n_normal"]
+        denominator = n * sums["ii_sum"] - sums["i_sum"] ** 2
+        slope = (n * sums["iv_sum"] - sums["i_sum"] * sums["v_sum"]) / denominator
+        intercept = (sums["v_sum"] - slope * sums["i_sum"]) / n
+        fitted = (n > 1) & (denominator > 0) & (slope != 0)
+        result["r_normal"] = np.where(fitted, slope, np.nan)
+        result["i_hotspot"] = np.where(fitted, -intercept / slope, np.nan)
+    return result
+
+
+def analyze_iv(
+    i_read, v_read, sweeps: int = None, v_threshold: float = 0.005, v_retrap=None
+) -> dict:
+    """
+    Isw, Ir, normal resistance and hotspot current of a stack of IV sweeps in
+    one pass.
+
+    Parameters
+    ----------
+    i_read, v_read : array_like
+        device current and voltage, (n_sweeps, n_points) or the points of all
+        sweeps one after the other as taken by IvSweep.run_sweep.
+    sweeps : int, optional
+        number of sweeps in flat i_read, v_read. Ignored if they are 2d or
+        their length is not a multiple of it. The default is one sweep.
+    v_threshold : float, optional
+        |V| above which a point is normal. The default is 5 mV.
+    v_retrap : float, optional
+        |V| below which a point is superconducting again. The default is
+        v_threshold/2.
+
+    Returns
+    -------
+    dict
+        per sweep (arrays of n_sweeps, nan where not found):
+            isw, isw_std, n_switch: mean, std and number of switches
+            ir, ir_std, n_retrap: mean, std and number of retraps
+            r_normal: dV/dI of a line through the normal points
+            i_hotspot: current where that line reaches 0 V, the hotspot
+            current for a self-heating hotspot branch
+        over all sweeps (floats):
+            isw_avg, isw_avg_std, ir_avg, ir_avg_std
+
+    """
+    i = np.abs(np.asarray(i_read, dtype=float))
+    v = np.abs(np.asarray(v_read, dtype=float))
+    if i.ndim == 1:
+        rows = sweeps if sweeps and i.size % sweeps == 0 else 1
+        i = i.reshape(rows, -1)
+        v = v.reshape(rows, -1)
+    if i.shape[1] == 0:
+        return iv_results({key: np.zeros(i.shape[0]) for key in sum_keys})
+    initial = v[:, 0] > v_threshold
+    state = normal_state(v, initial, v_threshold, v_retrap)
+    return iv_results(iv_sums(i, v, state))
+
+
+def isw_calc(measurement) -> dict:
+    """
+    analyze_iv of the i_read, v_read of an IvSweep measurement (snspd,
+    ntron, resonators) with the sweep and v_threshold of its iv_sweep
+    section. Sets measurement.iv_analysis, isw (0 if it never switched) and
+    ir, and prints the mean and std of Isw over all switches.
+    """
+    iv_sweep = measurement.properties["iv_sweep"]
+    result = analyze_iv(
+        measurement.i_read,
+        measurement.v_read,
+        sweeps=iv_sweep.get("sweep", 1),
+        v_threshold=iv_sweep.get("v_threshold", 0.005),
+    )
+    measurement.iv_analysis = result
+    if not result["n_switch"].sum():
+        print("Could not calculate Isw. Isw set to 0")
+        measurement.isw = 0
+        return result
+    measurement.isw = result["isw_avg"]
+    print(
+        "Isw_avg = %.4f µA :--: Isw_std = %.4f µA"
+        % (measurement.isw * 1e6, result["isw_avg_std"] * 1e6)
+    )
+    if result["n_retrap"].sum():
+        measurement.ir = result["ir_avg"]
+    return result
+
+
+class IvStream:
+    """
+    analyze_iv for points that arrive during the sweep. update() takes the
+    new points only and keeps running sums, so every call costs the size of
+    the chunk, not of the whole sweep.
+
+        stream = qf.IvStream()
+        for ...:
+            stream.update(iread, vread)
+            print(stream.isw)
+    """
+
+    def __init__(self, v_threshold: float = 0.005, v_retrap=None):
+        self.v_threshold = v_threshold
+        self.v_retrap = v_retrap
+        self.reset()
+
+    def reset(self):
+        self.sums = {key: np.zeros(1) for key in sum_keys}
+        self.last = None  # (|i|, |v|, state) of the latest point
+        self.points = 0
+        self.result = iv_results(self.sums)
+
+    def update(self, i_read, v_read) -> dict:
+        """Adds one point or a chunk of points and returns the updated results,
+        see analyze_iv"""
+        i = np.abs(np.atleast_1d(np.asarray(i_read, dtype=float)))
+        v = np.abs(np.atleast_1d(np.asarray(v_read, dtype=float)))
+        if i.size == 0:
+            return self.result
+        if self.last is None:
+            initial = v[:1] > self.v_threshold
+        else:
+            last_i, last_v, initial = self.last
+            i = np.concatenate([[last_i], i])
+            v = np.concatenate([[last_v], v])
+        state = normal_state(v[None], initial, self.v_threshold, self.v_retrap)
+        chunk = iv_sums(i[None], v[None], state, skip_first=self.last is not None)
+        for key in sum_keys:
+            self.sums[key] = self.sums[key] + chunk[key]
+        self.last = (i[-1], v[-1], state[:, -1])
+        self.points += i.size if self.points == 0 else i.size - 1
+        self.result = iv_results(self.sums)
+        return self.result
+
+    @property
+    def normal(self) -> bool:
+        """State of the latest point"""
+        return bool(self.last is not None and self.last[2][0])
+
+    def __getattr__(self, key: str):
+        # isw, ir, r_normal, ... of the single stream as floats
+        result = self.__dict__.get("result")
+        if result is None or key not in result:
+            raise AttributeError(key)
+        return float(np.asarray(result[key]).ravel()[0])
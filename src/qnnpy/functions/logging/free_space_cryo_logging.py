@@ -4,6 +4,7 @@ Created on Thu Feb  2 16:27:34 2023
 
 @author: emmabat
 """
+import atexit
 import re
 import sys
 
@@ -46,6 +47,10 @@ sys.excepthook = show_exception_and_exit
 
 COM_PORT = 'COM3'
 
+# rows are buffered and written to the database every 5 minutes
+db = qf.DatabaseLogger(batch_size=10, flush_interval=300)
+atexit.register(db.close)
+
 try:
     temp_reader = Cryocon34("GPIB0::5")
 except:
@@ -89,8 +94,8 @@ with serial.Serial(COM_PORT, timeout=1) as ser:
             pressure, success = read_serial_pressure(ser)
             logging.info(f'read temperature, pressure success: T_A={tempA}, T_B={tempB}, pressure={pressure}')
             try:
-                qf.log_data_to_database(table_name='freespace_logging', channelA=tempA, channelB=tempB, pressure=pressure)
-                logging.info('write to database success')
+                db.log('freespace_logging', channelA=tempA, channelB=tempB, pressure=pressure)
+                logging.info('buffered database row')
             except Exception as e:
                 logging.error(f'failed to write to database: {repr(e)}')
         except Exception as e:
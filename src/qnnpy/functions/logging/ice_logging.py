@@ -1,32 +1,49 @@
+"""Imports the ICE cryostat logs (one .tdms file per day) into the ice_log
+table of the lab database.
+
+IceIngester watches the log directory and only reads what was appended to a
+file since the last poll, so the rows of the file LabVIEW is still writing
+reach the database within seconds. What was imported is kept in a JSON
+checkpoint file (size in bytes and rows per file) that is only updated after
+the rows were written, so a restart continues where the last run stopped.
+
+    python ice_logging.py
+"""
+
+import json
 import os
-import sys
-import tempfile
-import time
+import signal
+import threading
 from datetime import datetime
-from pathlib import Path
 
-import mariadb
 import nptdms
 import numpy as np
-import pandas as pd
-from mariadb import Connection
-from pandas.core.frame import DataFrame
 
 import qnnpy.functions.functions as qf
 
-
-def load_data_to_database(filename: str, table_name: str, connection: Connection):
-    conn = connection
-    file_path = os.path.join(filename)
-    file_path = file_path.replace("\\", "/")
-    cur = conn.cursor()
-    command = f"LOAD DATA LOCAL INFILE '{file_path}' IGNORE INTO TABLE `{table_name}` FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\n';"
-
-    try:
-        cur.execute(command)
-    except mariadb.IntegrityError:
-        pass
-    conn.commit()
+# TDMS channel of the "Data" group -> ice_log column
+channel_columns = {
+    "Unix Timestamp": "epochtime",
+    "1k": "T1",
+    "4k": "T2",
+    "50k": "T3",
+    "SORB": "T4",
+    "Needle Valve 1": "needlevalve",
+    "Circulation Pressure": "pressure",
+    "Dump Pressure": "dump_pressure",
+}
+table_columns = [
+    "epochtime",
+    "datetime",
+    "T1",
+    "T2",
+    "T3",
+    "T4",
+    "needlevalve",
+    "pressure",
+    "dump_pressure",
+    "diff_needlevalve",
+]
 
 
 def is_today(file_date: str) -> bool:
@@ -37,70 +54,6 @@ def is_today(file_date: str) -> bool:
         return False
 
 
-def import_tdms(file_path, needlevalve_last) -> DataFrame:
-    try:
-        with nptdms.TdmsFile.open(file_path) as tdms_file:
-            group = tdms_file["Data"]
-            data_dict = {}
-
-            for channel_name in group.channels():
-                if channel_name.name in [
-                    "Unix Timestamp",
-                    "1k",
-                    "4k",
-                    "50k",
-                    "SORB",
-                    "Needle Valve 1",
-                    "Dump Pressure",
-                    "Circulation Pressure",
-                ]:
-                    channel = group[channel_name.name]
-                    data_dict[channel_name.name] = channel[:]
-            if needlevalve_last is None:
-                needlevalve_last = data_dict["Needle Valve 1"][0]
-            data_dict["diff_needlevalve"] = np.diff(
-                np.concatenate(([needlevalve_last], data_dict["Needle Valve 1"]))
-            )
-            return format_data(data_dict), data_dict["Needle Valve 1"][-1]
-
-    except FileNotFoundError:
-        print("Error: File not found!")
-
-
-def format_data(data_dict: dict) -> DataFrame:
-    df = pd.DataFrame(data_dict)
-    df["date_time"] = pd.to_datetime(df["Unix Timestamp"], unit="s")
-    df["date_time"] = df["date_time"].dt.strftime("%Y-%m-%d %H:%M:%S")
-    df = df.iloc[:, [0, 9, 1, 2, 3, 4, 5, 7, 6, 8]]
-    df.columns = [
-        "epochtime",
-        "datetime",
-        "T1",
-        "T2",
-        "T3",
-        "T4",
-        "needlevalve",
-        "pressure",
-        "dump_pressure",
-        "diff_needlevalve",
-    ]
-    return df
-
-
-def export_to_csv(data_frame: DataFrame):
-    with tempfile.NamedTemporaryFile(mode="w", delete=False) as temp:
-        data_frame.to_csv(temp.name + ".log", index=False, header=False)
-        return temp.name + ".log"
-
-
-def write_table_to_database(data_frame: DataFrame, table_name: str, connection=None):
-    temp_file = export_to_csv(data_frame)
-    load_data_to_database(temp_file, table_name, connection)
-    Path(temp_file).unlink()
-    os.remove(temp_file[:-4])
-    return
-
-
 def files_in_directory(directory: str) -> list:
     file_types = ["tdms"]
     files = []
@@ -110,60 +63,235 @@ def files_in_directory(directory: str) -> list:
     return files
 
 
-def import_most_recent_tdms(directory: str) -> dict:
-    files = files_in_directory(directory)
-    files.sort()
-    most_recent_file = files[-1]
-    file_path = os.path.join(directory, most_recent_file)
-    return import_tdms(file_path)
-
-
 def get_uploaded_files(filename: str) -> list:
     with open(filename, "r") as file:
         files = file.read().splitlines()
     return files
 
 
-def update_uploaded_files(logfile: str, file: str):
-    with open(logfile, "a") as log:
-        log.write(file + "\n")
-    return
+def import_tdms(file_path, start=0, length=None, needlevalve_last=None) -> dict:
+    """Reads length rows (default all) of the channels in channel_columns
+    starting at row start. Only the segments holding those rows are read.
+    Returns a dict of column -> array in table_columns order, the datetime
+    column as datetime objects (UTC, like the epochtime)"""
+    with nptdms.TdmsFile.open(file_path) as tdms_file:
+        group = tdms_file["Data"]
+        channels = {c.name: c for c in group.channels()}
+        data = {
+            column: channels[name].read_data(start, length)
+            for name, column in channel_columns.items()
+        }
+    return to_columns(data, needlevalve_last)
+
+
+def to_columns(data: dict, needlevalve_last=None) -> dict:
+    rows = min(len(values) for values in data.values())
+    data = {column: np.asarray(values[:rows]) for column, values in data.items()}
+    if needlevalve_last is None and rows:
+        needlevalve_last = data["needlevalve"][0]
+    data["diff_needlevalve"] = np.diff(data["needlevalve"], prepend=needlevalve_last)
+    # whole seconds, as the table column
+    seconds = data["epochtime"].astype("int64").astype("datetime64[s]")
+    data["datetime"] = seconds.astype(object)
+    return {column: data[column] for column in table_columns}
+
+
+class IceIngester:
+    """
+    Incremental import of the ICE .tdms logs into the database.
+
+    poll() checks the size of every log file, and reads only the rows
+    appended since the last poll for the files that grew, chunk_rows at a
+    time. The rows go to the database as parameterized executemany() inserts
+    through qf.DatabaseLogger. A file is marked done (and not opened again)
+    once a newer file exists and all its rows are in the database.
+
+    Parameters
+    ----------
+    directory : str
+        folder with the YYYY_MM_DD*.tdms log files.
+    table_name : str
+        database table, ie: ice_log.
+    checkpoint_file : str
+        JSON file with the rows imported per file.
+    uploaded_files : str, optional
+        uploaded_files.txt of the previous importer, the files listed there
+        are marked done on the first run. The default is None.
+    logger : qf.DatabaseLogger, optional
+        The default is a new one without flush timer that skips rows already
+        in the table (ignore_duplicates).
+    chunk_rows : int, optional
+        rows read and written at a time, bounds the memory used. The default
+        is 10000.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        table_name: str,
+        checkpoint_file: str,
+        uploaded_files: str = None,
+        logger=None,
+        chunk_rows: int = 10000,
+    ):
+        self.directory = directory
+        self.table_name = table_name
+        self.checkpoint_file = checkpoint_file
+        self.chunk_rows = chunk_rows
+        self.logger = logger
+        if self.logger is None:
+            # rows already in ice_log (a crash between a flush and its
+            # checkpoint) are skipped, as LOAD DATA ... IGNORE did
+            self.logger = qf.DatabaseLogger(
+                batch_size=chunk_rows, flush_interval=0, ignore_duplicates=True
+            )
+        self.stopped = threading.Event()
+        # file name -> {"size", "rows", "needlevalve", "done"}
+        self.checkpoints = {}
+        if os.path.exists(checkpoint_file):
+            with open(checkpoint_file) as f:
+                self.checkpoints = json.load(f)
+        elif uploaded_files is not None and os.path.exists(uploaded_files):
+            for file in get_uploaded_files(uploaded_files):
+                self.checkpoints[file] = {"done": True}
+        # checkpoints of rows buffered in the logger but not yet written
+        self.pending = {}
+
+    def save_checkpoints(self):
+        temp = self.checkpoint_file + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.checkpoints, f, indent=1)
+        os.replace(temp, self.checkpoint_file)
+
+    def flush(self) -> bool:
+        """Writes the buffered rows, then their checkpoints"""
+        if not self.logger.flush():
+            return False
+        if self.pending:
+            self.checkpoints.update(self.pending)
+            self.pending = {}
+            self.save_checkpoints()
+        return True
 
+    def poll(self) -> int:
+        """Imports everything new in the directory, returns the rows written"""
+        if not self.flush():  # database still down, don't read further
+            return 0
+        entries = sorted(
+            (entry.name, entry.stat().st_size)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".tdms")
+        )
+        written = 0
+        needlevalve = None
+        for n, (file, size) in enumerate(entries):
+            checkpoint = self.checkpoints.get(file, {"size": 0, "rows": 0})
+            if checkpoint.get("done"):
+                needlevalve = checkpoint.get("needlevalve", needlevalve)
+                continue
+            if size != checkpoint["size"]:
+                rows = self.import_file(file, size, checkpoint, needlevalve)
+                if rows is None:
+                    return written
+                written += rows
+                checkpoint = self.checkpoints.get(file, checkpoint)
+            if n < len(entries) - 1 and checkpoint["size"] == size:
+                checkpoint = dict(checkpoint, done=True)
+                self.checkpoints[file] = checkpoint
+                self.save_checkpoints()
+            needlevalve = checkpoint.get("needlevalve", needlevalve)
+            if self.stopped.is_set():
+                break
+        return written
+
+    def import_file(self, file, size, checkpoint, needlevalve=None):
+        """Reads the rows of file after the checkpoint and writes them, returns
+        the number of rows or None if the database could not be written"""
+        start = checkpoint["rows"]
+        needlevalve = checkpoint.get("needlevalve", needlevalve)
+        written = 0
+        try:
+            with nptdms.TdmsFile.open(os.path.join(self.directory, file)) as tdms:
+                channels = {c.name: c for c in tdms["Data"].channels()}
+                channels = {
+                    column: channels[name] for name, column in channel_columns.items()
+                }
+                # rows complete in every channel, a segment may be half written
+                total = min(len(channel) for channel in channels.values())
+                while start < total and not self.stopped.is_set():
+                    length = min(self.chunk_rows, total - start)
+                    data = to_columns(
+                        {c: ch.read_data(start, length) for c, ch in channels.items()},
+                        needlevalve,
+                    )
+                    rows = list(zip(*(data[c].tolist() for c in table_columns)))
+                    start += len(rows)
+                    needlevalve = rows[-1][table_columns.index("needlevalve")]
+                    self.pending[file] = {
+                        "size": checkpoint["size"],
+                        "rows": start,
+                        "needlevalve": needlevalve,
+                    }
+                    self.logger.log_rows(self.table_name, table_columns, rows)
+                    if not self.flush():
+                        print(f"{file}: database write failed, retrying later")
+                        return None
+                    written += len(rows)
+        except (OSError, KeyError, ValueError) as e:
+            # missing channel or a file LabVIEW is in the middle of writing
+            print(f"{file}: could not read ({e}), retrying later")
+            return written
+        if start >= total:
+            self.checkpoints[file] = {
+                "size": size,
+                "rows": start,
+                "needlevalve": needlevalve,
+            }
+            self.save_checkpoints()
+        if written:
+            print(f"{file}: imported {written} rows ({start} total)")
+        return written
+
+    def run(self, interval: float = 5):
+        """Polls every interval seconds until stop()"""
+        while not self.stopped.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"ice log import failed: {e}")
+            self.stopped.wait(interval)
+        self.flush()
+
+    def stop(self, *args):
+        self.stopped.set()
 
-def check_and_import_tdms(directory: str, logfile: str, table_name: str):
-    uploaded_files = get_uploaded_files(logfile)
-    files = files_in_directory(directory)
-    files.sort()
 
+def check_and_import_tdms(directory: str, logfile: str, table_name: str):
+    """Imports the new rows once, with the checkpoints kept next to logfile
+    (the uploaded_files.txt of the previous importer)"""
+    checkpoint_file = os.path.join(os.path.dirname(logfile), "ice_checkpoints.json")
+    ingester = IceIngester(directory, table_name, checkpoint_file, logfile)
     try:
-        conn = qf.database_connection()
-        conn.auto_reconnect = True
-    except mariadb.Error as e:
-        print(f"Error connecting to the database: {e}")
-        sys.exit(1)
-
-    for file in files:
-        if file not in uploaded_files:
-            print(f"Importing: {file}")
-            file_path = os.path.join(directory, file)
-            file_date = file[0:10]
-
-            data_frame = import_tdms(file_path)
-            write_table_to_database(data_frame, table_name, conn)
-
-            update_uploaded_files(logfile, file)
-            time.sleep(5)
-
-    conn.close()
-    return
+        ingester.poll()
+    finally:
+        ingester.logger.close()
 
 
 if __name__ == "__main__":
     LOG_DIRECTORY = r"S:\SC\InstrumentLogging\Cryogenics\Ice\ice-log\Logs"
     LOG_FILE = r"S:\SC\InstrumentLogging\Cryogenics\Ice\ice-log\uploaded_files.txt"
+    CHECKPOINT_FILE = (
+        r"S:\SC\InstrumentLogging\Cryogenics\Ice\ice-log\ice_checkpoints.json"
+    )
     TABLE_NAME = "ice_log"
 
-    check_and_import_tdms(LOG_DIRECTORY, LOG_FILE, TABLE_NAME)
+    ingester = IceIngester(LOG_DIRECTORY, TABLE_NAME, CHECKPOINT_FILE, LOG_FILE)
+    signal.signal(signal.SIGINT, ingester.stop)
+    signal.signal(signal.SIGTERM, ingester.stop)
+    try:
+        ingester.run()
+    finally:
+        ingester.logger.close()
 
 
 # --------------------------------------------------------------------------------------------
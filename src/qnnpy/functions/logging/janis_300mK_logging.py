@@ -5,6 +5,7 @@ Created on Mon Jan 23 10:38:22 2023
 @author: omedeiro
 """
 
+import atexit
 import sys
 from time import sleep
 
@@ -14,6 +15,10 @@ from qnnpy.instruments.lakeshore336 import Lakeshore336
 
 # https://stackoverflow.com/questions/59125493/how-to-constantly-run-python-script-in-the-background-on-windows
 
+# rows are buffered and written to the database once a minute
+db = qf.DatabaseLogger(batch_size=10, flush_interval=60)
+atexit.register(db.close)
+
 
 while True:
     try:
@@ -36,8 +41,8 @@ while True:
     # ls1.read_temp('D')
 
     try:
-        qf.log_data_to_database(
-            table_name="janis_300mK_logging",
+        db.log(
+            "janis_300mK_logging",
             stage_3K=stage_3K,
             stage_40K=stage_40K,
             stage_SORB=stage_SORB,
@@ -0,0 +1,363 @@
+"""Temperature (and pressure) logging of every cryostat of a computer in one
+process, configured by a yaml file:
+
+    python -m qnnpy.functions.logging.logging_daemon logging.yml [LOG_LEVEL]
+
+see docs/examples/config/logging_daemon_example.yml. It replaces the
+probe_station, free_space_cryo, janis_300mK and ice logging scripts.
+
+Each table of the config is read by its own thread at its own interval, the
+readings of different instruments of a row are taken concurrently. Rows go
+through one qf.DatabaseLogger that writes them in batches; while the
+database is unreachable they are kept in a local spill file and written
+once it is back. An instrument that fails is reconnected with exponential
+backoff (1 s, 2 s, 4 s, ... up to max_backoff) instead of every interval, the
+rows of its table are skipped in the meantime.
+"""
+
+import datetime
+import logging
+import signal
+import sys
+import threading
+import time
+
+import qnnpy.functions.functions as qf
+
+# reading method of the instruments of a kind, the channel is its argument
+default_methods = {"Temperature": "read_temp", "Pressure": "read_pressure"}
+
+
+class Connection:
+    """
+    One instrument of the Instruments section, opened on first use.
+
+    Parameters
+    ----------
+    name : str
+        key of the instrument in the config, ie: ls1.
+    driver : str
+        registered driver name, ie: Lakeshore336.
+    port : str
+        VISA resource.
+    kind : str, optional
+        registry kind. The default is Temperature.
+    min_backoff, max_backoff : float, optional
+        first and longest wait (s) before reconnecting after a failure. The
+        defaults are 1 and 300.
+    """
+
+    def __init__(
+        self,
+        name,
+        driver,
+        port,
+        kind="Temperature",
+        min_backoff: float = 1,
+        max_backoff: float = 300,
+    ):
+        self.name = name
+        self.driver = driver
+        self.port = port
+        self.kind = kind
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.instrument = None
+        self.failures = 0
+        self.retry_time = 0.0
+        self.lock = threading.Lock()
+
+    def open(self):
+        from qnnpy.instruments import registry
+
+        if self.instrument is None:
+            self.instrument = registry.driver_class(self.kind, self.driver)(self.port)
+        elif self.failures:
+            self.instrument.reconnect()
+
+    def read(self, readings):
+        """
+        Takes readings, a list of (method, channel), channel None for methods
+        without argument. Returns their values, or None while the instrument
+        is failing or waiting to be reconnected.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now < self.retry_time:
+                return None
+            try:
+                self.open()
+                values = [
+                    getattr(self.instrument, method)(
+                        *(() if channel is None else (channel,))
+                    )
+                    for method, channel in readings
+                ]
+            except Exception as e:
+                self.failures += 1
+                delay = min(
+                    self.min_backoff * 2 ** (self.failures - 1), self.max_backoff
+                )
+                self.retry_time = now + delay
+                logging.error(
+                    f"{self.name} ({self.port}): {e!r}, reconnecting in {delay:g} s"
+                )
+                return None
+            if self.failures:
+                logging.warning(f"{self.name} ({self.port}): reconnected")
+                self.failures = 0
+            return values
+
+    def close(self):
+        with self.lock:
+            if self.instrument is not None:
+                try:
+                    self.instrument.close()
+                except Exception:
+                    pass
+
+
+class TableLogger:
+    """
+    Reads the columns of one table every interval and logs them as a row.
+
+    Parameters
+    ----------
+    table_name : str
+        database table.
+    columns : dict
+        column -> (Connection, method, channel).
+    db : qf.DatabaseLogger
+    interval : float, optional
+        time between rows (s). The default is 10.
+    time_column : str, optional
+        column for the local time of the reading. The default is None, the
+        database fills in the time.
+    """
+
+    def __init__(self, table_name, columns, db, interval=10, time_column=None):
+        self.table_name = table_name
+        self.columns = columns
+        self.db = db
+        self.interval = interval
+        self.time_column = time_column
+        self.stopped = threading.Event()
+        self.thread = None
+        # Connection -> [(column, method, channel)]
+        self.groups = {}
+        for column, (connection, method, channel) in columns.items():
+            self.groups.setdefault(connection, []).append((column, method, channel))
+
+    def read_row(self) -> dict:
+        """Values of every column, None if a reading failed"""
+        calls = [
+            (connection.read, [(method, channel) for _, method, channel in readings])
+            for connection, readings in self.groups.items()
+        ]
+        if len(calls) == 1:
+            results = [calls[0][0](calls[0][1])]
+        else:
+            from qnnpy.instruments.visa_transport import run_concurrently
+
+            results = run_concurrently(*calls)
+        row = {}
+        for readings, values in zip(self.groups.values(), results):
+            if values is None:
+                return None
+            for (column, _, _), value in zip(readings, values):
+                try:
+                    row[column] = float(value)
+                except (TypeError, ValueError):  # ie: Cryocon "no reading"
+                    logging.warning(f"{self.table_name}.{column}: read {value!r}")
+                    return None
+        return row
+
+    def log_row(self):
+        now = datetime.datetime.now()
+        row = self.read_row()
+        if row is None:
+            return False
+        if self.time_column:
+            row[self.time_column] = now
+        self.db.log(self.table_name, **row)
+        logging.info(f"{self.table_name}: {row}")
+        return True
+
+    def run(self):
+        """Logs a row every interval until stop(), at a fixed rate"""
+        next_time = time.monotonic()
+        while not self.stopped.is_set():
+            try:
+                self.log_row()
+            except Exception as e:
+                logging.error(f"{self.table_name}: {e!r}")
+            next_time += self.interval
+            now = time.monotonic()
+            if next_time < now:  # a slow reading, skip the missed rows
+                next_time = now
+            self.stopped.wait(next_time - now)
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name=f"qnnpy-log-{self.table_name}", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self, *args):
+        self.stopped.set()
+
+
+def column_reading(spec, connections):
+    """
+    (Connection, method, channel) of a column of the config, either
+    "instrument channel", "instrument" or
+    {instrument: ..., method: ..., channel: ...}.
+    """
+    if isinstance(spec, dict):
+        name = spec["instrument"]
+        method = spec.get("method")
+        channel = spec.get("channel")
+    else:
+        name, _, channel = str(spec).partition(" ")
+        method = None
+        channel = channel.strip() or None
+    if name not in connections:
+        raise NameError(f"instrument {name} is not in the Instruments section")
+    connection = connections[name]
+    if method is None:
+        method = default_methods.get(connection.kind)
+        if method is None:
+            raise ValueError(f"no reading method given for {name}")
+    return connection, method, channel
+
+
+class LoggingDaemon:
+    """
+    Every table and the ICE import of a logging config.
+
+    Parameters
+    ----------
+    parameters : dict
+        the loaded config, see docs/examples/config/logging_daemon_example.yml.
+    db : qf.DatabaseLogger, optional
+        The default is one built from the Database section.
+    """
+
+    def __init__(self, parameters: dict, db=None):
+        self.parameters = parameters
+        database = dict(parameters.get("Database") or {})
+        database.setdefault("spill_file", "logging_spill.jsonl")
+        self.db = db if db is not None else qf.DatabaseLogger(**database)
+        self.connections = {}
+        for name, instrument in (parameters.get("Instruments") or {}).items():
+            backoff = {
+                key: instrument[key]
+                for key in ("min_backoff", "max_backoff")
+                if key in instrument
+            }
+            self.connections[name] = Connection(
+                name,
+                instrument["name"],
+                instrument["port"],
+                instrument.get("kind", "Temperature"),
+                **backoff,
+            )
+        self.tables = []
+        for table_name, table in (parameters.get("Tables") or {}).items():
+            columns = {
+                column: column_reading(spec, self.connections)
+                for column, spec in table["columns"].items()
+            }
+            self.tables.append(
+                TableLogger(
+                    table_name,
+                    columns,
+                    self.db,
+                    table.get("interval", 10),
+                    table.get("time_column"),
+                )
+            )
+        self.ice = None
+        self.ice_interval = 5
+        self.ice_thread = None
+        if parameters.get("ICE"):
+            # nptdms is only needed on the ICE computer
+            from qnnpy.functions.logging.ice_logging import IceIngester
+
+            ice = dict(parameters["ICE"])
+            self.ice_interval = ice.pop("interval", self.ice_interval)
+            self.ice = IceIngester(
+                ice["directory"],
+                ice.get("table", "ice_log"),
+                ice["checkpoint_file"],
+                ice.get("uploaded_files"),
+            )
+        self.stopped = threading.Event()
+
+    def start(self):
+        for table in self.tables:
+            table.start()
+        if self.ice is not None:
+            self.ice_thread = threading.Thread(
+                target=self.ice.run,
+                args=(self.ice_interval,),
+                name="qnnpy-log-ice",
+                daemon=True,
+            )
+            self.ice_thread.start()
+        return self
+
+    def stop(self, *args):
+        self.stopped.set()
+        for table in self.tables:
+            table.stop()
+        if self.ice is not None:
+            self.ice.stop()
+
+    def run(self):
+        """Logs until SIGINT/SIGTERM, then writes what is buffered"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.start()
+        names = [table.table_name for table in self.tables]
+        if self.ice is not None:
+            names.append(self.ice.table_name)
+        logging.warning(f"logging {', '.join(names)}")
+        try:
+            while not self.stopped.wait(1):
+                pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.stop()
+        for table in self.tables:
+            if table.thread is not None:
+                table.thread.join()
+        if self.ice_thread is not None:
+            self.ice_thread.join()
+            self.ice.logger.close()
+        for connection in self.connections.values():
+            connection.close()
+        self.db.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(
+            "usage: python -m qnnpy.functions.logging.logging_daemon CONFIG [LOG_LEVEL]"
+        )
+        return 2
+    level = argv[1] if len(argv) > 1 else "WARNING"
+    try:
+        logging.basicConfig(format="%(asctime)s %(message)s", level=level)
+    except ValueError:
+        logging.basicConfig(format="%(asctime)s %(message)s", level="ERROR")
+    LoggingDaemon(qf.load_config(argv[0])).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
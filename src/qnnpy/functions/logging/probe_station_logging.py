@@ -5,11 +5,11 @@ Created on Mon Jan 23 10:38:22 2023
 @author: omedeiro, davide, reedf
 """
 
+import atexit
 import sys
 from time import sleep
 
 import logging
-import pyvisa
 
 import qnnpy.functions.functions as qf
 from qnnpy.instruments.lakeshore336 import Lakeshore336
@@ -29,6 +29,10 @@ try:
 except Exception:
     logging.basicConfig(format="%(asctime)s %(message)s", level="ERROR")
 
+# rows are buffered and written to the database once a minute
+db = qf.DatabaseLogger(batch_size=6, flush_interval=60)
+atexit.register(db.close)
+
 ls1 = Lakeshore336("GPIB0::12::INSTR")
 ls2 = Lakeshore336("GPIB0::13::INSTR")
 
@@ -44,8 +48,8 @@ while True:
     try:
         T_sample_stage, T_4k_stage, T_sample_holder, T_rad_shield, T_second_shield = read_temps(ls1, ls2)
         try:
-            qf.log_data_to_database(
-                table_name="probe_station_logging",
+            db.log(
+                "probe_station_logging",
                 sample_stage=T_sample_stage,
                 fourK_stage=T_4k_stage,
                 sample_holder=T_sample_holder,
@@ -53,7 +57,7 @@ while True:
                 second_shield=T_second_shield,
             )
             logging.info(
-                f"Logged temperatures successfully: "
+                f"Logged temperatures: "
                 f"sample_stage={T_sample_stage}, "
                 f"4K_stage={T_4k_stage}, "
                 f"T_rad_shield={T_rad_shield}, "
@@ -65,14 +69,10 @@ while True:
         logging.error(f"problem connecting to lakeshore: {str(e)}")
         logging.info(f"attempting to reconnect")
         try:
-            ls1.pyvisa.close()
-            ls2.pyvisa.close()
-            # not sure if these sleeps are necessary (reedf)
-            sleep(1)
-            rm = pyvisa.ResourceManager()
+            # not sure if this sleep is necessary (reedf)
             sleep(1)
-            ls1.pyvisa = rm.open_resource("GPIB0::12::INSTR")
-            ls2.pyvisa = rm.open_resource("GPIB0::13::INSTR")
+            ls1.reconnect()
+            ls2.reconnect()
         except Exception as e:
             logging.error(f"problem reconnecting to lakeshore: {str(e)}")
 
@@ -31,237 +31,23 @@ class Microwave:
 
         self.R_srs = self.properties["iv_sweep"]["series_resistance"]
         self.isw = 0
-        self.instrument_list = []
 
         #######################################################################
         # Setup instruments
         #######################################################################
 
-        # Counter
-        if self.properties.get("Counter"):
-            self.instrument_list.append("Counter")
-            if self.properties["Counter"]["name"]:
-                if self.properties["Counter"]["name"] == "Agilent53131a":
-                    from qnnpy.instruments.agilent_53131a import Agilent53131a
-
-                    try:
-                        self.counter = Agilent53131a(self.properties["Counter"]["port"])
-                        # without the reset command this section will evaluate connected
-                        # even though the GPIB could be wrong
-                        # similary story for the other insturments
-                        self.counter.reset()
-                        self.counter.basic_setup()
-                        # self.counter.write(':EVEN:HYST:REL 100')
-                        print("COUNTER: connected")
-                    except Exception:
-                        print("COUNTER: failed to connect")
-                else:
-                    raise NameError(
-                        "Invalid counter. Counter name is not " "configured"
-                    )
-
-        # Attenuator
-        if self.properties.get("Attenuator"):
-            self.instrument_list.append("Attenuator")
-
-            if self.properties["Attenuator"]["name"] == "JDSHA9":
-                from qnnpy.instruments.jds_ha9 import JDSHA9
-
-                try:
-                    self.attenuator = JDSHA9(self.properties["Attenuator"]["port"])
-                    self.attenuator.set_beam_block(True)
-                    print("ATTENUATOR: connected")
-                except Exception:
-                    print("ATTENUATOR: failed to connect")
-            else:
-                raise NameError("Invalid Attenuator. Attenuator name is not configured")
-
-        # Scope
-        if self.properties.get("Scope"):
-            self.instrument_list.append("Scope")
-
-            if self.properties["Scope"]["name"] == "LeCroy620Zi":
-                from qnnpy.instruments.lecroy_620zi import LeCroy620Zi
-
-                try:
-                    self.scope = LeCroy620Zi(
-                        "TCPIP::%s::INSTR" % self.properties["Scope"]["port"]
-                    )
-                    self.scope_channel = self.properties["Scope"]["channel"]
-                    print("SCOPE: connected")
-                except Exception:
-                    print("SCOPE: failed to connect")
-            else:
-                raise NameError("Invalid Scope. Scope name is not configured")
-
-        # Meter
-        if self.properties.get("Meter"):
-            self.instrument_list.append("Meter")
-
-            if self.properties["Meter"]["name"] == "Keithley2700":
-                from qnnpy.instruments.keithley_2700 import Keithley2700
-
-                try:
-                    self.meter = Keithley2700(self.properties["Meter"]["port"])
-                    self.meter.reset()
-                    print("METER: connected")
-                except Exception:
-                    print("METER: failed to connect")
-
-            elif self.properties["Meter"]["name"] == "Keithley2400":
-                # this is a source meter
-                from qnnpy.instruments.keithley_2400 import Keithley2400
-
-                try:
-                    self.meter = Keithley2400(self.properties["Meter"]["port"])
-                    self.meter.reset()
-                    print("METER: connected")
-                except Exception:
-                    print("METER: failed to connect")
-
-            elif self.properties["Meter"]["name"] == "Keithley2001":
-                from qnnpy.instruments.keithley_2001 import Keithley2001
-
-                try:
-                    self.meter = Keithley2001(self.properties["Meter"]["port"])
-                    self.meter.reset()
-                    print("METER: connected")
-                except Exception:
-                    print("METER: failed to connect")
-            else:
-                raise NameError(
-                    'Invalid Meter. Meter name: "%s" is not configured'
-                    % self.properties["Meter"]["name"]
-                )
-
-        # Source
-        if self.properties.get("Source"):
-            self.instrument_list.append("Source")
-
-            if self.properties["Source"]["name"] == "SIM928":
-                from qnnpy.instruments.srs_sim928 import SIM928
-
-                try:
-                    self.source = SIM928(
-                        self.properties["Source"]["port"],
-                        self.properties["Source"]["port_alt"],
-                    )
-                    self.source.reset()
-                    print("SOURCE: connected")
-                except Exception:
-                    print("SOURCE: failed to connect")
-
-            elif self.properties["Source"]["name"] == "YokogawaGS200":
-                from qnnpy.instruments.yokogawa_gs200 import YokogawaGS200
-
-                try:
-                    self.source = YokogawaGS200(self.properties["Source"]["port"])
-                    # self.source.reset()
-                    self.source.set_output(False)
-                    self.source.set_voltage_range(5)
-                    print("SOURCE: connected")
-                except Exception:
-                    print("SOURCE: failed to connect")
+        self.inst = qf.Instruments(self.properties)
+        self.instrument_list = list(self.inst.instrument_list)
 
-            else:
-                raise NameError(
-                    'Invalid Source. Source name: "%s" is not configured'
-                    % self.properties["Source"]["name"]
-                )
-
-        # AWG
-        if self.properties.get("AWG"):
-            self.instrument_list.append("AWG")
-
-            if self.properties["AWG"]["name"] == "Agilent33250a":
-                from qnnpy.instruments.agilent_33250a import Agilent33250a
-
-                try:
-                    self.awg = Agilent33250a(self.properties["AWG"]["port"])
-                    self.awg.reset()
-                    print("AWG: connected")
-                except Exception:
-                    print("AWG: failed to connect")
-            else:
-                raise NameError(
-                    'Invalid AWG. AWG name: "%s" is not configured'
-                    % self.properties["AWG"]["name"]
-                )
-
-        # VNA
-        if self.properties.get("VNA"):
-            self.instrument_list.append("VNA")
-
-            if self.properties["VNA"]["name"] == "KeysightN5224a":
-                from qnnpy.instruments.keysight_n5224a import KeysightN5224a
-
-                try:
-                    self.VNA = KeysightN5224a(self.properties["VNA"]["port"])
-                    # self.VNA.reset()
-                    self.VNA.get_start()
-                    print("VNA: connected")
-                except Exception:
-                    print("VNA: failed to connect")
-            else:
-                raise NameError(
-                    'Invalid VNA. VNA name: "%s" is not configured'
-                    % self.properties["VNA"]["name"]
-                )
-
-        # Temperature Controller
-        if self.properties.get("Temperature"):
-            self.instrument_list.append("Temperature")
-
-            if self.properties["Temperature"]["name"] == "Cryocon350":
-                from qnnpy.instruments.cryocon350 import Cryocon350
-
-                try:
-                    self.temp = Cryocon350(self.properties["Temperature"]["port"])
-                    self.temp.channel = self.properties["Temperature"]["channel"]
-                    self.properties["Temperature"]["initial temp"] = (
-                        self.temp.read_temp(self.temp.channel)
-                    )
-                    print("TEMPERATURE: connected")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            elif self.properties["Temperature"]["name"] == "Cryocon34":
-                from qnnpy.instruments.cryocon34 import Cryocon34
-
-                try:
-                    self.temp = Cryocon34(self.properties["Temperature"]["port"])
-                    self.temp.channel = self.properties["Temperature"]["channel"]
-                    self.properties["Temperature"]["initial temp"] = (
-                        self.temp.read_temp(self.temp.channel)
-                    )
-                    print("TEMPERATURE: connected")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            elif self.properties["Temperature"]["name"] == "ICE":
-                try:
-                    self.properties["Temperature"]["initial temp"] = qf.ice_get_temp(
-                        select=1
-                    )
-                    print("TEMPERATURE: connected")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            elif self.properties["Temperature"]["name"] == "DEWAR":
-                try:
-                    self.properties["Temperature"]["initial temp"] = 4.2
-                    print("TEMPERATURE: ~connected~ 4.2K")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            else:
-                raise NameError(
-                    'Invalid Temperature Controller. TEMP name: "%s" is not configured'
-                    % self.properties["Temperature"]["name"]
-                )
-        else:
-            self.properties["Temperature"] = {"initial temp": "None"}
-            # print('TEMPERATURE: Not Specified')
+    def __getattr__(self, name):
+        # self.meter, self.temp, ... are the instruments of self.inst, which
+        # connects them on first use
+        inst = self.__dict__.get("inst")
+        if inst is None:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        return getattr(inst, name)
 
 
 class FrequencyResponse(Microwave):
@@ -302,10 +88,12 @@ class FrequencyResponse(Microwave):
             if plot:
                 self.plot(meas_alt)
             if save:
-                self.save(meas_alt)
+                self.save(meas_alt, background=True)
             self.VNA.write("CALC:FORM MLOG")
 
         self.VNA.set_sweep_mode("CONT")
+        if save:
+            qf.save_writer().flush()
 
     def plot(self, meas):
         full_path = qf.save(self.properties, "frequency_response")
@@ -351,7 +139,7 @@ class FrequencyResponse(Microwave):
             close=True,
         )
 
-    def save(self, meas):
+    def save(self, meas, background=False):
         data_dict = {
             "freq": self.f,
             "re": self.re,
@@ -367,6 +155,7 @@ class FrequencyResponse(Microwave):
             data_dict,
             instrument_list=self.instrument_list,
             meas_txt=meas,
+            background=background,
         )
 
 
@@ -430,12 +219,14 @@ class FrequencyResponseCurrentSweep(Microwave):
                 if plot:
                     self.plot(meas_alt)
                 if save:
-                    self.save(meas_alt)
+                    self.save(meas_alt, background=True)
                 self.VNA.write("CALC:FORM MLOG")
 
             self.VNA.set_sweep_mode("CONT")
 
         self.source.set_output(False)
+        if save:
+            qf.save_writer().flush()
 
     def plot(self, meas):
         full_path = qf.save(self.properties, "frequency_response_current_sweep")
@@ -483,7 +274,7 @@ class FrequencyResponseCurrentSweep(Microwave):
             close=True,
         )
 
-    def save(self, meas):
+    def save(self, meas, background=False):
         data_dict = {
             "freq": self.f,
             "re": self.re,
@@ -502,4 +293,5 @@ class FrequencyResponseCurrentSweep(Microwave):
             data_dict,
             instrument_list=self.instrument_list,
             meas_txt=meas,
+            background=background,
         )
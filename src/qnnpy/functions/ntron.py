@@ -31,6 +31,7 @@ class nTron:
         self.device_type = self.properties["Save File"]["device type"]
 
         self.isw = 0
+        self.ir = 0
         self.instrument_list = []
 
         self.R_srs = self.properties["iv_sweep"]["series_resistance"]
@@ -70,6 +71,8 @@ class IvSweep(nTron):
 
     """
 
+    isw_estimate = None
+
     def run_sweep_fixed(self):
         """Runs IV sweep with config paramters
         This constructs #steps between start and 75% of final current.
@@ -348,37 +351,19 @@ class IvSweep(nTron):
     #         self.v_read = voltage
     #         self.i_read = current
 
-    def isw_calc(self):
-        """Calculates critical current."""
-        """
-        Critical current is defined as the current one step before a voltage
-        reading greater than 5mV.
-        self.isw = self.i_read[np.argmax(np.array(self.v_read) > 0.005)-1]
-        print('%.4f uA' % (self.isw*1e6))
-        """
+    def run_sweep_adaptive(self):
+        """Runs IV sweeps that put their points near Isw and Ir, see
+        qf.run_sweep_adaptive.  Optional iv_sweep keys: [step_coarse],
+        [step_fine], [v_threshold], [tolerance], [isw_estimate]."""
+        qf.run_sweep_adaptive(self, self.inst.source, self.inst.meter)
+        self.i_set = self.v_set / self.R_srs
 
-        """ New method looks at differential and takes average of points that 
-        meet condition. Prints mean() and std().` std should be < 1-2µA
+    def isw_calc(self):
+        """Calculates switching and retrapping current of every sweep, see
+        qf.isw_calc. Prints mean() and std() over all switches, std should
+        be < 1-2µA.
         """
-        # isws = abs(self.i_read[np.where(abs(np.diff(self.i_read)/max(np.diff(self.i_read))) > 0.5)])
-        # self.isw = self.i_read[np.argmax(np.array(self.v_read) > 0.005)-1]
-        # print('%.4f uA' % (self.isw*1e6))
-
-        try:
-            switches = np.asarray(
-                np.where(abs(np.diff(self.i_read) / max(np.diff(self.i_read))) > 0.8),
-                dtype=int,
-            ).squeeze()
-            isws = abs(np.asarray([self.i_read[i] for i in switches]))
-            print(isws)
-            self.isw = isws.mean()
-            print(
-                "Isw_avg = %.4f µA :--: Isw_std = %.4f µA"
-                % (self.isw * 1e6, isws.std() * 1e6)
-            )
-        except Exception:
-            print("Could not calculate Isw. Isw set to 0")
-            self.isw = 0
+        qf.isw_calc(self)
 
     def plot(self):
         full_path = qf.save(self.properties, "iv_sweep")
@@ -1,5 +1,13 @@
+"""Plotting helpers, qf.plot and qf.LivePlotter are defined here and
+re-exported by qnnpy.functions.functions"""
+
 import datetime
+import os
+import sys
+import time
+from enum import Enum
 
+import numpy as np
 import scipy.io
 from matplotlib import pyplot as plt
 
@@ -61,3 +69,364 @@ def save_multi_plots(
     if show_plot is True:
         plt.show()
     plt.close()
+
+
+class LogLevel(Enum):
+    all_logs = 0
+    debugging = 1
+    warn = 2
+    error = 3
+    silent = 4
+
+
+def plot(
+    xdata,
+    ydata,
+    x_scale="linear",
+    y_scale="linear",
+    title="",
+    xlabel="",
+    ylabel="",
+    label="",
+    linestyle="o",
+    path="",
+    close=True,
+    show=True,
+):
+    """
+    update to using **kwargs https://book.pythontips.com/en/latest/args_and_kwargs.html
+
+    accepts arrays or lists of arrays. Scale is the same as plt.xscale().
+    If path is specified the figure will be saved to that location.
+    Close and Show are true by default.
+
+    """
+
+    if close:
+        plt.close()
+
+    if isinstance(ydata, list) and not isinstance(xdata, list):
+        if label:
+            for i in np.arange(0, len(ydata), 1):
+                plt.plot(xdata, ydata[i], linestyle, label=label[i])
+        else:
+            for i in np.arange(0, len(ydata), 1):
+                plt.plot(xdata, ydata[i], linestyle)
+
+    elif isinstance(ydata, list) and isinstance(xdata, list):
+        if label:
+            for i in np.arange(0, len(ydata), 1):
+                plt.plot(xdata[i], ydata[i], linestyle, label=label[i])
+        else:
+            for i in np.arange(0, len(ydata), 1):
+                plt.plot(xdata[i], ydata[i], linestyle)
+    else:
+        plt.plot(xdata, ydata, linestyle)
+
+    plt.xscale(x_scale)
+    plt.yscale(y_scale)
+
+    if xlabel:
+        plt.xlabel(xlabel)
+    if ylabel:
+        plt.ylabel(ylabel)
+    if title:
+        plt.title(title)
+    if label:
+        plt.legend()
+    if not path == "":
+        if isinstance(path, tuple):
+            path = path[0]
+        plt.savefig(path + ".png", bbox_inches="tight")
+        print("File Saved:\n %s" % path)
+    if show:  # show should always be after save
+        plt.show()
+    return plt
+
+
+def plot_new(x, y, **kwargs):
+    plt.plot(x, y)
+    for key, value in kwargs.items():
+        plt.__dict__[key](value)
+
+    return plt
+
+
+def minmax_decimate(x, y, buckets: int):
+    """
+    Reduces x, y to the first and last extreme (min and max of y) of each of
+    buckets equal runs of points, so a line drawn buckets pixels wide looks
+    the same as with every point. Returns x, y unchanged if they are shorter
+    than 2*buckets.
+    """
+    n = len(y)
+    if buckets < 1 or n <= 2 * buckets:
+        return x, y
+    size = n // buckets
+    m = size * buckets
+    runs = y[:m].reshape(buckets, size)
+    low = np.argmin(np.where(np.isnan(runs), np.inf, runs), axis=1)
+    high = np.argmax(np.where(np.isnan(runs), -np.inf, runs), axis=1)
+    offsets = np.arange(0, m, size)
+    index = np.stack([np.minimum(low, high), np.maximum(low, high)], 1)
+    index = np.concatenate([(index + offsets[:, None]).ravel(), np.arange(m, n)])
+    return x[index], y[index]
+
+
+def view_limits(limits, low, high, scale="linear"):
+    """New axis limits for data from low to high, None if the current limits
+    still fit them (the data fills at least a quarter of the view)"""
+    span = high - low
+    if limits[0] <= low and high <= limits[1] and 4 * span >= limits[1] - limits[0]:
+        return None
+    if scale != "linear":
+        if scale == "log":
+            if low <= 0:
+                return None
+            if high <= low:
+                return low / 10, high * 10
+        return (low, high) if high > low else None
+    if span <= 0:
+        span = abs(high) or 1.0
+    return low - 0.1 * span, high + 0.1 * span
+
+
+class LiveSeries:
+    """
+    Points of one LivePlotter line in preallocated float arrays: a ring
+    buffer of the last max_len points, or a buffer that doubles when full.
+    x and y are views of the points in order, not copies.
+    """
+
+    def __init__(self, max_len: int = -1, size: int = 1024):
+        self.max_len = max_len if max_len > 1 else None
+        # the ring keeps every point twice, at i and i + max_len, so the
+        # points in order are always one contiguous slice
+        self.buffer = np.empty((2, 2 * self.max_len if self.max_len else size))
+        self.start = 0
+        self.count = 0
+
+    def append(self, x, y):
+        """Adds one point or arrays of points"""
+        x, y = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(x, dtype=float)),
+            np.atleast_1d(np.asarray(y, dtype=float)),
+        )
+        n = len(x)
+        if self.max_len:
+            if n > self.max_len:
+                x, y, n = x[-self.max_len :], y[-self.max_len :], self.max_len
+            position = (self.start + self.count + np.arange(n)) % self.max_len
+            self.buffer[:, position] = x, y
+            self.buffer[:, position + self.max_len] = x, y
+            self.count += n
+            if self.count > self.max_len:
+                self.start = (self.start + self.count - self.max_len) % self.max_len
+                self.count = self.max_len
+        else:
+            if self.count + n > self.buffer.shape[1]:
+                grown = np.empty((2, max(2 * self.buffer.shape[1], self.count + n)))
+                grown[:, : self.count] = self.buffer[:, : self.count]
+                self.buffer = grown
+            self.buffer[:, self.count : self.count + n] = x, y
+            self.count += n
+
+    @property
+    def x(self):
+        return self.buffer[0, self.start : self.start + self.count]
+
+    @property
+    def y(self):
+        return self.buffer[1, self.start : self.start + self.count]
+
+    def __len__(self):
+        return self.count
+
+
+# Requires IPython for interactive shell
+class LivePlotter:
+    """
+    Automatically updating plotter
+    Requires IPython to be enabled for interactive shell
+    Simpily call plot(x, y) and the plot will add your points live
+    Once you're done, you can save by calling save()
+
+    plot() only stores the point, the figure is redrawn at most fps times a
+    second, so the measurement loop is not slowed down by long traces. Each
+    redraw shows at most two points per pixel column of every line (its min
+    and max) and only redraws the lines (blitting), the axes are drawn again
+    only when the data leaves the view or a line is added. Call refresh()
+    after the last point to draw it right away.
+    """
+
+    # data: dict[str, LiveSeries]
+    data: dict
+
+    def __init__(
+        self,
+        *,
+        title: str = "",
+        xlabel: str = "",
+        ylabel: str = "",
+        legend: bool = False,
+        legend_loc: str = "best",
+        max_len: int = -1,
+        fps: float = 10,
+    ):
+        self.data = {}
+        self.lines = {}
+        if not plt.isinteractive():
+            plt.ion()
+        self.fig, self.ax = plt.subplots()
+        plt.title(title)
+        plt.xlabel(xlabel)
+        plt.ylabel(ylabel)
+        self.show_legend: bool = legend
+        self.legend_loc: str = legend_loc
+        self.max_len = max_len
+        self.frame_time = 1 / fps if fps else 0
+        self.last_frame = 0.0
+        self.def_col_idx = 0
+        self.colors = ["r", "g", "b", "c", "m", "y", "k"]
+        self.blit = getattr(self.fig.canvas, "supports_blit", False)
+        self.background = None
+        self.saving = False
+        self.needs_draw = True
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+        self.fig.canvas.draw()
+
+    def plot(
+        self,
+        x,
+        y,
+        label: str = "",
+        *,
+        linestyle="solid",
+        color=None,
+        marker="o",
+        linewidth=3,
+        markercolor=None,
+    ):
+        """
+        Adds a point (or arrays of points) to the line label. The style
+        arguments are used when the line is created by its first point.
+        """
+        series = self.data.get(label)
+        if series is None:
+            series = self.data[label] = LiveSeries(self.max_len)
+            if color is None:
+                color = self.colors[self.def_col_idx % len(self.colors)]
+                self.def_col_idx += 1
+            if markercolor is None:
+                markercolor = color
+            (self.lines[label],) = self.ax.plot(
+                [],
+                [],
+                label=label,
+                linestyle=linestyle,
+                color=color,
+                marker=marker,
+                linewidth=linewidth,
+                markerfacecolor=markercolor,
+                markeredgecolor=markercolor,
+                animated=self.blit,
+            )
+            if self.show_legend:
+                self.ax.legend(loc=self.legend_loc)
+            self.needs_draw = True
+        series.append(x, y)
+        self.refresh(force=len(series) == 1)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Redraws the lines if the last frame is older than 1/fps (or
+        force), returns True if it did"""
+        now = time.perf_counter()
+        if not force and now - self.last_frame < self.frame_time:
+            return False
+        self.last_frame = now
+        buckets = max(int(self.ax.bbox.width), 1)
+        shown = [
+            minmax_decimate(series.x, series.y, buckets)
+            for series in self.data.values()
+        ]
+        for line, (x, y) in zip(self.lines.values(), shown):
+            line.set_data(x, y)
+        self.rescale(shown)
+        canvas = self.fig.canvas
+        if self.needs_draw or not self.blit or self.background is None:
+            self.needs_draw = False
+            if self.blit:
+                canvas.draw()  # on_draw keeps it as the background
+            else:
+                canvas.draw_idle()
+        else:
+            canvas.restore_region(self.background)
+            for line in self.lines.values():
+                self.ax.draw_artist(line)
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+        return True
+
+    def rescale(self, shown):
+        """Moves the view limits when the data left them"""
+        ax = self.ax
+        for get_limits, set_limits, scale, values in (
+            (ax.get_xlim, ax.set_xlim, ax.get_xscale(), [x for x, _ in shown]),
+            (ax.get_ylim, ax.set_ylim, ax.get_yscale(), [y for _, y in shown]),
+        ):
+            values = [v[np.isfinite(v)] for v in values]
+            if scale == "log":
+                # values <= 0 are not drawn and would invert the limits
+                values = [v[v > 0] for v in values]
+            values = [v for v in values if len(v)]
+            if not values:
+                continue
+            low = min(v.min() for v in values)
+            high = max(v.max() for v in values)
+            limits = view_limits(get_limits(), low, high, scale)
+            if limits is not None:
+                set_limits(limits)
+                self.needs_draw = True
+
+    def on_draw(self, event):
+        # a full draw (new limits, legend, resized window) leaves out the
+        # animated lines: keep it as the background and draw them on top
+        if self.saving or not self.blit:
+            return
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def savefig(self, fname, **kwargs):
+        """fig.savefig with every point of the lines, not only the ones
+        shown on screen"""
+        self.saving = True
+        try:
+            for line, series in zip(self.lines.values(), self.data.values()):
+                line.set_data(series.x, series.y)
+                line.set_animated(False)
+            self.fig.savefig(fname, **kwargs)
+        finally:
+            for line in self.lines.values():
+                line.set_animated(self.blit)
+            self.saving = False
+        self.needs_draw = True
+        self.refresh(force=True)
+
+    def save(self, path: str = None, name: str = None, file_type: str = "jpg"):
+        if path is not None:
+            if "." in path:
+                temp = path.rsplit(os.sep, 1)
+                path = temp[0]
+                if name is None:
+                    name = temp[1]
+            if not os.path.exists(path):
+                os.makedirs(path)
+            sys.path.append(path)
+        if name is None:
+            name: str = time.strftime(
+                f"plot_%Y-%m-%d_%H-%M-%S.{file_type}", time.gmtime()
+            )
+        elif "." not in name:
+            name = f"{name}.{file_type}"
+        self.savefig(f"{path}{os.sep}{name}")
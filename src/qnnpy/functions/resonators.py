@@ -4,8 +4,6 @@ import numpy as np
 
 import qnnpy.functions.functions as qf
 
-# note: instrument libraries are imported within the class as needed from config file
-
 
 class Resonators:
     """
@@ -21,167 +19,27 @@ class Resonators:
         self.device_type = self.properties["Save File"]["device type"]
         self.R_srs = self.properties["iv_sweep"]["series_resistance"]
 
-        self.instrument_list = []
-
         ### Set up instruments ###
-        if self.properties.get("PNA"):
-            self.instrument_list.append("PNA")
-
-            if self.properties["PNA"]["name"] == "KeysightN5224a":
-                from qnnpy.instruments.keysight_n5224a import KeysightN5224a
-
-                try:
-                    self.pna = KeysightN5224a(self.properties["PNA"]["port"])
-                    # self.pna.set_power(0)
-                    self.pna.set_scale_auto()
-                    print("PNA: connected")
-                except Exception:
-                    print("PNA: failed to connect")
-            else:
-                qf.lablog(
-                    'Invalid PNA. PNA name: "%s" is not'
-                    "configured" % self.properties["PNA"]["name"]
-                )
-                raise NameError("Invalide PNA. PNA name is not configured")
-
-        # Meter
-        if self.properties.get("Meter"):
-            self.instrument_list.append("Meter")
-
-            if self.properties["Meter"]["name"] == "Keithley2700":
-                from qnnpy.instruments.keithley_2700 import Keithley2700
-
-                try:
-                    self.meter = Keithley2700(self.properties["Meter"]["port"])
-                    self.meter.reset()
-                    print("METER: connected")
-                except Exception:
-                    print("METER: failed to connect")
-
-            elif self.properties["Meter"]["name"] == "Keithley2400":
-                # this is a source meter
-                from qnnpy.instruments.keithley_2400 import Keithley2400
-
-                try:
-                    self.meter = Keithley2400(self.properties["Meter"]["port"])
-                    self.meter.reset()
-                    print("METER: connected")
-                except Exception:
-                    print("METER: failed to connect")
-
-            elif self.properties["Meter"]["name"] == "Keithley2001":
-                from qnnpy.instruments.keithley_2001 import Keithley2001
-
-                try:
-                    self.meter = Keithley2001(self.properties["Meter"]["port"])
-                    self.meter.reset()
-                    print("METER: connected")
-                except Exception:
-                    print("METER: failed to connect")
-            else:
-                qf.lablog(
-                    'Invalid Meter. Meter name: "%s" is not configured'
-                    % self.properties["Meter"]["name"]
-                )
-                raise NameError(
-                    'Invalid Meter. Meter name: "%s" is not configured'
-                    % self.properties["Meter"]["name"]
-                )
-
-        # Source
-        if self.properties.get("Source"):
-            self.instrument_list.append("Source")
-
-            if self.properties["Source"]["name"] == "SIM928":
-                from qnnpy.instruments.srs_sim928 import SIM928
-
-                try:
-                    self.source = SIM928(
-                        self.properties["Source"]["port"],
-                        self.properties["Source"]["port_alt"],
-                    )
-                    self.source.reset()
-
-                    try:
-                        self.properties.get("Source")["port_alt2"]
-                        self.source2 = SIM928(
-                            self.properties["Source"]["port"],
-                            self.properties["Source"]["port_alt2"],
-                        )
-                    except Exception:
-                        print("No second SRS specified")
-
-                    print("SOURCE: connected")
-                except Exception:
-                    print("SOURCE: failed to connect")
-            else:
-                qf.lablog(
-                    'Invalid Source. Source name: "%s" is not configured'
-                    % self.properties["Source"]["name"]
-                )
-                raise NameError(
-                    'Invalid Source. Source name: "%s" is not configured'
-                    % self.properties["Source"]["name"]
-                )
-
-        # Temperature Controller
-        if self.properties.get("Temperature"):
-            self.instrument_list.append("Temperature")
-
-            if self.properties["Temperature"]["name"] == "Cryocon350":
-                from qnnpy.instruments.cryocon350 import Cryocon350
-
-                try:
-                    self.temp = Cryocon350(self.properties["Temperature"]["port"])
-                    self.temp.channel = self.properties["Temperature"]["channel"]
-                    self.properties["Temperature"]["initial temp"] = (
-                        self.temp.read_temp(self.temp.channel)
-                    )
-                    print("TEMPERATURE: connected")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            elif self.properties["Temperature"]["name"] == "Cryocon34":
-                from qnnpy.instruments.cryocon34 import Cryocon34
-
-                try:
-                    self.temp = Cryocon34(self.properties["Temperature"]["port"])
-                    self.temp.channel = self.properties["Temperature"]["channel"]
-                    self.properties["Temperature"]["initial temp"] = (
-                        self.temp.read_temp(self.temp.channel)
-                    )
-                    print("TEMPERATURE: connected")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            elif self.properties["Temperature"]["name"] == "ICE":
-                try:
-                    self.properties["Temperature"]["initial temp"] = qf.ice_get_temp(
-                        select=1
-                    )
-                    print("TEMPERATURE: connected")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            elif self.properties["Temperature"]["name"] == "DEWAR":
-                try:
-                    self.properties["Temperature"]["initial temp"] = 4.2
-                    print("TEMPERATURE: ~connected~ 4.2K")
-                except Exception:
-                    print("TEMPERATURE: failed to connect")
-
-            else:
-                qf.lablog(
-                    'Invalid Temperature Controller. TEMP name: "%s" is not configured'
-                    % self.properties["Temperature"]["name"]
-                )
-                raise NameError(
-                    'Invalid Temperature Controller. TEMP name: "%s" is not configured'
-                    % self.properties["Temperature"]["name"]
-                )
-        else:
-            self.properties["Temperature"] = {"initial temp": "None"}
-            # print('TEMPERATURE: Not Specified')
+        self.inst = qf.Instruments(self.properties)
+        self.instrument_list = list(self.inst.instrument_list)
+        if self.properties.get("Source", {}).get("port_alt2") is not None:
+            # second SIM928 module in the same mainframe
+            from qnnpy.instruments.srs_sim928 import SIM928
+
+            self.source2 = SIM928(
+                self.properties["Source"]["port"],
+                self.properties["Source"]["port_alt2"],
+            )
+
+    def __getattr__(self, name):
+        # self.meter, self.temp, ... are the instruments of self.inst, which
+        # connects them on first use
+        inst = self.__dict__.get("inst")
+        if inst is None:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        return getattr(inst, name)
 
     def configure_pna(
         self, start_freq, stop_freq, num_points, power=0, if_bandwidth=100
@@ -228,8 +86,9 @@ class Resonators:
     ):
         for power in powers:
             self.S21_measurement(start_freq, stop_freq, num_points, power, if_bandwidth)
-            self.save()
+            self.save(background=True)
             self.plot()
+        qf.save_writer().flush()
 
     def S21_to_dBm(self):
         return 20 * np.log10(np.abs(self.S21))
@@ -253,7 +112,7 @@ class Resonators:
             close=close,
         )
 
-    def save(self):
+    def save(self, background=False):
         data_dict = {
             "S21": self.S21_to_dBm(),
             "pna_power": self.pna.get_power(),
@@ -265,6 +124,7 @@ class Resonators:
             "S21_measurement",
             data_dict,
             instrument_list=self.instrument_list,
+            background=background,
         )
 
 
@@ -281,6 +141,8 @@ class IvSweep(Resonators):
 
     """
 
+    isw_estimate = None
+
     def run_sweep_fixed(self):
         """Runs IV sweep with config paramters
         This constructs #steps between start and 75% of final current.
@@ -437,37 +299,18 @@ class IvSweep(Resonators):
         self.v_read = voltage
         self.i_read = current
 
-    def isw_calc(self):
-        """Calculates critical current."""
-        """
-        Critical current is defined as the current one step before a voltage
-        reading greater than 5mV.
-        self.isw = self.i_read[np.argmax(np.array(self.v_read) > 0.005)-1]
-        print('%.4f uA' % (self.isw*1e6))
-        """
+    def run_sweep_adaptive(self):
+        """Runs IV sweeps that put their points near Isw and Ir, see
+        qf.run_sweep_adaptive.  Optional iv_sweep keys: [step_coarse],
+        [step_fine], [v_threshold], [tolerance], [isw_estimate]."""
+        qf.run_sweep_adaptive(self, self.source, self.meter)
 
-        """ New method looks at differential and takes average of points that 
-        meet condition. Prints mean() and std().` std should be < 1-2µA
+    def isw_calc(self):
+        """Calculates switching and retrapping current of every sweep, see
+        qf.isw_calc. Prints mean() and std() over all switches, std should
+        be < 1-2µA.
         """
-        # isws = abs(self.i_read[np.where(abs(np.diff(self.i_read)/max(np.diff(self.i_read))) > 0.5)])
-        # self.isw = self.i_read[np.argmax(np.array(self.v_read) > 0.005)-1]
-        # print('%.4f uA' % (self.isw*1e6))
-
-        try:
-            switches = np.asarray(
-                np.where(abs(np.diff(self.i_read) / max(np.diff(self.i_read))) > 0.8),
-                dtype=int,
-            ).squeeze()
-            isws = abs(np.asarray([self.i_read[i] for i in switches]))
-            print(isws)
-            self.isw = isws.mean()
-            print(
-                "Isw_avg = %.4f µA :--: Isw_std = %.4f µA"
-                % (self.isw * 1e6, isws.std() * 1e6)
-            )
-        except Exception:
-            print("Could not calculate Isw. Isw set to 0")
-            self.isw = 0
+        qf.isw_calc(self)
 
     def plot(self):
         full_path = qf.save(self.properties, "iv_sweep")
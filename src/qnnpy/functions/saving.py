@@ -0,0 +1,880 @@
+"""Saving of measurement data: save(), data_saver(), the background
+SaveWriter, HDF5 files and the text logs written next to the data"""
+
+import atexit
+import copy
+import io
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from time import sleep
+
+import numpy as np
+import scipy.io
+
+
+class SaveWriter:
+    """
+    Background writer used by save(..., background=True) and
+    data_saver(..., background=True) so the measurement thread never waits
+    on the network drive.
+
+    Jobs are put on a bounded queue (submit blocks when it is full) and run
+    on a single worker thread. A job writes all of its files given a base
+    path (without extension). If writing raises an OSError the job is
+    retried with exponential backoff, and if the share is still unreachable
+    the files are spooled to a local folder instead. Spooled files are moved
+    to their real location by drain_spool(), which the worker also runs
+    whenever it is idle.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        maximum number of queued jobs. The default is 16.
+    retries : int, optional
+        number of attempts before spooling to local disk. The default is 4.
+    backoff : float, optional
+        delay before the first retry in seconds, doubled on every retry. The default is 0.5.
+    spool_dir : str, optional
+        local spool folder. The default is ~/qnnpy_spool.
+    drain_interval : float, optional
+        how often (s) the idle worker tries to drain the spool. The default is 60.
+    """
+
+    # files a job can write next to its base path, moved by drain_spool
+    spool_suffixes = (".mat", ".txt", ".png", "_visa.json", "_visa_trace.json")
+    # completed futures kept for future()
+    max_futures = 64
+
+    def __init__(
+        self,
+        maxsize: int = 16,
+        retries: int = 4,
+        backoff: float = 0.5,
+        spool_dir: str = None,
+        drain_interval: float = 60,
+    ):
+        self.queue = queue.Queue(maxsize)
+        self.retries = retries
+        self.backoff = backoff
+        if spool_dir is None:
+            spool_dir = os.path.join(os.path.expanduser("~"), "qnnpy_spool")
+        self.spool_dir = spool_dir
+        self.spool_manifest = os.path.join(spool_dir, "spooled.txt")
+        self.drain_interval = drain_interval
+        self.spool_lock = threading.Lock()
+        self.futures = {}  # full_path: Future of the latest jobs
+        self.thread = threading.Thread(
+            target=self._run, name="qnnpy-save-writer", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, write, full_path: str, root: str, after=None) -> Future:
+        """
+        Queues a write job.
+
+        Parameters
+        ----------
+        write : callable
+            write(base_path) writes every file of the job, ie: base_path.mat and base_path.txt
+        full_path : str
+            base path on the share to write to.
+        root : str
+            root folder of the share, used to mirror the folder structure in the spool.
+        after : callable, optional
+            after(base_path) runs once the files are written (ie: database logging).
+            exceptions raised here are printed, not raised.
+
+        Returns
+        -------
+        Future
+            resolves to the base path the files were written to (the spool path if spooled).
+        """
+        future = Future()
+        with self.spool_lock:
+            self.futures[full_path] = future
+            while len(self.futures) > self.max_futures:
+                oldest = next(iter(self.futures))
+                if not self.futures[oldest].done():
+                    break
+                del self.futures[oldest]
+        self.queue.put((write, full_path, root, after, future))
+        return future
+
+    def future(self, full_path: str) -> Future:
+        """
+        Future of the background save to full_path, as returned by
+        save(..., background=True), None if it is unknown or too old. It
+        resolves to the base path the files were written to (the spool path
+        if spooled).
+        """
+        with self.spool_lock:
+            return self.futures.get(full_path)
+
+    def flush(self):
+        """blocks until every queued job has been written"""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            try:
+                job = self.queue.get(timeout=self.drain_interval)
+            except queue.Empty:
+                self.drain_spool()
+                continue
+            write, full_path, root, after, future = job
+            try:
+                path = self._write(write, full_path, root)
+                print("File Saved:\n %s" % path)
+                if after is not None:
+                    try:
+                        after(path)
+                    except Exception as e:
+                        print(f"background save: post-save step failed ({e})")
+                future.set_result(path)
+            except Exception as e:
+                print(f"\033[1;31;49mbackground save failed: {e}\033[1;37;49m")
+                future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, write, full_path: str, root: str) -> str:
+        delay = self.backoff
+        for attempt in range(self.retries):
+            try:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                write(full_path)
+                return full_path
+            except OSError as e:
+                print(f"background save: {full_path} not reachable ({e}), retrying")
+                if attempt < self.retries - 1:
+                    sleep(delay)
+                    delay *= 2
+        try:
+            relative = os.path.relpath(full_path, root)
+        except ValueError:  # different drive on windows
+            relative = os.path.basename(full_path)
+        spool_path = os.path.join(self.spool_dir, relative)
+        os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+        write(spool_path)
+        with self.spool_lock:
+            with open(self.spool_manifest, "a") as f:
+                f.write(f"{spool_path}\t{full_path}\n")
+        print(f"background save: spooled to {spool_path}")
+        return spool_path
+
+    def drain_spool(self) -> int:
+        """
+        Moves spooled files to their location on the share.
+
+        Returns
+        -------
+        int
+            number of spooled saves still waiting for the share.
+        """
+        with self.spool_lock:
+            if not os.path.exists(self.spool_manifest):
+                return 0
+            with open(self.spool_manifest) as f:
+                entries = [line.rstrip("\n").split("\t") for line in f if line.strip()]
+            remaining = []
+            for spool_path, full_path in entries:
+                try:
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    # exact suffixes, base_(1).mat belongs to another save
+                    for suffix in self.spool_suffixes:
+                        if not os.path.exists(spool_path + suffix):
+                            continue
+                        target = full_path + suffix
+                        # left by an earlier drain that stopped half way,
+                        # the spooled file is the complete one
+                        if os.path.exists(target):
+                            os.remove(target)
+                        shutil.move(spool_path + suffix, target)
+                    print(f"background save: moved spooled {full_path}")
+                except OSError:
+                    remaining.append((spool_path, full_path))
+            with open(self.spool_manifest, "w") as f:
+                f.writelines(f"{a}\t{b}\n" for a, b in remaining)
+            return len(remaining)
+
+    def close(self):
+        """waits for queued jobs and tries a last drain of the spool"""
+        self.flush()
+        self.drain_spool()
+
+
+save_writer_instance = None
+
+
+def save_writer() -> SaveWriter:
+    """Returns the shared SaveWriter, starting it on first use"""
+    global save_writer_instance
+    if save_writer_instance is None:
+        save_writer_instance = SaveWriter()
+        atexit.register(save_writer_instance.close)
+    return save_writer_instance
+
+
+def visa_trace():
+    """VISA events of the measurement being saved (since the previous save),
+    None unless tracing was turned on, see qnnpy.instruments.tracing"""
+    tracing = sys.modules.get("qnnpy.instruments.tracing")
+    if tracing is None:
+        return None
+    return tracing.take()
+
+
+def save_visa_trace(full_path: str, events):
+    """writes events from visa_trace() to full_path_visa.json and
+    full_path_visa_trace.json"""
+    if events:
+        from qnnpy.instruments import tracing
+
+        tracing.write(full_path, events)
+
+
+def save(
+    parameters,
+    measurement,
+    data_dict={},
+    instrument_list=None,
+    db=False,
+    meas_txt=None,
+    background=False,
+):
+    """Save follows the typical format of defining a data dictionary (data_dict) and saving as a .mat .
+    This function requires prameters from a loaded config file. The file is saved on the S:\ drive according to the configuration settings.
+    If the data_dict is not included this function returns the path created from the configuration file.
+
+    If background is True the data is copied and written by the shared
+    SaveWriter thread, the same (full_path, time_str) is returned right
+    away. save_writer().future(full_path) resolves to where the files were
+    written (local spool path if the share was unreachable).
+
+    """
+    if not isinstance(parameters, dict):
+        raise ValueError("save accepts dict from configured .yml file")
+
+    if "Save Root" in parameters:
+        file_path = parameters["Save Root"]
+    else:
+        file_path = "S:\SC\Measurements"
+    # Setup variables from parameters for file path
+    user = parameters["User"]["name"]
+    sample_name = parameters["Save File"][
+        "sample name"
+    ]  # this field should describe the material SPX111 or GaN_ID#20
+    device_name = parameters["Save File"][
+        "device name"
+    ]  # this field should describe which device is being tested
+    device_type = parameters["Save File"][
+        "device type"
+    ]  # this field should describe device type ntron, snspd, coupler, memory
+
+    if parameters["Save File"].get("port"):
+        device_type_ext = device_type + "_" + parameters["Save File"]["port"]
+        port = parameters["Save File"]["port"]
+    else:
+        device_type_ext = device_type
+        port = 1
+
+    if parameters["Save File"].get("cell"):
+        cell_name = parameters["Save File"]["cell"] + "_"
+    else:
+        cell_name = ""
+
+    time_str = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
+
+    """ Shorten parameter list to only include current measurement and the instruments used"""
+    if instrument_list:
+        new_parameters = {}
+        new_parameters["User"] = parameters["User"]
+        new_parameters["Save File"] = parameters["Save File"]
+        new_parameters[measurement] = parameters[measurement]
+        for i in range(len(instrument_list)):
+            new_parameters[instrument_list[i]] = parameters[instrument_list[i]]
+        parameters = new_parameters
+
+    """ Create folder and save .mat file. """
+    root = file_path
+    if meas_txt:
+        measurement_alt = measurement + meas_txt
+    else:
+        measurement_alt = measurement
+
+    file_name = (
+        sample_name
+        + "_"
+        + measurement_alt
+        + "_"
+        + device_type_ext
+        + "_"
+        + device_name
+        + "_"
+        + cell_name
+        + time_str
+    )
+    if parameters["Save File"].get("cell"):
+        file_path = os.path.join(
+            root,
+            sample_name,
+            device_type,
+            device_name,
+            measurement,
+            parameters["Save File"]["cell"],
+        )
+    else:
+        file_path = os.path.join(
+            root, sample_name, device_type, device_name, measurement
+        )
+
+    if background and data_dict:
+        # copy so the caller can keep modifying its data while this is queued
+        data_dict = copy.deepcopy(data_dict)
+        parameters = copy.deepcopy(parameters)
+        visa_events = visa_trace()
+
+        def write(path):
+            scipy.io.savemat(path + ".mat", mdict=data_dict)
+            output_log(parameters, path)
+            save_visa_trace(path, visa_events)
+
+        def after(path):
+            try:
+                from qnnpy.functions.db import insert_measurement_event
+
+                insert_measurement_event(
+                    user, measurement, sample_name, device_type, device_name, port
+                )
+            except Exception as e:
+                print(f"Logging to qnndb failed. ({e})")
+
+        full_path = os.path.join(file_path, file_name)
+        save_writer().submit(write, full_path, root, after)
+        return full_path, time_str
+
+    while os.path.exists(root):
+        os.makedirs(file_path, exist_ok=True)
+        full_path = os.path.join(file_path, file_name)
+        if data_dict:
+            scipy.io.savemat(full_path + ".mat", mdict=data_dict)
+            output_log(parameters, full_path)
+            save_visa_trace(full_path, visa_trace())
+            print("File Saved:\n %s" % full_path)
+            try:
+                from qnnpy.functions.db import insert_measurement_event
+
+                insert_measurement_event(
+                    user, measurement, sample_name, device_type, device_name, port
+                )
+            except Exception as e:
+                print(f"Logging to qnndb failed. ({e})")
+
+        break
+
+    return full_path, time_str
+
+
+# same as save but uses data instruments and liveplotter class
+def data_saver(
+    parameters: dict,
+    measurement: str,
+    meas_path: str = r"S:\SC\Measurements",
+    data=None,
+    inst=None,
+    plot=None,
+    file_name_append: str = "",
+    background: bool = False,
+):
+    """
+
+    Parameters
+    ----------
+    parameters : dict
+        parameters from loaded yaml config file.
+    measurement : str
+        name of the measurement: ie, iv_sweep.
+    meas_path : str, optional
+        root folder location for measurements to be saved to. The default is r'S:\SC\Measurements'.
+    data : Data or List[Data], optional
+        data class to save. The default is None.
+        if a list is provided, then iteratively saves each element seperately. If multiple samples are defined in parameters, each iterative save will use the next sample
+    inst : Instruments, optional
+        instruments that were used. The default is None.
+    plot : LivePlotter or List[LivePlotter], optional
+        optionally save the live plotter which was used. The default is None.
+        if a list is provided, does the same thing as data if data is a list
+    background : bool, optional
+        copy the data and write it (plus the log, plot, shortcut and database
+        entry) on the shared SaveWriter thread instead of blocking on the
+        network drive. The default is False.
+    Raises
+    ------
+    ValueError
+        if there is an error in parameters.
+
+    Returns
+    -------
+    full_path : str or list[str]
+        full path of where data was saved.
+        if multiple samples are used, an array of paths for each sample save location is given back
+        if background is True the path is given back before the files are
+        written, see SaveWriter.future
+
+    """
+    # for saving multiple samples
+    if (
+        parameters.get("Save File")
+        and parameters.get("Save File").get("sample name") is None
+    ):
+        res: list = []
+        for i in range(4):  # maximum of 4 samples can be saved at a time
+            if parameters["Save File"].get(f"sample name {i+1}") is None:
+                break
+            d = data[i % len(data)] if isinstance(data, list) else data
+            p = plot[i % len(plot)] if isinstance(plot, list) else plot
+            parameters["Save File"] = (
+                {} if parameters.get("Save File") is None else parameters["Save File"]
+            )
+            parameters["Save File"]["sample name"] = (
+                parameters["Save File"][f"sample name {i+1}"]
+                if parameters["Save File"].get(f"sample name {i+1}")
+                else (
+                    parameters.get("Save File").get("sample name")
+                    if parameters.get("Save File").get("sample name")
+                    else ""
+                )
+            )
+            res.append(
+                data_saver(
+                    parameters,
+                    measurement,
+                    meas_path,
+                    data=d,
+                    inst=inst,
+                    plot=p,
+                    file_name_append=str(i),
+                    background=background,
+                )
+            )
+        return res
+    # if type(data) == list or type(plot) == list:
+    if isinstance(data, list) or isinstance(plot, list):
+        res: list = []
+        for i in range(max(len(data), len(plot))):
+            d = data[i % len(data)] if isinstance(data, list) else data
+            p = plot[i % len(plot)] if isinstance(plot, list) else plot
+            res.append(
+                data_saver(
+                    parameters,
+                    measurement,
+                    meas_path,
+                    data=d,
+                    inst=inst,
+                    plot=p,
+                    file_name_append=str(i),
+                    background=background,
+                )
+            )
+        return res
+
+    # ensure parameters is dict
+    # if type(parameters) != dict:
+    if isinstance(parameters, dict) is False:
+        try:
+            from qnnpy.functions.config import load_config
+
+            parameters = load_config(parameters)
+        except Exception as e:
+            raise ValueError(
+                "save accepts dict from configured .yml file, try using load_config(parameters) first!"
+            )
+    file_path = meas_path
+    # Setup variables from parameters for file path
+    user = (
+        parameters["User"]["name"]
+        if parameters.get("User") and parameters.get("User").get("name")
+        else ""
+    )
+    if parameters.get("Save File"):
+        sample_name = (
+            parameters["Save File"]["sample name"]
+            if parameters.get("Save File").get("sample name")
+            else ""
+        )  # this field should describe the material SPX111 or GaN_ID#20
+        device_name = (
+            parameters["Save File"]["device name"]
+            if parameters.get("Save File").get("device name")
+            else ""
+        )  # this field should describe which device is being tested
+        device_type = (
+            parameters["Save File"]["device type"]
+            if parameters.get("Save File").get("device type")
+            else ""
+        )  # this field should describe device type ntron, snspd, coupler, memory
+    else:
+        sample_name, device_name, device_type = "", "", ""
+    if parameters["Save File"].get("port"):
+        device_type_ext = device_type + "_" + f"port{parameters['Save File']['port']}"
+        port = parameters["Save File"]["port"]
+    else:
+        device_type_ext = device_type
+        port = 1
+    # Shorten parameter list to only include current measurement and the instruments used
+    if inst and len(inst.instrument_list) > 0:
+        new_parameters = {
+            "User": parameters.get("User"),
+            "Save File": parameters.get("Save File"),
+            "Measurement": parameters.get(measurement),
+        }
+        new_parameters = {key: parameters[key] for key in inst.instrument_list}
+        # for i in range(len(inst.instrument_list)):
+        #     new_parameters[inst.instrument_list[i]] = parameters[inst.instrument_list[i]]
+        parameters = new_parameters
+    # Create folder and save .mat file
+    full_path = file_path
+    if background or os.path.exists(file_path):
+        # if meas_txt:
+        #     measurement_alt = measurement+meas_txt
+        # else:
+        #     measurement_alt = measurement
+        # makes file path
+        time_str = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
+        file_name = (
+            sample_name
+            + "_"
+            + measurement
+            + "_"
+            + device_type_ext
+            + "_"
+            + device_name
+            + "_"
+            + time_str
+            + (f"_({file_name_append})" if file_name_append != "" else "")
+        )
+        file_path = os.path.join(
+            file_path, sample_name, device_type, device_name, measurement
+        )
+        full_path = os.path.join(file_path, file_name)
+
+        def after(path):
+            # make "recents" shortcut
+            try:
+                if sys.platform == "win32":
+                    recents = os.path.join(meas_path, "recents")
+                    os.makedirs(recents, exist_ok=True)
+                    recents_path = os.path.join(
+                        recents, f"{sample_name}_measurement_{time_str}.lnk"
+                    )
+                    target = os.path.dirname(path)
+                    import win32com.client
+
+                    shell = win32com.client.Dispatch("WScript.Shell")
+                    shortcut = shell.CreateShortCut(recents_path)
+                    shortcut.Targetpath = target
+                    shortcut.save()
+                else:
+                    print("Only windows is supported for recent measurement shortcut")
+            except Exception as e:
+                print(f"failed to make shortcut in for recents: {e}")
+            # saving to database
+            try:
+                from qnnpy.functions.db import log_data_to_database
+
+                log_data_to_database(
+                    "measurement_events",
+                    connection=None,
+                    user=user,
+                    meas_type=measurement,
+                    sample_name=sample_name,
+                    device_type=device_type,
+                    device_id=device_name,
+                    port=port,
+                )
+                # insert_measurement_event(user, measurement, sample_name, device_type, device_name, port)
+            except Exception as e:
+                print(f"Logging to qnndb failed: {e}")
+
+        if background:
+            # snapshot everything now, the caller keeps measuring while this is queued
+            data_dict = None
+            if data:
+                data_dict = data.to_dict()
+                if not data.columnar:
+                    data_dict = copy.deepcopy(data_dict)
+            parameters = copy.deepcopy(parameters)
+            png = None
+            if plot:
+                png = io.BytesIO()
+                plot.savefig(png, format="png")
+            visa_events = visa_trace() if data else None
+
+            def write(path):
+                if data_dict is not None:
+                    scipy.io.savemat(path + ".mat", mdict=data_dict)
+                    output_log(parameters, path)
+                save_visa_trace(path, visa_events)
+                if png is not None:
+                    with open(path + ".png", "wb") as f:
+                        f.write(png.getvalue())
+
+            save_writer().submit(write, full_path, meas_path, after if data else None)
+            return full_path
+
+        os.makedirs(file_path, exist_ok=True)
+        if data:
+            # scipy.io.savemat(full_path + '.mat', mdict=data.data)
+            data.save(path=f"{full_path}.mat")
+            output_log(parameters, full_path)
+            save_visa_trace(full_path, visa_trace())
+            print("File Saved:\n %s" % full_path)
+            after(full_path)
+        if plot:
+            plot.save(path=f"{full_path}.png")
+    else:
+        print(
+            "\033[1;31;49mmeas_path does not exist, forcing a save elsewhere: \033[1;37;49m"
+        )
+        data.save(printloc=True)
+        plot.save(name="forced_plot_save")
+    return full_path
+
+
+def append_hdf5(file_name: str, data: dict, override: bool = False):
+    """
+    Appends rows to an HDF5 file without rewriting what is already stored.
+
+    Each key is stored as a resizable, chunked dataset whose first axis is
+    the row (store) index, so a scalar key gives a 1D dataset and a scope
+    trace key gives a (rows, points) dataset. Appending only resizes the
+    datasets and writes the new rows, so each call costs O(new rows).
+
+    Parameters
+    ----------
+    file_name : str
+        .h5 file to append to. created if it doesn't exist.
+    data : dict
+        key: array-like of new rows, ie: Data.to_dict().
+        strings are stored as variable length strings and object columns of
+        1D numeric rows (ie: traces of different lengths) as variable length
+        float arrays. A key that is new to an existing file is padded to the
+        rows already stored, with nan (int and bool are stored as float
+        then), '' or an empty array.
+    override : bool, optional
+        overwrite the file instead of appending to it. The default is False.
+
+    Raises
+    ------
+    ValueError
+        if the row shape of a key doesn't match the existing dataset.
+    TypeError
+        if an object column holds values that are neither scalars nor 1D
+        numeric arrays.
+
+    Returns
+    -------
+    None.
+
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError(
+            "saving to .h5 requires h5py, install it with pip install h5py"
+        )
+
+    with h5py.File(file_name, "w" if override else "a") as f:
+        # rows already stored, a key that first shows up now is padded to it
+        stored_rows = max((dset.shape[0] for dset in f.values()), default=0)
+        for key, values in data.items():
+            values = np.asarray(values)
+            if values.ndim == 0:
+                values = values.reshape(1)
+            values, dtype = hdf5_values(key, values)
+            if key not in f:
+                fillvalue = None
+                if stored_rows and dtype.kind in "iub":
+                    values = values.astype(float)
+                    dtype = values.dtype
+                if dtype.kind in "fc":
+                    fillvalue = np.nan
+                row_bytes = max(1, values[0:1].nbytes if dtype != object else 64)
+                chunk_rows = max(1, min(4096, 2**20 // row_bytes))
+                f.create_dataset(
+                    key,
+                    shape=(stored_rows,) + values.shape[1:],
+                    maxshape=(None,) + values.shape[1:],
+                    chunks=(chunk_rows,) + values.shape[1:],
+                    dtype=dtype,
+                    fillvalue=fillvalue,
+                )
+            dset = f[key]
+            if dset.dtype.kind in "iub" and values.dtype.kind in "fc":
+                # rows with missing cells come as float with nan, promote
+                # the stored int rows once instead of casting nan to int
+                stored = dset[()]
+                attrs = dict(dset.attrs)
+                del f[key]
+                dset = f.create_dataset(
+                    key,
+                    data=stored.astype(values.dtype),
+                    maxshape=(None,) + stored.shape[1:],
+                    chunks=True,
+                )
+                dset.attrs.update(attrs)
+            if dset.shape[1:] != values.shape[1:]:
+                raise ValueError(
+                    f"cannot append {key} with row shape {values.shape[1:]} "
+                    f"to {file_name}, stored row shape is {dset.shape[1:]}"
+                )
+            start = dset.shape[0]
+            dset.resize(start + len(values), axis=0)
+            dset[start:] = values
+
+
+def hdf5_values(key, values):
+    """
+    (values, h5py dtype) of an array for append_hdf5. Strings and object
+    columns of scalars become variable length strings, object columns of 1D
+    numeric rows variable length float arrays ('' of a missing cell is an
+    empty array).
+    """
+    import h5py
+
+    if values.dtype.kind not in "OUS":
+        return values, values.dtype
+    strings = values.dtype.kind != "O"
+    if not strings:
+        rows = [np.asarray(v) for v in values]
+        strings = all(row.ndim == 0 for row in rows)
+    if strings:
+        values = np.asarray([str(v) for v in values.ravel()], dtype=object)
+        return values, h5py.string_dtype()
+    arrays = np.empty(len(rows), dtype=object)
+    for i, row in enumerate(rows):
+        if row.ndim == 0 and row.item() == "":
+            row = np.empty(0)
+        if row.ndim != 1 or row.dtype.kind not in "iufb":
+            raise TypeError(
+                f"cannot store {key} in .h5, row {i} is {type(values[i]).__name__} "
+                f"of shape {row.shape}: object columns must be scalars or 1D "
+                "numeric arrays"
+            )
+        arrays[i] = row.astype(float)
+    return arrays, h5py.vlen_dtype(np.dtype(float))
+
+
+def load_hdf5(file_name: str) -> dict:
+    """Reads every dataset of an .h5 file written by append_hdf5 into a dict"""
+    import h5py
+
+    with h5py.File(file_name, "r") as f:
+        data = {}
+        for key, dset in f.items():
+            if h5py.check_string_dtype(dset.dtype):
+                data[key] = np.asarray(dset.asstr()[()], dtype=object)
+            else:
+                data[key] = dset[()]
+    return data
+
+
+def hdf5_to_mat(file_name: str, mat_file_name: str = None) -> str:
+    """
+    One-shot export of an .h5 file (ie: from an autosaved Data) to .mat
+
+    Parameters
+    ----------
+    file_name : str
+        .h5 file to read.
+    mat_file_name : str, optional
+        .mat file to write. The default is file_name with a .mat extension.
+
+    Returns
+    -------
+    mat_file_name : str
+        path of the written .mat file.
+
+    """
+    if mat_file_name is None:
+        mat_file_name = os.path.splitext(file_name)[0] + ".mat"
+    scipy.io.savemat(mat_file_name, mdict=load_hdf5(file_name))
+    return mat_file_name
+
+
+def lablog_error(message):
+    """
+    The lablog method logs errors to 'S:\SC\ErrorLogging'
+    """
+    # formatter = logging.Formatter('%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
+    # log = logging.getLogger('lablog')
+    # if not log.handlers:
+    #     handler = logging.FileHandler('S:\SC\Logging\qnn-lablog.log')
+    #     handler.setFormatter(formatter)
+
+    #     log.setLevel(logging.ERROR)
+    #     log.addHandler(handler)
+    #     log.propagate = False
+
+    # log.error(message)
+
+    timestamp = str(datetime.now()) + " "
+    path = r"S:\SC\ErrorLogging\lablog_error.txt"
+    file = open(path, "a")
+
+    file.write(timestamp + message + " \n")
+    file.close()
+
+
+def lablog_measurement(parameters, measurement=None):
+    """
+    The lablog_measurement method logs the measurement history within the lab.
+
+    """
+    if isinstance(parameters, dict) is False:
+        raise ValueError("log_measurement accepts dictionary from configured .yml file")
+    formatter = logging.Formatter(
+        "%(asctime)s %(message)s", datefmt="%m/%d/%Y %I:%M:%S %p"
+    )
+    lab_measurement_log = logging.getLogger("lab_measurement_log")
+    if not lab_measurement_log.handlers:
+        handler = logging.FileHandler(
+            "S:\SC\MeasurementLogging\qnn-lablog-measurement.log"
+        )
+        handler.setFormatter(formatter)
+
+        lab_measurement_log.setLevel(logging.INFO)
+        lab_measurement_log.addHandler(handler)
+        lab_measurement_log.propagate = False
+
+    if measurement:
+        parameters["Save File"]["measurement"] = measurement
+    lab_measurement_log.info(parameters)
+
+
+def output_log(parameters, path):
+    """
+    The output_log method logs the configuration file used for each measurement
+    to the file location where that measurement is saved.
+
+    """
+    # formatter = logging.Formatter('%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
+
+    # output_log = logging.getLogger('output_log')
+    # formatter = logging.Formatter('%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
+    # handler = logging.FileHandler(path+'.txt')
+    # handler.setFormatter(formatter)
+
+    # output_log.setLevel(logging.INFO)
+    # output_log.addHandler(handler)
+
+    # output_log.info(parameters)
+
+    file = open(path + ".txt", "w")
+    file.write("\n".join("{}\t\t{}".format(k, v) for k, v in parameters.items()))
+    file.close()
@@ -7,8 +7,10 @@ Created on Wed May  6 17:21:25 2020
 
 import signal
 import time
+from concurrent.futures import ThreadPoolExecutor
 from sys import exit
 from time import sleep
+from types import SimpleNamespace
 
 import numpy as np
 
@@ -28,7 +30,9 @@ class Snspd:
         # qf is a package of base functions that can be used in any class.
         self.properties = qf.load_config(configuration_file)
 
-        self.sample_name = self.properties["Save File"]["sample name"]
+        self.sample_name = self.properties["Save File"].get(
+            "sample name", self.properties["Save File"].get("sample name 1")
+        )
         self.device_name = self.properties["Save File"]["device name"]
         self.device_type = self.properties["Save File"]["device type"]
 
@@ -39,6 +43,7 @@ class Snspd:
             self.R_srs_g = self.properties["double_sweep"]["series_resistance_g"]
 
         self.isw = 0
+        self.ir = 0
         self.instrument_list = []
 
         #######################################################################
@@ -68,7 +73,7 @@ class Snspd:
     def get_property(self, property_type, prop):
         return self.properties[property_type][prop]
 
-    def average_counts(self, counting_time, iterations, trigger_v):
+    def average_counts(self, counting_time, iterations, trigger_v, buffered=True):
         """
 
         This function sets the counter trigger voltage, integrates the number
@@ -76,8 +81,13 @@ class Snspd:
 
         Average COUNT RATE per iteration is returned in [[ [Hz] ]]
 
+        If the counter has a buffered mode (53230A) and buffered is True the
+        iterations are taken as consecutive gates of one acquisition, see
+        buffered_counts.
 
         """
+        if buffered and hasattr(self.inst.counter, "buffered_counts"):
+            return Snspd.buffered_counts(self, counting_time, iterations, trigger_v)
 
         count_rate_temp = []
 
@@ -108,6 +118,41 @@ class Snspd:
             self.inst.source.set_output(False)
             sleep(0.05)
         count_rate_avg = np.mean(count_rate_temp)  # average of each itteraton
+        self.count_rate_std = np.std(count_rate_temp)
+        return count_rate_avg
+
+    def buffered_counts(self, counting_time, iterations, trigger_v):
+        """
+        Average count rate [Hz] over iterations gates of counting_time, taken
+        by the counter in one acquisition and read back in one transfer.
+
+        The counter only sends the input settings that changed (see the
+        driver's cached_commands) and the source is switched on once for all
+        gates.  The std of the count rate and the
+        counts per gate are kept in self.count_rate_std and self.gate_counts.
+        """
+        try:
+            self.inst.counter.set_impedance(self.properties["Counter"]["impedance"])
+            self.inst.counter.set_coupling(self.properties["Counter"]["coupling"])
+        except Exception:
+            pass
+        self.inst.counter.set_trigger(trigger_v)
+
+        self.inst.source.set_output(True)
+        sleep(0.05)  # bias device
+        voltage = self.inst.meter.read_voltage()
+        count_rate_avg, self.count_rate_std, self.gate_counts = (
+            self.inst.counter.buffered_counts(counting_time, iterations)
+        )
+        self.inst.source.set_output(False)
+        self.inst.meter.local_key()
+
+        if voltage > 0.005:
+            print(
+                "%0.2e +/- %0.1e wire switched" % (count_rate_avg, self.count_rate_std)
+            )
+        else:
+            print("%0.2e +/- %0.1e" % (count_rate_avg, self.count_rate_std))
         return count_rate_avg
 
     def tc_measurement(self, voltage, path):
@@ -371,6 +416,8 @@ class IvSweep(Snspd):
 
     """
 
+    isw_estimate = None
+
     def run_sweep_fixed(self, double_ended=False):
         """Runs IV sweep with config paramters
         This constructs #steps between start and 75% of final current.
@@ -490,6 +537,51 @@ class IvSweep(Snspd):
         self.v_read = voltage
         self.i_read = current
 
+    def run_sweep_hardware(self):
+        """Runs the run_sweep_sourceMeter current list as a hardware list
+        sweep on the Sourcemeter (Keithley2400, Keithley2450 or
+        KeysightB2912a).  The whole list is loaded at once and stepped by the
+        instrument, readings stream back while it runs.  Optional iv_sweep
+        key [delay: source delay per point in s, default 0.01]
+        """
+        self.inst.sourcemeter.set_output(False)
+        self.inst.sourcemeter.setup_2W_source_I_read_V()
+
+        start = self.properties["iv_sweep"]["start"]
+        stop = self.properties["iv_sweep"]["stop"]
+        steps = self.properties["iv_sweep"]["steps"]
+        sweep = self.properties["iv_sweep"]["sweep"]
+        delay = self.properties["iv_sweep"].get("delay", 0.01)
+        # To select full (positive and negative) trace or half trace
+        full_sweep = self.properties["iv_sweep"]["full_sweep"]
+        Isource1 = np.linspace(start, stop * 0.75, steps)  # Coarse
+        Isource2 = np.linspace(stop * 0.75, stop, steps)  # Fine
+
+        if full_sweep:
+            Isource = np.concatenate(
+                [Isource1, Isource2, Isource2[::-1], Isource1[::-1]]
+            )
+            Isource = np.concatenate([Isource, -Isource])
+        else:
+            Isource = np.concatenate([Isource1, Isource2])
+        self.I_set = np.tile(Isource, sweep)
+
+        def progress(iread, vread):
+            print("V=%.4f V, I=%.2f uA" % (vread[-1], iread[-1] * 1e6))
+
+        self.inst.sourcemeter.set_output(True)
+        try:
+            current, voltage = self.inst.sourcemeter.list_sweep(
+                self.I_set, delay, callback=progress
+            )
+        finally:
+            self.inst.sourcemeter.set_current(0)
+            self.inst.sourcemeter.set_output(False)
+
+        self.v_set = voltage  # No series resistor, the source sees the device
+        self.v_read = voltage
+        self.i_read = current
+
     def run_sweep_dynamic(self):
         """Runs IV sweep with config paramters
         This constructs [points_coarse] between start and [percent] of final current.
@@ -596,37 +688,18 @@ class IvSweep(Snspd):
         self.v_read = voltage
         self.i_read = current
 
-    def isw_calc(self):
-        """Calculates critical current."""
-        """
-        Critical current is defined as the current one step before a voltage
-        reading greater than 5mV.
-        self.isw = self.i_read[np.argmax(np.array(self.v_read) > 0.005)-1]
-        print('%.4f uA' % (self.isw*1e6))
-        """
+    def run_sweep_adaptive(self):
+        """Runs IV sweeps that put their points near Isw and Ir, see
+        qf.run_sweep_adaptive.  Optional iv_sweep keys: [step_coarse],
+        [step_fine], [v_threshold], [tolerance], [isw_estimate]."""
+        qf.run_sweep_adaptive(self, self.inst.source, self.inst.meter)
 
-        """ New method looks at differential and takes average of points that 
-        meet condition. Prints mean() and std().` std should be < 1-2µA
+    def isw_calc(self):
+        """Calculates switching and retrapping current of every sweep, see
+        qf.isw_calc. Prints mean() and std() over all switches, std should
+        be < 1-2µA.
         """
-        # isws = abs(self.i_read[np.where(abs(np.diff(self.i_read)/max(np.diff(self.i_read))) > 0.5)])
-        # self.isw = self.i_read[np.argmax(np.array(self.v_read) > 0.005)-1]
-        # print('%.4f uA' % (self.isw*1e6))
-
-        try:
-            switches = np.asarray(
-                np.where(abs(np.diff(self.i_read) / max(np.diff(self.i_read))) > 0.8),
-                dtype=int,
-            ).squeeze()
-            isws = abs(np.asarray([self.i_read[i] for i in switches]))
-            print(isws)
-            self.isw = isws.mean()
-            print(
-                "Isw_avg = %.4f µA :--: Isw_std = %.4f µA"
-                % (self.isw * 1e6, isws.std() * 1e6)
-            )
-        except Exception:
-            print("Could not calculate Isw. Isw set to 0")
-            self.isw = 0
+        qf.isw_calc(self)
 
     def plot(self):
         full_path = qf.save(self.properties, "iv_sweep")
@@ -855,6 +928,8 @@ class PhotonCounts(Snspd):
         """
         self.LCR = []
         self.DCR = []
+        self.LCR_std = []
+        self.DCR_std = []
         self.attenuation = 0
         Snspd.__init__(self, config)
 
@@ -877,6 +952,7 @@ class PhotonCounts(Snspd):
         self.inst.attenuator.set_beam_block(True)
 
         count_rate_list = []
+        count_rate_std = []
 
         print("\\\\\\\\ DARK COUNT RATE \\\\\\\\")
         for n, j in enumerate(currents):  # sweep current
@@ -885,6 +961,7 @@ class PhotonCounts(Snspd):
             count_rate_avg = Snspd.average_counts(
                 self, counting_time, iterations, trigger_v
             )
+            count_rate_std.append(self.count_rate_std)
 
             count_rate_list.append(
                 count_rate_avg
@@ -902,6 +979,7 @@ class PhotonCounts(Snspd):
 
         self.inst.source.set_output(False)
         self.DCR = np.asarray(count_rate_list, dtype=np.float32)
+        self.DCR_std = np.asarray(count_rate_std, dtype=np.float32)
         #        self.DCR = currents*2  # here for testing
 
         return self.DCR
@@ -925,6 +1003,7 @@ class PhotonCounts(Snspd):
         self.inst.attenuator.set_beam_block(False)
 
         count_rate_list = []
+        count_rate_std = []
 
         print("\\\\\\\\ LIGHT COUNT RATE \\\\\\\\")
         for n, j in enumerate(currents):  # sweep current
@@ -934,6 +1013,7 @@ class PhotonCounts(Snspd):
             count_rate_avg = Snspd.average_counts(
                 self, counting_time, iterations, trigger_v
             )
+            count_rate_std.append(self.count_rate_std)
             count_rate_list.append(
                 count_rate_avg
             )  # final countrate at this current is the average of each itteration
@@ -950,6 +1030,7 @@ class PhotonCounts(Snspd):
         self.inst.attenuator.set_beam_block(True)
         self.inst.source.set_output(False)
         self.LCR = np.asarray(count_rate_list, dtype=np.float32)
+        self.LCR_std = np.asarray(count_rate_std, dtype=np.float32)
 
         #        self.LCR = currents*3 # here for testing
         return self.LCR
@@ -1123,6 +1204,8 @@ class PhotonCounts(Snspd):
         data_dict = {
             "LCR": self.LCR,
             "DCR": self.DCR,
+            "LCR_std": self.LCR_std,
+            "DCR_std": self.DCR_std,
             "currents": self.currents,
             "wavelength": self.properties["Laser"]["wavelength_nm"],
             "attenuation": self.attenuation,
@@ -1136,6 +1219,259 @@ class PhotonCounts(Snspd):
         )
 
 
+class PhotonCountChannel:
+    """One device of a PhotonCountsMulti run with its own counter, source and
+    meter.  Has the attributes Snspd.average_counts uses so the counting code
+    is shared with PhotonCounts."""
+
+    def __init__(self, number, counter, source, meter, R_srs, trigger_v, counter_prop):
+        self.number = number
+        self.inst = SimpleNamespace(counter=counter, source=source, meter=meter)
+        self.R_srs = R_srs
+        self.trigger_v = trigger_v
+        self.properties = {"Counter": counter_prop}
+        self.count_rate_std = 0
+
+    def instruments(self):
+        return [self.inst.counter, self.inst.source, self.inst.meter]
+
+    def set_bias(self, current):
+        self.inst.source.set_voltage(voltage=current * self.R_srs)
+
+    def counts(self, counting_time, iterations):
+        count_rate_avg = Snspd.average_counts(
+            self, counting_time, iterations, self.trigger_v
+        )
+        return count_rate_avg, self.count_rate_std
+
+
+class PhotonCountsMulti(Snspd):
+    """Dark and light count rates of several devices in one pass.
+
+    Each device is a channel made of CounterN, SourceN and MeterN (Counter,
+    Source and Meter without a number are used when there is only one, and
+    are shared when a channel has no numbered instrument of its own).
+    Channels run in parallel, one thread per group of channels that share a
+    VISA resource.  At every bias point all channels count with the beam
+    blocked and unblocked; the order alternates between bias points so the
+    attenuator only switches once per point.
+
+    Configuration: photon_counts:
+    [start: initial bias current]
+    [stop: final bias current]
+    [step: current step size]
+    [trigger_v: trigger voltage set on counter, one value or one per channel]
+    [counting_time: integration time on counter]
+    [iterations: number of repeated count measurements to average over]
+    [attenuation_db: optical attenuation]
+    [series_resistance: optional, one value or one per channel. Defaults to
+        iv_sweep series_resistance]
+    [device_names: optional, device name of each channel for saving]
+    """
+
+    def __init__(self, config):
+        self.LCR = []
+        self.DCR = []
+        self.LCR_std = []
+        self.DCR_std = []
+        self.attenuation = 0
+        Snspd.__init__(self, config)
+        self.channels = self.find_channels()
+
+    def find_channels(self):
+        prop = self.properties["photon_counts"]
+        numbers = sorted(
+            int(name[len("Counter") :] or 0)
+            for name in self.inst.instrument_list
+            if name.startswith("Counter")
+        )
+        if not numbers:
+            raise NameError(
+                "photon_counts needs at least one Counter (Counter, Counter1, ...) "
+                "in the configuration"
+            )
+        channels = []
+        for k, number in enumerate(numbers):
+            suffix = str(number) if number else ""
+
+            def pick(kind):
+                inst = getattr(self.inst, kind + suffix, None)
+                return inst if inst is not None else getattr(self.inst, kind)
+
+            def per_channel(value):
+                return value[k] if isinstance(value, (list, tuple)) else value
+
+            channels.append(
+                PhotonCountChannel(
+                    number,
+                    pick("counter"),
+                    pick("source"),
+                    pick("meter"),
+                    per_channel(
+                        prop.get("series_resistance", getattr(self, "R_srs", None))
+                    ),
+                    per_channel(prop["trigger_v"]),
+                    self.properties.get("Counter" + suffix, {}),
+                )
+            )
+        return channels
+
+    def channel_groups(self):
+        """Channels sharing any instrument end up in the same group, each
+        group is run by one thread so a VISA resource is never used by two
+        threads at once"""
+        groups = []  # [set of instrument ids, channels]
+        for channel in self.channels:
+            ids = {id(i) for i in channel.instruments() if i is not None}
+            members = [channel]
+            for group in [g for g in groups if g[0] & ids]:
+                groups.remove(group)
+                ids |= group[0]
+                members = group[1] + members
+            groups.append([ids, members])
+        return [g[1] for g in groups]
+
+    def run_parallel(self, pool, groups, function):
+        """Calls function(channel) for every channel, groups in parallel, and
+        returns the results in channel order"""
+
+        def run_group(group):
+            return [(channel, function(channel)) for channel in group]
+
+        results = {}
+        for future in [pool.submit(run_group, group) for group in groups]:
+            for channel, result in future.result():
+                results[channel.number] = result
+        return [results[channel.number] for channel in self.channels]
+
+    def set_beam(self, state):
+        """Attenuator state machine shared by all channels, 'dark' blocks the
+        beam and 'light' unblocks it.  Only changes are sent."""
+        if state != self.beam_state:
+            self.inst.attenuator.set_beam_block(state == "dark")
+            self.beam_state = state
+            sleep(0.1)
+
+    def run_sweep(self):
+        """Dark and light counts of every channel at every bias point"""
+        iterations = self.properties["photon_counts"]["iterations"]
+        start = self.properties["photon_counts"]["start"]
+        stop = self.properties["photon_counts"]["stop"]
+        step = self.properties["photon_counts"]["step"]
+        counting_time = self.properties["photon_counts"]["counting_time"]
+        self.attenuation = self.properties["photon_counts"]["attenuation_db"]
+
+        currents = np.arange(start, stop, step)
+        self.currents = currents
+        shape = (len(self.channels), len(currents))
+        rates = {
+            "dark": (np.zeros(shape, np.float32), np.zeros(shape, np.float32)),
+            "light": (np.zeros(shape, np.float32), np.zeros(shape, np.float32)),
+        }
+
+        self.inst.attenuator.set_attenuation_db(self.attenuation)
+        self.beam_state = None
+        groups = self.channel_groups()
+        print(
+            "\\\\\\\\ DARK/LIGHT COUNT RATE: %d channels, %d threads \\\\\\\\"
+            % (len(self.channels), len(groups))
+        )
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            for n, j in enumerate(currents):  # sweep current
+                start_time = time.time()
+                self.run_parallel(pool, groups, lambda c: c.set_bias(j))
+                sleep(0.1)
+                states = ("dark", "light") if n % 2 == 0 else ("light", "dark")
+                for state in states:
+                    self.set_beam(state)
+                    result = self.run_parallel(
+                        pool, groups, lambda c: c.counts(counting_time, iterations)
+                    )
+                    for k, (mean, std) in enumerate(result):
+                        rates[state][0][k, n] = mean
+                        rates[state][1][k, n] = std
+                print(
+                    "Current value %0.2f uA - DCR = %s - LCR = %s   (%s of %s: %0.2f min)"
+                    % (
+                        j * 1e6,
+                        " ".join("%0.2e" % r for r in rates["dark"][0][:, n]),
+                        " ".join("%0.2e" % r for r in rates["light"][0][:, n]),
+                        n + 1,
+                        len(currents),
+                        (time.time() - start_time) / 60.0,
+                    )
+                )
+
+        self.set_beam("dark")
+        for channel in self.channels:
+            channel.inst.source.set_output(False)
+        self.DCR, self.DCR_std = rates["dark"]
+        self.LCR, self.LCR_std = rates["light"]
+        return self.DCR, self.LCR
+
+    def channel_properties(self, k):
+        """Properties with the sample and device name of channel k for saving"""
+        properties = dict(self.properties)
+        save_file = dict(properties["Save File"])
+        save_file["sample name"] = save_file.get(
+            "sample name %d" % (k + 1), self.sample_name
+        )
+        device_names = self.properties["photon_counts"].get("device_names")
+        if device_names:
+            save_file["device name"] = device_names[k]
+        elif len(self.channels) > 1:
+            save_file["device name"] = "%s_ch%d" % (self.device_name, k + 1)
+        properties["Save File"] = save_file
+        return properties
+
+    def plot(self):
+        """Plots DCR, LCR, and LCR-DCR of every channel"""
+        for k in range(len(self.channels)):
+            properties = self.channel_properties(k)
+            full_path = qf.save(properties, "photon_counts")[0]
+            qf.plot(
+                self.currents * 1e6,
+                [self.DCR[k], self.LCR[k], self.LCR[k] - self.DCR[k]],
+                title=properties["Save File"]["sample name"]
+                + " "
+                + self.device_type
+                + " "
+                + properties["Save File"]["device name"]
+                + " "
+                + str(self.properties["Laser"]["wavelength_nm"])
+                + "nm "
+                + str(self.attenuation)
+                + "dB",
+                xlabel="Current (uA)",
+                ylabel="Count Rate (Hz)",
+                label=["DCR", "LCR", "LCR-DCR"],
+                path=full_path,
+                show=True,
+                close=True,
+            )
+
+    def save(self):
+        """One photon_counts file per channel"""
+        if "Laser" not in self.instrument_list:
+            self.instrument_list.append("Laser")
+        for k in range(len(self.channels)):
+            data_dict = {
+                "LCR": self.LCR[k],
+                "DCR": self.DCR[k],
+                "LCR_std": self.LCR_std[k],
+                "DCR_std": self.DCR_std[k],
+                "currents": self.currents,
+                "wavelength": self.properties["Laser"]["wavelength_nm"],
+                "attenuation": self.attenuation,
+            }
+            qf.save(
+                self.channel_properties(k),
+                "photon_counts",
+                data_dict,
+                instrument_list=self.instrument_list,
+            )
+
+
 class LinearityCheck(Snspd):
     """Class object for Linearity Measurement.
     Sweeps atteunation and measures count rate.
@@ -1169,6 +1505,7 @@ class LinearityCheck(Snspd):
         self.inst.attenuator.set_beam_block(False)
 
         counts_per_atten = []
+        counts_std = []
         start_time = time.time()
         for i in dbs:
             self.inst.attenuator.set_attenuation_db(i)
@@ -1177,6 +1514,7 @@ class LinearityCheck(Snspd):
                 self, counting_time, iterations, trigger_v
             )
             counts_per_atten.append(count_rate_avg)
+            counts_std.append(self.count_rate_std)
             print(
                 "Attenuation: %.1f dB \\\\ Counts: %.0f \\\\ Elapsed Time: %.2f"
                 % (i, count_rate_avg, time.time() - start_time)
@@ -1184,6 +1522,7 @@ class LinearityCheck(Snspd):
         self.inst.attenuator.set_beam_block(True)
 
         self.counts_per_atten = np.asarray(counts_per_atten, dtype=np.float32)
+        self.counts_std = np.asarray(counts_std, dtype=np.float32)
         self.attenuation_levels = np.asarray(dbs, dtype=np.float32)
         self.linearity_bias = bias
 
@@ -1198,6 +1537,7 @@ class LinearityCheck(Snspd):
 
         continue_sweep = True
         counts_per_atten = []
+        counts_std = []
         dbs = []
         start_time = time.time()
         while continue_sweep:
@@ -1207,6 +1547,7 @@ class LinearityCheck(Snspd):
                 self, counting_time, iterations, trigger_v
             )
             counts_per_atten.append(count_rate_avg)
+            counts_std.append(self.count_rate_std)
             print(
                 "Attenuation: %.1f dB \\\\ Counts: %.0f \\\\ Elapsed Time: %.2f"
                 % (db, count_rate_avg, time.time() - start_time)
@@ -1215,6 +1556,7 @@ class LinearityCheck(Snspd):
             continue_sweep = int(input("Continue sweep?"))
             print(continue_sweep)
         self.counts_per_atten = np.asarray(counts_per_atten, dtype=np.float32)
+        self.counts_std = np.asarray(counts_std, dtype=np.float32)
         self.attenuation_levels = np.asarray(dbs, dtype=np.float32)
         self.linearity_bias = bias
 
@@ -1242,6 +1584,7 @@ class LinearityCheck(Snspd):
         data_dict = {
             "attenuation": self.attenuation_levels,
             "counts": self.counts_per_atten,
+            "counts_std": self.counts_std,
             "bias": self.linearity_bias,
         }
 
@@ -1377,18 +1720,17 @@ class PulseTraceMultiple(Snspd):
 
         self.inst.source.set_voltage(self.properties["pulse_trace"]["bias_voltage"])
         self.inst.source.set_output(True)
-        for n in range(number_of_traces):
-            self.inst.meter.read_voltage()
-            self.inst.scope.set_trigger_mode(trigger_mode="Single")
-            while self.inst.scope.get_trigger_mode() != "Stopped\n":
-                sleep(0.001)
-
+        for n, traces in self.inst.scope.acquire(
+            channels=channels,
+            num_acquisitions=number_of_traces,
+            before_arm=self.inst.meter.read_voltage,
+        ):
             xlist = []
             ylist = []
             for i in range(len(channels)):
-                x, y = self.inst.scope.get_single_trace(channel=channels[i])
+                x, data, desc = traces[channels[i]]
                 xlist.append(x)  # keep all x data the same.
-                ylist.append(y)
+                ylist.append(self.inst.scope.scale_wf_data(data, desc))
 
             total_xlist.append(np.asarray(xlist, dtype=np.float32))
             total_ylist.append(np.asarray(ylist, dtype=np.float32))
@@ -1397,6 +1739,7 @@ class PulseTraceMultiple(Snspd):
 
         self.trace_x = np.asarray(total_xlist, dtype=np.float32)
         self.trace_y = np.asarray(total_ylist, dtype=np.float32)
+        self.acquisition_stats = self.inst.scope.acquisition_stats
         self.inst.source.set_output(False)
 
         return self.trace_x, self.trace_y
@@ -1615,9 +1958,11 @@ class KineticInductancePhase(Snspd):
             if plot:
                 self.plot()
             if save:
-                self.save()
+                self.save(background=True)
         self.inst.source.set_output(False)
         self.inst.VNA.write("CALC:FORM MLOG")
+        if save:
+            qf.save_writer().flush()
 
     def plot(self):
         full_path = qf.save(self.properties, "kinetic_inductance_phase")
@@ -1642,7 +1987,7 @@ class KineticInductancePhase(Snspd):
             close=True,
         )
 
-    def save(self):
+    def save(self, background=False):
         data_dict = {
             "freq": self.f,
             "re": self.re,
@@ -1660,6 +2005,7 @@ class KineticInductancePhase(Snspd):
             "kinetic_inductance_phase",
             data_dict,
             instrument_list=self.instrument_list,
+            background=background,
         )
 
 
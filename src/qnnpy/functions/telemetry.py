@@ -0,0 +1,307 @@
+"""Shared cryostat telemetry.
+
+One background thread per cryostat reads its temperatures (the tail of the
+ICE log, or a Lakeshore336/Cryocon temperature controller) every interval
+seconds and keeps the latest sample and a history ring buffer. Measurement
+code reads the latest sample without touching the log file or the
+instrument:
+
+    sample = telemetry.latest("ICE", max_age=60)  # None if stale
+    sample.time, sample.values
+
+latest() uses the service of this process if there is one, otherwise a
+telemetry daemon on this machine, started with
+
+    python -m qnnpy.functions.telemetry --ice
+    python -m qnnpy.functions.telemetry --instrument probe Lakeshore336 GPIB0::12::INSTR A,B
+
+and otherwise starts an in-process reader for ICE. Samples older than
+max_age count as stale, ie: when ICE logging is off.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque, namedtuple
+
+ice_results = r"S:\SC\InstrumentLogging\Cryogenics\Ice\ice-log\Results"
+default_port = 50736
+
+# time: epoch time of the reading, values: temperatures in K
+Sample = namedtuple("Sample", "time values")
+
+
+class Telemetry:
+    """
+    Background reader of one cryostat.
+
+    Parameters
+    ----------
+    name : str
+        name the samples are published under, ie: ICE.
+    reader : callable
+        returns (epoch time, [temperatures]).
+    interval : float, optional
+        time between readings. The default is 1 s.
+    history : int, optional
+        number of samples kept. The default is 3600.
+    """
+
+    def __init__(self, name, reader, interval: float = 1.0, history: int = 3600):
+        self.name = name
+        self.reader = reader
+        self.interval = interval
+        self.history = deque(maxlen=history)
+        self.sample = None
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def read(self):
+        try:
+            t, values = self.reader()
+        except Exception as e:
+            if repr(e) != repr(self.error):
+                print(f"TELEMETRY {self.name}: {e}")
+            self.error = e
+            return None
+        sample = Sample(float(t), tuple(float(v) for v in values))
+        if self.sample is None or sample.time != self.sample.time:
+            self.history.append(sample)
+        self.sample = sample
+        self.error = None
+        return sample
+
+    def start(self):
+        """Takes the first reading, then keeps reading in the background"""
+        self.read()
+        self.thread = threading.Thread(
+            target=self._run, name=f"qnnpy-telemetry-{self.name}", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.read()
+
+    def stop(self):
+        self.stopped.set()
+
+    def latest(self, max_age: float = None):
+        """Latest sample, None if there is none or it is older than max_age s"""
+        sample = self.sample
+        if sample is None or (
+            max_age is not None and time.time() - sample.time > max_age
+        ):
+            return None
+        return sample
+
+    def since(self, seconds: float) -> list:
+        """Samples of the last seconds"""
+        start = time.time() - seconds
+        return [s for s in list(self.history) if s.time >= start]
+
+
+def ice_reader(results: str = ice_results):
+    """Reader of the last line of today's ICE log, or yesterday's until the
+    ICE software starts today's"""
+    from qnnpy.functions.functions import read_last_line
+
+    def read():
+        today = datetime.date.today()
+        for day in (today, today - datetime.timedelta(days=1)):
+            path = os.path.join(results, str(day), f"{day}.log")
+            if os.path.exists(path):
+                break
+        else:
+            raise FileNotFoundError(f"no ICE log for {today} in {results}")
+        # date, time, epoch time, date time, T1, T2, T3, T4, ...
+        cells = read_last_line(path).split(",")
+        return float(cells[2]), [float(c) for c in cells[4:8]]
+
+    return read
+
+
+def instrument_reader(instrument, channels=("A",)):
+    """Reader of the temperature channels of a Lakeshore336 or Cryocon"""
+
+    def read():
+        return time.time(), [instrument.read_temp(channel) for channel in channels]
+
+    return read
+
+
+services = {}
+services_lock = threading.Lock()
+
+
+def start(name: str, reader=None, interval: float = 1.0, history: int = 3600):
+    """Starts (or returns the running) in-process service name. Without
+    reader only ICE is known"""
+    with services_lock:
+        if name not in services:
+            if reader is None:
+                if name != "ICE":
+                    raise NameError(f"no telemetry reader for {name}")
+                reader = ice_reader()
+            services[name] = Telemetry(name, reader, interval, history).start()
+        return services[name]
+
+
+class TelemetryClient:
+    """Connection to the telemetry daemon on this machine"""
+
+    def __init__(self, port: int = default_port, timeout: float = 1.0):
+        self.socket = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile("rwb")
+        self.lock = threading.Lock()
+
+    def request(self, name: str, seconds: float = None) -> list:
+        line = name if seconds is None else f"{name} {seconds}"
+        with self.lock:
+            self.file.write(line.encode() + b"\n")
+            self.file.flush()
+            reply = json.loads(self.file.readline())
+        if "error" in reply:
+            raise NameError(reply["error"])
+        return [Sample(t, tuple(values)) for t, values in reply["samples"]]
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+client_instance = None
+client_retry = 0.0
+
+
+def client():
+    """Shared TelemetryClient, None if no daemon is running (retried every
+    10 s)"""
+    global client_instance, client_retry
+    if client_instance is None and time.time() > client_retry:
+        try:
+            client_instance = TelemetryClient()
+        except OSError:
+            client_retry = time.time() + 10
+    return client_instance
+
+
+def latest(name: str = "ICE", max_age: float = None):
+    """
+    Latest sample of name from this process, the local daemon, or a new
+    in-process service (ICE only).
+
+    Returns
+    -------
+    Sample or None
+        None if there is no sample or it is older than max_age s.
+
+    """
+    global client_instance
+    service = services.get(name)
+    if service is None:
+        connection = client()
+        if connection is not None:
+            try:
+                samples = connection.request(name)
+            except NameError:
+                samples = None
+            except (OSError, ValueError):
+                connection.close()
+                client_instance = None
+                samples = None
+            if samples is not None:
+                sample = samples[-1] if samples else None
+                if sample is None or (
+                    max_age is not None and time.time() - sample.time > max_age
+                ):
+                    return None
+                return sample
+        service = start(name)
+    return service.latest(max_age)
+
+
+def history(name: str = "ICE", seconds: float = 3600) -> list:
+    """Samples of the last seconds, see latest"""
+    service = services.get(name)
+    if service is None:
+        connection = client()
+        if connection is not None:
+            return connection.request(name, seconds)
+        service = start(name)
+    return service.since(seconds)
+
+
+class TelemetryHandler(socketserver.StreamRequestHandler):
+    # one line per request: "NAME" for the latest sample, "NAME SECONDS" for
+    # the history, answered with {"samples": [[time, [values]], ...]}
+    def handle(self):
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for line in self.rfile:
+            name, _, seconds = line.decode().strip().partition(" ")
+            service = services.get(name)
+            if service is None:
+                reply = {"error": f"no telemetry for {name}"}
+            elif seconds:
+                reply = {"samples": service.since(float(seconds))}
+            else:
+                sample = service.sample
+                reply = {"samples": [] if sample is None else [sample]}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+
+class TelemetryServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(port: int = default_port):
+    """Serves the services of this process on 127.0.0.1:port until
+    interrupted"""
+    with TelemetryServer(("127.0.0.1", port), TelemetryHandler) as server:
+        print(f"Telemetry of {', '.join(services)} on port {port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cryostat telemetry daemon")
+    parser.add_argument("--ice", nargs="?", const=ice_results, help="ICE Results")
+    parser.add_argument(
+        "--instrument",
+        nargs=4,
+        action="append",
+        default=[],
+        metavar=("NAME", "DRIVER", "PORT", "CHANNELS"),
+        help="ie: probe Lakeshore336 GPIB0::12::INSTR A,B",
+    )
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=default_port)
+    args = parser.parse_args(argv)
+
+    if args.ice:
+        start("ICE", ice_reader(args.ice), args.interval)
+    for name, driver, port, channels in args.instrument:
+        from qnnpy.instruments import registry
+
+        instrument = registry.driver_class("Temperature", driver)(port)
+        reader = instrument_reader(instrument, channels.split(","))
+        start(name, reader, args.interval)
+    if not services:
+        parser.error("nothing to serve, use --ice or --instrument")
+    serve(args.port)
+
+
+if __name__ == "__main__":
+    main()
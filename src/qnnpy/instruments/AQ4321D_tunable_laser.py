@@ -1,25 +1,15 @@
 # This file contains the class for the Keithley 2001 Multimeter
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class Keithley2001(object):
+class Keithley2001(VisaInstrument):
     """Python class for Keithley 2001 Multimeter, written by Adam McCaughan"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
         # Anything else here that needs to happen on initialization
 
     def reset(self):
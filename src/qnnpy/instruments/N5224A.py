@@ -1,8 +1,9 @@
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class N5224A(object):
+
+class N5224A(VisaInstrument):
     """
 
     DO NOT USE. THIS SCRIPT IS BEING PHASED OUT.
@@ -19,20 +20,10 @@ class N5224A(object):
     """
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
         self.timeout = 5
@@ -1,11 +1,11 @@
-import visa
 from ThorlabsPM100 import ThorlabsPM100
 
+from qnnpy.instruments.visa_transport import open_resource
+
 
 class ThorlabsPM100Meta(ThorlabsPM100):
     def __init__(self, USB_address, verbose=False):
-        rm = visa.ResourceManager()
-        inst = rm.open_resource(USB_address)
+        inst = open_resource(USB_address)
         self._verbose = verbose
         self._inst = inst
 
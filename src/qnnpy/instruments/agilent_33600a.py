@@ -1,29 +1,20 @@
 import numpy as np
-import pyvisa
+
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
 # the commonds can be found in the following link
 # http://rfmw.em.keysight.com/bihelpfiles/Trueform/webhelp/US/Default.htm?lc=eng&cc=US&id=2197433
-class Agilent33600a(object):
+class Agilent33600a(VisaInstrument):
     """Python class for Agilent 33600a 80MHz Frequency Generator, written by Adam McCaughan
     Modified for qnnpy compatibility by Emma Batson
     """
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def beep(self):
         self.pyvisa.write("SYST:BEEP")
 
@@ -1,29 +1,20 @@
 import time
 
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class Agilent53230a(object):
+
+class Agilent53230a(VisaInstrument):
     """Python class for Agilent 53230a counter, written by Adam McCaughan,
     modified from 5131a for 53230a by Emma Batson
     Use like c = Agilent53131a('GPIB0::3')"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
 
@@ -1,24 +1,14 @@
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class Agilent8153A(object):
+class Agilent8153A(VisaInstrument):
     """Python class for Agilent 8153A power meter, written by Adam McCaughan"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
 
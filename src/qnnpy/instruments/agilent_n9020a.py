@@ -1,26 +1,21 @@
 from time import sleep
 
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class N9020A(object):
+
+class N9020A(VisaInstrument):
     """Python class for Agilent (now Keyseight) N9020A signal analyzer, written by Di Zhu, 2020."""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.rsc = rm.open_resource(visa_name, read_termination="\n")
+        super().__init__(visa_name, read_termination="\n")
         self.rsc.timeout = 5000  # Set response timeout (in milliseconds)
         # self.rsc.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.rsc.read()
-
-    def write(self, string):
-        self.rsc.write(string)
-
-    def query(self, string):
-        return self.rsc.query(string)
+    @property
+    def rsc(self):
+        return self.pyvisa
 
     def idn(self):
         self.query("*IDN?")
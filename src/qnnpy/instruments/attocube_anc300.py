@@ -1,16 +1,15 @@
 import time
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class AttocubeANC300(object):
+class AttocubeANC300(VisaInstrument):
     """Python class for Attocube ANC300 peizo controller, by Di Zhu 2016"""
 
     """functions follow the user manual """
 
     def __init__(self, visa_name, baud_rate=38400):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name, baud_rate=baud_rate)
+        super().__init__(visa_name, baud_rate=baud_rate)
         self.pyvisa.timeout = 5000  # set response time in milliseconds
 
     def reset(self):
@@ -27,9 +26,6 @@ class AttocubeANC300(object):
             readline = self.pyvisa.read()
         return results
 
-    def write(self, string):
-        self.pyvisa.write(string)
-
     def query(self, string):
         self.write(string)
         return self.read()
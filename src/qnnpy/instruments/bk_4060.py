@@ -1,7 +1,9 @@
 import numpy as np 
-import pyvisa
 
-class BK4060(object):
+from qnnpy.instruments.visa_transport import VisaInstrument
+
+
+class BK4060(VisaInstrument):
     """
     Python class for BK4060 AWG, written by Emma Batson 
 
@@ -21,8 +23,7 @@ class BK4060(object):
     """
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         self.load = '50'
@@ -30,15 +31,6 @@ class BK4060(object):
         self.output1 = False
         self.output2 = False
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
 
@@ -4,27 +4,17 @@ Created on Feb 26, 2020
 @author: dizhu
 """
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class EXFOT100S(object):
+class EXFOT100S(VisaInstrument):
     """Python class for EXFO T100S-HP, written by Di Zhu."""
 
     def __init__(self, visa_name, timeout=15000):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = timeout  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def get_wl(self):
         return float(self.query("L?").strip().split("=")[1])
 
@@ -5,27 +5,17 @@ Created on Fri Dec 27 12:16:08 2019
 @author: dizhu
 """
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class TMC_T2240(object):
+class TMC_T2240(VisaInstrument):
     """Python class for HMC0T2240 singal gnerator, written by Di Zhu."""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def idn(self):
         return self.query("*IDN?").strip()
 
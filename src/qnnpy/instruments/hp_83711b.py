@@ -5,27 +5,17 @@ Created on Feb 26, 2020
 @author: dizhu
 """
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class HP83711B(object):
+class HP83711B(VisaInstrument):
     """Python class for HP 83711B, written by Di Zhu."""
 
     def __init__(self, visa_name, timeout=15000):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = timeout  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def idn(self):
         string = "*IDN?"
         return self.query(string)
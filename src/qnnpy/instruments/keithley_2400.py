@@ -1,27 +1,19 @@
-import pyvisa
-import time
+import numpy as np
 
+from qnnpy.instruments.list_sweep import ListSweep
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class Keithley2400(object):
+
+class Keithley2400(ListSweep, VisaInstrument):
     """Python class for Keithley 2400 Sourcemeter, written by Adam McCaughan"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         self.name = "Keithley2400"
         self.isrc = True # if True, source is current, sense is voltage. if false, is the opposite
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
 
@@ -119,31 +111,42 @@ class Keithley2400(object):
     def get_source_range(self):
         return float(self.query(f':SENS:{"CURR" if self.isrc else "VOLT"}:RANG?'))
     
-    def iv_linsweep(self, i_list, delay):
-        # runs a sweep
-        if len(i_list) > 2500:
-            raise ValueError("lists longer than 2500 are not supported")
-        num_points = len(i_list) 
+    def list_sweep_load(self, values, delay):
         # see pg 171 of manual
-        self.write(f'TRAC:CLE')
-        self.write(f'TRAC:FEED SENS')
-        self.write(f'TRAC:POIN {num_points}')
-        self.write(f'TRAC:FEED:CONT NEXT')
-        sublists = []
-        while len(i_list) > 10:
-            sublists.append([str(i) for i in i_list[:10]])
-            i_list = i_list[10:]
-        sublists.append([str(i) for i in i_list])
-        for n, sublist in enumerate(sublists):
-            self.write(f'SOUR:LIST:CURR{":APP" if n > 0 else ""} {", ".join(sublist)}')
-        self.write('SOUR:CURR:MODE LIST')
-        self.write(f'TRIG:COUN {num_points}')
-        self.write(f'SOUR:DEL {delay}')
-        self.write('INIT')
-        # wait for measurement to finish
-        time.sleep(num_points * (delay + 0.08))
-        while (int(self.query('STAT:OPER:COND?')) & 1024) == 0:
-            time.sleep(self.pyvisa.timeout)
-        raw_data = self.query('TRAC:DATA?')
-        data = [float(d) for d in raw_data.split(',')]
-        return data[1::5], data[::5]
+        func = "CURR" if self.isrc else "VOLT"
+        num_points = len(values)
+        self.write("FORM:ELEM VOLT,CURR")  # Only transfer what we use
+        self.write("TRAC:CLE")
+        self.write("TRAC:FEED SENS")
+        self.write(f"TRAC:POIN {num_points}")
+        self.write("TRAC:FEED:CONT NEXT")
+        self.list_sweep_values(f"SOUR:LIST:{func}", values)
+        self.write(f"SOUR:{func}:MODE LIST")
+        self.write(f"TRIG:COUN {num_points}")
+        self.write(f"SOUR:DEL {delay}")
+
+    def list_sweep_finish(self):
+        func = "CURR" if self.isrc else "VOLT"
+        self.write(f"SOUR:{func}:MODE FIX")
+
+    def list_sweep_start(self):
+        self.write("INIT")
+
+    def list_sweep_count(self):
+        return int(self.query("TRAC:POIN:ACT?"))
+
+    def list_sweep_running(self):
+        return (int(self.query("STAT:OPER:COND?")) & 1024) == 0
+
+    # The 2400 can only return the whole buffer, read it once per chunk
+    list_sweep_partial_fetch = False
+
+    def list_sweep_fetch(self, start, stop):
+        data = np.array(self.query("TRAC:DATA?").split(","), dtype=np.float64)
+        voltage, current = data[0::2][start:stop], data[1::2][start:stop]
+        return (current, voltage) if self.isrc else (voltage, current)
+
+    def iv_linsweep(self, i_list, delay):
+        # runs a sweep, see list_sweep
+        current, voltage = self.list_sweep(i_list, delay)
+        return list(current), list(voltage)
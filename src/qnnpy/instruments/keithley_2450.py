@@ -1,25 +1,18 @@
-import pyvisa
-import time
+import numpy as np
 
-class Keithley2450(object):
+from qnnpy.instruments.list_sweep import ListSweep
+from qnnpy.instruments.visa_transport import VisaInstrument
+
+
+class Keithley2450(ListSweep, VisaInstrument):
     """Python class for Keithley 2450 Sourcemeter, written by Dip Joti Paul and Reed Foster"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         self.isrc = True # if True, source is current, sense is voltage. if false, is the opposite
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
 
@@ -121,25 +114,32 @@ class Keithley2450(object):
     def read_voltage(self):
         return float(self.query("READ?"))
     
+    def list_sweep_load(self, values, delay, failabort=False):
+        func = "CURR" if self.isrc else "VOLT"
+        self.write('TRAC:CLE "defbuffer1"')
+        self.list_sweep_values(f"SOUR:LIST:{func}", values)
+        self.write("*WAI")
+        self.write(
+            f'SOUR:SWE:{func}:LIST 1, {delay}, 1, {"ON" if failabort else "OFF"}'
+        )
+
+    def list_sweep_start(self):
+        self.write("INIT")
+
+    def list_sweep_count(self):
+        return int(self.query('TRAC:ACT? "defbuffer1"'))
+
+    def list_sweep_running(self):
+        return self.query("TRIG:STATE?").startswith("RUNNING")
+
+    def list_sweep_fetch(self, start, stop):
+        raw_data = self.query(
+            f'TRAC:DATA? {start + 1}, {stop}, "defbuffer1", SOUR, READ'
+        )
+        data = np.array(raw_data.split(","), dtype=np.float64)
+        return data[0::2], data[1::2]
+
     def iv_linsweep(self, i_list, delay, failabort=False):
-        if len(i_list) > 2500:
-            raise ValueError("lists longer than 2500 are not supported")
-        sublists = []
-        while len(i_list) > 10:
-            sublists.append([str(i) for i in i_list[:10]])
-            i_list = i_list[10:]
-        sublists.append([str(i) for i in i_list])
-        for n, sublist in enumerate(sublists):
-            self.write(f'SOUR:LIST:CURR{":APP" if n > 0 else ""} {", ".join(sublist)}')
-            self.write('*WAI')
-        self.write(f'SOUR:SWE:CURR:LIST 1, {delay}, 1, {"ON" if failabort else "OFF"}')
-        num_points = int(self.query('SOUR:LIST:CURR:POIN?'))
-        self.write('INIT')
-        self.write('*WAI')
-        # wait for measurement to finish
-        time.sleep(num_points * (delay + 0.08))
-        while self.query('TRIG:STATE?').startswith('RUNNING'):
-            time.sleep(self.pyvisa.timeout)
-        raw_data = self.query(f'TRAC:DATA? 1, {num_points}, "defbuffer1", SOUR, READ')
-        data = [float(d) for d in raw_data.split(',')]
-        return data[::2], data[1::2]
+        # runs a sweep, see list_sweep
+        current, voltage = self.list_sweep(i_list, delay, failabort=failabort)
+        return list(current), list(voltage)
@@ -1,6 +1,6 @@
 from enum import Enum
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
 class MeasFunction(Enum):
@@ -15,24 +15,26 @@ class MeasFunction(Enum):
     TEMP = 9
 
 
-class Keithley2700(object):
+class Keithley2700(VisaInstrument):
     """Python class for Keithley 2700 Data Acquisition System, written by Adam McCaughan"""
 
+    # Settings only sent when they change, see VisaInstrument
+    cached_commands = (
+        "FUNC",
+        "VOLT:IDIV",
+        "VOLT:AVER:TCON",
+        "VOLT:AVER:WIND",
+        "VOLT:AVERAGE:COUN",
+        "VOLT:AVER:STAT",
+    )
+    # Front panel keys and channel changes can change the function too
+    reset_commands = VisaInstrument.reset_commands + ("SYST:KEY", "ROUT")
+
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 50000000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def local_key(self):
         self.write("SYST:KEY 17")
 
@@ -88,18 +90,18 @@ class Keithley2700(object):
 
     def resistance_configure4p(self):
         # Configure the instrument for 4-point resistance measurement
-        self.pyvisa.write(
+        self.write(
             "ROUTe:SCAN ((@101,102))"
         )  # Configure single channel for 2-point measurement
-        self.pyvisa.write("SENS:FUNC 'FRES'")  # Set the function to measure resistance
-        self.pyvisa.write("SENS:FRES:NPLC 10")  # Set integration time to 10 PLC
-        self.pyvisa.write("SENS:FRES:RANG 10M")  # Enable auto-range
+        self.write("SENS:FUNC 'FRES'")  # Set the function to measure resistance
+        self.write("SENS:FRES:NPLC 10")  # Set integration time to 10 PLC
+        self.write("SENS:FRES:RANG 10M")  # Enable auto-range
 
     def read_resistance4p(self):
         # Perform the 4-point measurement
-        self.pyvisa.write("INIT")
-        self.pyvisa.write("*WAI")  # Wait for the measurement to complete
-        read_str = self.pyvisa.query("FETCh?")  # Query the resistance value
+        self.write("INIT")
+        self.write("*WAI")  # Wait for the measurement to complete
+        read_str = self.query("FETCh?")  # Query the resistance value
         E_location = read_str.find("E")
         res_str = read_str[0 : read_str.find("E") + 4]
         return float(res_str)
@@ -6,29 +6,19 @@ Version: 0.1
 Date: 15th Feb, 2023
 """
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class Keithley6485(object):
+class Keithley6485(VisaInstrument):
     """Python class for Keithley 6485 Picoammeter"""
 
     """Allow 6485 to warm up for at least one hour before conducting the measurements for accuracy"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 50000000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def local_key(self):
         self.write("SYST:KEY 17")
 
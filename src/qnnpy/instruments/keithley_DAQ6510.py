@@ -1,10 +1,9 @@
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class Keithley6510:
+class Keithley6510(VisaInstrument):
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
 
     def reset(self):
@@ -2,28 +2,35 @@ import time
 from time import sleep
 
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class Keysight53230a(object):
+
+class Keysight53230a(VisaInstrument):
     """Python class for Agilent 53131a counter, written by Adam McCaughan
     Use like c = Agilent53131a('GPIB0::3')"""
 
+    # Settings only sent when they change, see VisaInstrument
+    cached_commands = (
+        "INP1:IMP",
+        "INP1:COUP",
+        "INP1:LEV",
+        "INP1:SLOP",
+        "INP1:NREJ",
+        "FUNC",
+        "TOT:GATE:TIME",
+        "GATE:STAR:SOUR",
+        "TRIG:SOUR",
+        "TRIG:COUN",
+        "TRIG:DEL",
+        "SAMP:COUN",
+    )
+
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
 
@@ -63,6 +70,7 @@ class Keysight53230a(object):
             self.write(":INP1:COUP DC")
 
     def count_rate_setup(self, counting_time=0.1):
+        self.write("SAMP:COUN 1")  # Back to a single gate per READ?
         stringset = "SENS:TOT:GATE:TIME %0.3f" % counting_time
         self.write(stringset)
 
@@ -74,6 +82,46 @@ class Keysight53230a(object):
         # time.sleep(counting_time + 0.1)
         return dcr
 
+    def buffered_counts_setup(self, counting_time=0.1, num_gates=10):
+        """Timed totalize of num_gates consecutive gates per INIT, kept in
+        reading memory.  Only function/gate/trigger/sample settings are
+        touched, the INP1 settings stay as they are.  They are all
+        cached_commands, so repeating the same setup sends nothing until a
+        *RST/CONF or reconnect()"""
+        self.write('SENS:FUNC "TOT:TIM 1"')
+        self.write("SENS:TOT:GATE:TIME %0.3f" % counting_time)
+        self.write("TRIG:SOUR IMM")
+        self.write("TRIG:COUN 1")
+        self.write("SAMP:COUN %d" % num_gates)
+
+    def buffered_counts(self, counting_time=0.1, num_gates=10):
+        """Counts of num_gates gates of counting_time each, read back from
+        reading memory with a single R? transfer.  The counter is only
+        reconfigured when counting_time or num_gates change.
+
+        Returns (mean count rate [Hz], std of count rate [Hz], counts per gate)
+        """
+        self.buffered_counts_setup(counting_time, num_gates)
+        self.write("INIT")
+        timeout = self.pyvisa.timeout
+        self.pyvisa.timeout = max(timeout, (counting_time * num_gates + 5) * 1e3)
+        try:
+            self.query("*OPC?")  # Returns once all gates are in memory
+        finally:
+            self.pyvisa.timeout = timeout
+        block = self.query("R?").strip()
+        # Definite-length block: '#', number of length digits, length, data
+        ndigits = int(block[1])
+        data = block[2 + ndigits :]
+        if int(block[2 : 2 + ndigits] or 0) == 0 or not data:
+            raise ValueError(
+                "R? returned no readings, %d gates of %g s were expected"
+                % (num_gates, counting_time)
+            )
+        counts = np.array(data.split(","), dtype=np.float64)
+        rates = counts / counting_time
+        return rates.mean(), rates.std(), counts
+
     def set_trigger(self, trigger_voltage=-0.075, trigger_slope=None):
         if trigger_slope == "POS" or trigger_slope == "NEG":
             self.write(
@@ -1,23 +1,17 @@
-import pyvisa
+import numpy as np
 
+from qnnpy.instruments.list_sweep import ListSweep
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class KeysightB2912a(object):
+
+class KeysightB2912a(ListSweep, VisaInstrument):
     """Python class for Keithley 2912 Sourcemeter, written by Francesca Incalza and Matteo Castellani :)"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
-
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
+        self.isrc = True  # if True, source is current, sense is voltage. if false, is the opposite
 
     def reset(self):
         self.write("*RST")
@@ -41,6 +35,7 @@ class KeysightB2912a(object):
             ":SENS:REM 1"
         )  # Turn on "Remote Sensing" aka 4-wire measurement mode
         self.write('SENS:FUNC "VOLT", "CURR"')  # Have it output
+        self.isrc = True
 
     def setup_2W_source_I_read_V(self):
         self.write("*RST")
@@ -50,6 +45,7 @@ class KeysightB2912a(object):
             ":SENS:REM 0"
         )  # Turn off "Remote Sensing" aka 4-wire measurement mode
         self.write('SENS:FUNC "VOLT", "CURR"')  # Have it output
+        self.isrc = True
 
     def setup_2W_source_V_read_I(self):
         self.write("*RST")
@@ -59,6 +55,7 @@ class KeysightB2912a(object):
             ":SYST:RSEN 0"
         )  # Turn off "Remote Sensing" aka 4-wire measurement mode
         self.write('SENS:FUNC "VOLT", "CURR"')  # Have it output
+        self.isrc = False
 
     def user_settings(self):
         self.write("*RST")
@@ -123,3 +120,38 @@ class KeysightB2912a(object):
 
     def switch_rear(self):
         self.write(":ROUT:TERM REAR")
+
+    def list_sweep_load(self, values, delay):
+        func = "CURR" if self.isrc else "VOLT"
+        num_points = len(values)
+        self.write(":FORM:ELEM:SENS VOLT,CURR")  # Only transfer what we use
+        self.write(":TRAC:CLE")
+        self.write(":TRAC:FEED SENS")
+        self.write(f":TRAC:POIN {num_points}")
+        self.write(":TRAC:FEED:CONT NEXT")
+        self.write(f":SOUR:FUNC:MODE {func}")
+        self.write(f":SOUR:{func}:MODE LIST")
+        self.list_sweep_values(f":SOUR:LIST:{func}", values)
+        self.write(":TRIG:SOUR AINT")
+        self.write(f":TRIG:COUN {num_points}")
+        self.write(f":TRIG:ACQ:DEL {delay}")
+
+    def list_sweep_finish(self):
+        func = "CURR" if self.isrc else "VOLT"
+        self.write(f":SOUR:{func}:MODE FIX")
+
+    def list_sweep_start(self):
+        self.write(":INIT (@1)")
+
+    def list_sweep_count(self):
+        return int(self.query(":TRAC:POIN:ACT?"))
+
+    def list_sweep_running(self):
+        # operation condition bits 1 and 4: transient and acquire idle (ch 1)
+        return (int(self.query(":STAT:OPER:COND?")) & 18) != 18
+
+    def list_sweep_fetch(self, start, stop):
+        raw_data = self.query(f":TRAC:DATA? {start}, {stop - start}")
+        data = np.array(raw_data.split(","), dtype=np.float64)
+        voltage, current = data[0::2], data[1::2]
+        return (current, voltage) if self.isrc else (voltage, current)
@@ -8,30 +8,18 @@ Created on Tue Mar 28 09:40:21 2023
 import datetime
 
 import numpy as np
-import pyvisa
+
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
 # the commonds can be found in the following link
 # http://rfmw.em.keysight.com/bihelpfiles/Trueform/webhelp/US/Default.htm?lc=eng&cc=US&id=2197433
-class KeysightDSOX(object):
+class KeysightDSOX(VisaInstrument):
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def read_raw(self):
-        return self.pyvisa.read_raw()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def run(self):
         self.write(":RUN")
 
@@ -173,7 +161,7 @@ class KeysightDSOX(object):
             y_increment,
             y_origin,
             y_reference,
-        ) = np.array(val.split(","), dtype=np.float32)
+        ) = np.array(val.split(","), dtype=np.float64)
         return (
             wav_form,
             acq_type,
@@ -195,43 +183,73 @@ class KeysightDSOX(object):
 
         return file_name
 
-    def get_waveform(self, source="CHAN1", form="ASC", points="MAX"):
-        self.write(":WAV:SOUR " + str(source))
+    def setup_waveform(self, form="WORD", points="MAX"):
+        """Sets the transfer format for get_waveform/get_waveforms.
+        form is WORD (16 bit), BYTE or ASC, binary data is sent signed and
+        LSB first so it maps straight onto numpy integers"""
         self.write(":WAV:FORM " + str(form))
         self.write(":WAV:POIN " + str(points))
-
-        xorigin = float(self.query(":WAV:XOR?"))
-        xinc = float(self.query(":WAV:XINC?"))
-        yorigin = float(self.query(":WAV:YOR?"))
-        yinc = float(self.query(":WAV:YINC?"))
-        raw_data = self.query(":WAV:DATA?")
-
-        data = np.array(raw_data[10:-1].split(","), dtype=np.float32)
-        numsamples = len(data)
-
-        x = np.array(range(numsamples)) * xinc + xorigin
-        y = data - yorigin
-        # y = data*yinc - yorigin
+        if form != "ASC":
+            self.write(":WAV:BYT LSBF")
+            self.write(":WAV:UNS 0")
+
+    def read_waveform(self, source="CHAN1", form="WORD"):
+        """Transfers the current waveform of source in the format set by
+        setup_waveform, with a single :WAV:PRE? for the scaling.
+        Returns x, y with y in volts as float32"""
+        with self.lock:  # preamble and data of the same source
+            preamble = self.query(":WAV:SOUR %s;:WAV:PRE?" % source)
+            if form == "ASC":
+                raw_data = self.query(":WAV:DATA?")
+            else:
+                data = self.query_binary_values(
+                    ":WAV:DATA?",
+                    datatype="h" if form == "WORD" else "b",
+                    is_big_endian=False,
+                    container=np.array,
+                    chunk_size=1024 * 1024,
+                )
+        (
+            wav_form,
+            acq_type,
+            wfmpts,
+            avgcnt,
+            x_increment,
+            x_origin,
+            x_reference,
+            y_increment,
+            y_origin,
+            y_reference,
+        ) = np.array(preamble.split(","), dtype=np.float64)
+        if form == "ASC":  # ASCii data is already in volts
+            y = np.array(raw_data[10:-1].split(","), dtype=np.float32)
+        else:
+            y = data.astype(np.float32)
+            y -= y_reference
+            y *= y_increment
+            y += y_origin
+        x = (np.arange(len(y)) - x_reference) * x_increment + x_origin
         return x, y
 
-    def get_single_trace(self, channel="CHAN1", form="ASC", points="MAX"):
-        self.write(":WAV:SOUR " + str(channel))
-        self.write(":WAV:FORM " + str(form))
-        self.write(":WAV:POIN " + str(points))
-
-        xorigin = float(self.query(":WAV:XOR?"))
-        xinc = float(self.query(":WAV:XINC?"))
-        yorigin = float(self.query(":WAV:YOR?"))
-        yinc = float(self.query(":WAV:YINC?"))
-        raw_data = self.query(":WAV:DATA?")
-
-        data = np.array(raw_data[10:-1].split(","), dtype=np.float32)
-        numsamples = len(data)
-
-        x = np.array(range(numsamples)) * xinc + xorigin
-        y = data - yorigin
-        # y = data*yinc - yorigin
-        return x, y
+    def get_waveform(self, source="CHAN1", form="WORD", points="MAX"):
+        self.setup_waveform(form=form, points=points)
+        return self.read_waveform(source=source, form=form)
+
+    def get_waveforms(
+        self, sources=["CHAN1", "CHAN2"], form="WORD", points="MAX", digitize=False
+    ):
+        """Fetches several channels with the transfer format set up once.
+        With digitize=True a single :DIG of all sources is taken first so
+        every channel comes from the same acquisition.
+        Returns {source: (x, y)}"""
+        if digitize:
+            self.write(":DIG " + ",".join(sources))
+            self.query("*OPC?")
+        self.setup_waveform(form=form, points=points)
+        return {s: self.read_waveform(source=s, form=form) for s in sources}
+
+    def get_single_trace(self, channel="CHAN1", form="WORD", points="MAX"):
+        return self.get_waveform(source=channel, form=form, points=points)
 
     def set_measurement_clear(self):
         self.write(":MEAS:CLE")
@@ -1,10 +1,11 @@
 from time import sleep
 
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class KeysightN5224a(object):
+
+class KeysightN5224a(VisaInstrument):
     """Python class for KeysightN5224a network analyzer, written by Di Zhu/Owen Medeiros.
     Connect the GPIB cable to GPIB1 (talker and listener)
 
@@ -15,22 +16,12 @@ class KeysightN5224a(object):
     """
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         # set the data format; this seems to be the only format recognizable
         self.pyvisa.write("FORM ASCii,0")
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(
         self,
         measurement="S21",
@@ -7,7 +7,7 @@ Created on Wed Mar  9 16:12:41 2022
 
 from enum import Enum
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
 class PowerUnit(Enum):
@@ -15,29 +15,19 @@ class PowerUnit(Enum):
     WATT = 1
 
 
-class N7752A(object):
+class N7752A(VisaInstrument):
     """
     Python class for Keysight N7752A Optical Attenuator, modfied from JDS by Emma Batson.
 
     Original python class for JDS HJA9 Optical Attenuator, written by Adam McCaughan."""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         self.attenuation = 0
         self.set_beam_block(beam_block=False)
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def read_power(self, channel=1):
         # returns around -6e1 or -7e1 with laser off
         return self.query("READ{}:POW?".format(channel))
@@ -1,26 +1,18 @@
-import pyvisa
 import numpy as np
 import time
 
-class Lakeshore121(object):
+from qnnpy.instruments.visa_transport import VisaInstrument
+
+
+class Lakeshore121(VisaInstrument):
     """Python class for Lakeshore 121 current source, written by Reed Foster"""
     
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         self.name = "Lakeshore121"
     
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-    
     def reset(self):
         self.write("*RST")
 
@@ -5,7 +5,7 @@ Created on Mon Jan 23 10:39:04 2023
 @author: QNN
 """
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 LAKESHORE_MODE_MAP = {
     "0": "Off",
@@ -17,22 +17,12 @@ LAKESHORE_MODE_MAP = {
 }
 
 
-class Lakeshore336(object):
+class Lakeshore336(VisaInstrument):
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
 
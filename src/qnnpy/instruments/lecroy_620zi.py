@@ -1,36 +1,104 @@
 import datetime
+import numbers
+import struct
 import time
 from time import sleep
 
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class LeCroy620Zi(object):
+
+class TimeAxis(object):
+    """Evenly spaced time axis x[i] = start + i*interval as returned by
+    LeCroy620Zi.get_wf_data.  It is only materialized when numpy asks for it
+    (np.asarray, plotting, savemat), indexing returns floats and slicing or
+    scalar arithmetic returns another TimeAxis"""
+
+    def __init__(self, start, interval, size):
+        self.start = float(start)
+        self.interval = float(interval)
+        self.size = int(size)
+
+    @property
+    def shape(self):
+        return (self.size,)
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return "TimeAxis(start=%g, interval=%g, size=%d)" % (
+            self.start,
+            self.interval,
+            self.size,
+        )
+
+    def __array__(self, dtype=None, copy=None):
+        x = np.arange(self.size, dtype=np.float64) * self.interval + self.start
+        return x if dtype is None else x.astype(dtype, copy=False)
+
+    def __iter__(self):
+        return (self.start + i * self.interval for i in range(self.size))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.size)
+            return TimeAxis(
+                self.start + start * self.interval,
+                step * self.interval,
+                len(range(start, stop, step)),
+            )
+        if isinstance(index, numbers.Integral):
+            if index < 0:
+                index += self.size
+            if not 0 <= index < self.size:
+                raise IndexError("TimeAxis index out of range")
+            return self.start + index * self.interval
+        return np.asarray(self)[index]
+
+    def __add__(self, other):
+        if isinstance(other, numbers.Real):
+            return TimeAxis(self.start + other, self.interval, self.size)
+        return np.asarray(self) + other
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, numbers.Real):
+            return TimeAxis(self.start - other, self.interval, self.size)
+        return np.asarray(self) - other
+
+    def __rsub__(self, other):
+        return other - np.asarray(self)
+
+    def __mul__(self, other):
+        if isinstance(other, numbers.Real):
+            return TimeAxis(self.start * other, self.interval * other, self.size)
+        return np.asarray(self) * other
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, numbers.Real):
+            return TimeAxis(self.start / other, self.interval / other, self.size)
+        return np.asarray(self) / other
+
+
+class LeCroy620Zi(VisaInstrument):
     """Python class for LeCroy Oscilloscope, written by Adam McCaughan.  Most of these commands
     originate from the Automation Command Reference Manual for WaveRunner Oscilloscopes"""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name, write_termination="\n")
+        super().__init__(visa_name, write_termination="\n")
         self.pyvisa.timeout = 10000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         self.write("COMM_HEADER OFF")  # Get rid of the leading 'VBS ' crap
         self.write(
             "COMM_FORMAT DEF9,WORD,BIN"
         )  # Set output to 16 bits of information (a 'word') per datapoint
-
-    def read(self):
-        return self.pyvisa.read()
-
-    def read_raw(self):
-        return self.pyvisa.read_raw()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
+        self.pyvisa.chunk_size = 1024 * 1024  # Long records in few large reads
+        self.wavedesc = {}  # Cached WAVEDESC per channel, see get_wf_raw
 
     def round_up_lockstep(self, x):
         """Some functions on the LeCroy require numbers to be rounded up to nearest 1,2 or 5
@@ -64,6 +132,7 @@ class LeCroy620Zi(object):
         self.write(
             "COMM_FORMAT DEF9,WORD,BIN"
         )  # Set output to 16 bits of information (a word) per sample
+        self.clear_wavedesc()
         time.sleep(1)
 
     def clear_sweeps(self):
@@ -106,24 +175,30 @@ class LeCroy620Zi(object):
 
     def set_vertical_scale(self, channel="C1", volts_per_div=1, volt_offset=0):
         # Lecroy only allows digits 1, 2, and 5.  e.g. 5e-6 is acceptable, 4e-6 is not
+        self.clear_wavedesc()
         volts_per_div = self.round_up_lockstep(volts_per_div)
         self.vbs_write("app.Acquisition.%s.VerScale = %0.0e" % (channel, volts_per_div))
         self.vbs_write("app.Acquisition.%s.VerOffset = %0.0e" % (channel, volt_offset))
 
     def find_vertical_scale(self, channel="C1"):
+        self.clear_wavedesc()
         self.vbs_write("app.Acquisition.%s.FindScale" % channel)
 
     def set_horizontal_scale(self, time_per_div=1e-6, time_offset=0):
+        self.clear_wavedesc()
         self.vbs_write("app.Acquisition.Horizontal.HorScale = %0.6e" % time_per_div)
         self.vbs_write("app.Acquisition.Horizontal.HorOffset = %0.6e" % time_offset)
 
     def set_max_samples(self, num_samples=1e6):
+        self.clear_wavedesc()
         self.vbs_write("app.Acquisition.Horizontal.MaxSamples = %0.3e" % num_samples)
 
     def set_sample_rate(self, num_samples=1e9):
+        self.clear_wavedesc()
         self.vbs_write("app.Acquisition.Horizontal.SampleRate = %0.3e" % num_samples)
 
     def set_num_points(self, num_samples=1e3):
+        self.clear_wavedesc()
         self.vbs_write("app.Acquisition.Horizontal.NumPoints = %0.3e" % num_samples)
 
     def set_trigger(self, source="C1", volt_level=0.1, slope="positive"):
@@ -140,14 +215,17 @@ class LeCroy620Zi(object):
 
     def set_sample_mode(self, sample_mode="RealTime"):
         """Set Sample mode to either RealTime, Sequence, WStream"""
+        self.clear_wavedesc()
         return self.vbs_write(
             'app.Acquisition.Horizontal.SampleMode = "%s"' % sample_mode
         )
 
     def set_sequence_mode(self):
+        self.clear_wavedesc()
         return self.vbs_write('app.Acquisition.Horizontal.SampleMode = "Sequence"')
 
     def set_segments(self, NumSegments=500):
+        self.clear_wavedesc()
         return self.vbs_write(
             "app.Acquisition.Horizontal.NumSegments = %d" % NumSegments
         )
@@ -200,6 +278,7 @@ class LeCroy620Zi(object):
     ):
         """Possible operator values listed in a table on page 1-151 of the automation manual.
         Sample values include: Average / Trend / Histogram / FFT / Integral / etc"""
+        self.clear_wavedesc()
         self.vbs_write('app.Math.%s.Operator1 = "%s"' % (math_channel, operator))
         if source1 is not None:
             self.vbs_write('app.Math.%s.Source1 = "%s"' % (math_channel, source1))
@@ -253,39 +332,258 @@ class LeCroy620Zi(object):
     def get_trigger_mode(self):
         return self.vbs_ask("app.Acquisition.TriggerMode")
 
-    def get_wf_data(self, channel="C1"):  # e.g. channel = C1 or F3 etc
-        ADDR_VGAIN = 156
-        ADDR_VOFFSET = 160
-        ADDR_HINTERVAL = 176
-        ADDR_HOFFSET = 180
-        self.write(channel + ":WAVEFORM? DAT1")  # Contains waveform data
-        databytes = self.read_raw()
-        databytes = databytes[16:]  # Strips leading header data
-        if len(databytes) == 0:
-            return np.array([]), np.array([])
-        if len(databytes) % 2 == 1:  # Sometimes accidentally returns an extra byte
-            databytes = databytes[:-1]
-        data = np.frombuffer(databytes, np.int16)
-        # DESC contains info about vertical/horiz scaling, etc,
-        # see P280, Appendix II Remote Control Manual for byte addresses
-        self.write(channel + ":WAVEFORM? DESC")  # Contains waveform data
-        desc = self.read_raw()
-        if desc == b'WARNING : CURRENT REMOTE CONTROL INTERFACE IS TCPIP\n':
-            raise Exception(f"Got VISA ERROR {desc}, change scope to LXI mode")
-        desc = desc[16:]
-        vgain = float(np.frombuffer(desc[ADDR_VGAIN : ADDR_VGAIN + 4], np.float32).item())
-        voffset = float(
-            np.frombuffer(desc[ADDR_VOFFSET : ADDR_VOFFSET + 4], np.float32).item()
-        )
-        hinterval = float(
-            np.frombuffer(desc[ADDR_HINTERVAL : ADDR_HINTERVAL + 4], np.float32).item()
-        )
-        hoffset = float(np.frombuffer(desc[ADDR_HOFFSET : ADDR_HOFFSET + 8], np.double).item())
-        num_samples = len(data)
-        x = np.array(range(num_samples)) * hinterval + hoffset
-        # yscale = float(2**16)/(vf_stop - vf_start)  # Scale the data, it's output as ints from -2^16 to 2^16
-        y = data * vgain - voffset
-        return x, y
+    def arm(self):
+        """Clears the INR register and arms a single acquisition"""
+        self.query("INR?")
+        self.set_trigger_mode(trigger_mode="Single")
+
+    def wait_for_acquisition(self, timeout=10, interval=1e-4, max_interval=0.05):
+        """Waits for the acquisition started by arm() by polling the INR
+        register (bit 0, new signal acquired).  The poll interval starts at
+        interval and doubles up to max_interval, so fast triggers return
+        quickly without flooding the bus while waiting on slow ones.
+        Returns False if nothing was acquired within timeout seconds
+        (timeout=None waits forever)"""
+        start = time.time()
+        while not int(self.query("INR?")) & 1:
+            if timeout is not None and time.time() - start > timeout:
+                return False
+            sleep(interval)
+            interval = min(2 * interval, max_interval)
+        return True
+
+    def wait_for_trigger(self, timeout=None):
+        """wait_for_acquisition that raises TimeoutError if nothing was
+        acquired within timeout seconds, by default the VISA timeout"""
+        if timeout is None:
+            timeout = self.pyvisa.timeout / 1e3
+        if not self.wait_for_acquisition(timeout=timeout):
+            raise TimeoutError("No trigger within %0.1f s" % timeout)
+
+    def acquire(
+        self,
+        channels=["C1"],
+        num_acquisitions=1,
+        before_arm=None,
+        timeout=10,
+        pipeline=True,
+        max_retries=10,
+    ):
+        """Generator over num_acquisitions single (or sequence) acquisitions
+        of all channels from the same trigger, yielding (n, traces) with
+        traces[channel] = (x, data, desc) as returned by get_wf_raw.
+
+        With pipeline=True and up to four channels every finished acquisition
+        is copied into the scope memories M1-M4 (STORE), the scope is re-armed
+        and the copies are transferred while the next acquisition runs, so
+        the caller processes trace n while n+1 is being taken.  before_arm is
+        called before every arm, e.g. to read a meter.  Timeouts and failed
+        transfers re-arm the scope, after max_retries of them in a row
+        (None never gives up) TimeoutError is raised.  Throughput is printed
+        at the end and kept in self.acquisition_stats"""
+        memories = ["M1", "M2", "M3", "M4"]
+        pipeline = pipeline and len(channels) <= len(memories)
+        sources = memories[: len(channels)] if pipeline else channels
+        stats = {
+            "acquisitions": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "bytes": 0,
+            "wait_time": 0.0,
+            "transfer_time": 0.0,
+        }
+        start = time.time()
+        failures = 0  # timeouts and failed transfers in a row
+
+        def arm():
+            if before_arm is not None:
+                before_arm()
+            self.arm()
+
+        def retry(message):
+            nonlocal failures
+            failures += 1
+            if max_retries is not None and failures > max_retries:
+                raise TimeoutError(
+                    "%s, giving up after %d retries" % (message, max_retries)
+                )
+            print("%s, re-arming" % message)
+            arm()
+
+        try:
+            arm()
+            while stats["acquisitions"] < num_acquisitions:
+                t = time.time()
+                acquired = self.wait_for_acquisition(timeout=timeout)
+                stats["wait_time"] += time.time() - t
+                if not acquired:
+                    stats["timeouts"] += 1
+                    retry("No trigger within %0.1f s" % timeout)
+                    continue
+                last = stats["acquisitions"] == num_acquisitions - 1
+                try:
+                    if pipeline:
+                        for c, m in zip(channels, sources):
+                            self.write("STORE %s,%s" % (c, m))
+                        self.query("*OPC?")
+                        if not last:
+                            arm()
+                    t = time.time()
+                    traces = {}
+                    for c, source in zip(channels, sources):
+                        traces[c] = self.get_wf_raw(channel=source)
+                        stats["bytes"] += traces[c][1].nbytes
+                    stats["transfer_time"] += time.time() - t
+                except Exception as e:  # ie: VISA timeout during the transfer
+                    stats["errors"] += 1
+                    retry("Transfer failed (%r)" % e)
+                    continue
+                failures = 0
+                if not pipeline and not last:
+                    arm()
+                stats["acquisitions"] += 1
+                yield stats["acquisitions"] - 1, traces
+        finally:
+            stats["elapsed"] = time.time() - start
+            stats["acquisitions_per_second"] = stats["acquisitions"] / max(
+                stats["elapsed"], 1e-9
+            )
+            stats["mbytes_per_second"] = (
+                stats["bytes"] / 1e6 / max(stats["transfer_time"], 1e-9)
+            )
+            self.acquisition_stats = stats
+            print(
+                "%d acquisitions in %0.2f s: %0.2f acquisitions/s, %0.1f MB/s "
+                "transfer, %0.2f s waiting for triggers"
+                % (
+                    stats["acquisitions"],
+                    stats["elapsed"],
+                    stats["acquisitions_per_second"],
+                    stats["mbytes_per_second"],
+                    stats["wait_time"],
+                )
+            )
+
+    def clear_wavedesc(self):
+        """Forgets the cached WAVEDESC blocks, called by every setter here
+        that changes the timebase or vertical scaling"""
+        self.wavedesc = {}
+
+    def read_block(self):
+        """Reads one IEEE 488.2 definite-length block (#9nnnnnnnnn...) and
+        returns its payload as a memoryview, so no bytes are copied"""
+        raw = self.read_raw()
+        if raw.startswith(b"WARNING : CURRENT REMOTE CONTROL INTERFACE IS TCPIP"):
+            raise Exception(f"Got VISA ERROR {raw}, change scope to LXI mode")
+        start = raw.find(b"#")
+        if start < 0:
+            return memoryview(b"")
+        num_digits = int(raw[start + 1 : start + 2])
+        length = int(raw[start + 2 : start + 2 + num_digits])
+        begin = start + 2 + num_digits
+        return memoryview(raw)[begin : begin + length]
+
+    def parse_wavedesc(self, block):
+        """Decodes the fields of the WAVEDESC template used here, see P280,
+        Appendix II Remote Control Manual for byte addresses"""
+        endian = "<" if block[34] == 1 else ">"  # COMM_ORDER, 1 = LOFIRST
+
+        def field(fmt, address):
+            return struct.unpack_from(endian + fmt, block, address)[0]
+
+        return {
+            "endian": endian,
+            "dtype": np.dtype(endian + ("i2" if field("h", 32) == 1 else "i1")),
+            "wave_descriptor": field("l", 36),
+            "user_text": field("l", 40),
+            "res_desc1": field("l", 44),
+            "trigtime_array": field("l", 48),
+            "ris_time_array": field("l", 52),
+            "res_array1": field("l", 56),
+            "wave_array_1": field("l", 60),
+            "subarray_count": field("l", 144),
+            "vgain": field("f", 156),
+            "voffset": field("f", 160),
+            "hinterval": field("f", 176),
+            "hoffset": field("d", 180),
+        }
+
+    def get_wf_raw(self, channel="C1", cached_desc=False):
+        """Reads the waveform of a channel as unscaled ADC codes without any
+        conversion.  Returns (x, data, desc) where x is a TimeAxis, data is
+        an int16 view of the transfer buffer and desc holds the scaling
+        (volts = data*desc["vgain"] - desc["voffset"]).  In sequence mode
+        desc["trigtime"] is the TRIGTIME array of the acquisition.
+
+        The descriptor and samples come back together in one WAVEFORM? ALL
+        transfer.  With cached_desc=True only DAT1 is read and the WAVEDESC
+        from the last call on this channel is reused; that is only valid
+        while the timebase/vertical settings are unchanged, which this class
+        tracks for its own setters but not for changes on the front panel"""
+        desc = self.wavedesc.get(channel) if cached_desc else None
+        if desc is None:
+            self.write(channel + ":WAVEFORM? ALL")
+            block = self.read_block()
+            if len(block) == 0:
+                return TimeAxis(0, 0, 0), np.array([], np.int16), {}
+            desc = self.parse_wavedesc(block)
+            self.wavedesc[channel] = desc
+            offset = desc["wave_descriptor"] + desc["user_text"] + desc["res_desc1"]
+            if desc["trigtime_array"] > 0:  # Sequence mode only
+                trigtime = np.frombuffer(
+                    block,
+                    desc["endian"] + "f8",
+                    count=desc["trigtime_array"] // 8,
+                    offset=offset,
+                )
+                desc = dict(desc, trigtime=trigtime.reshape(-1, 2))
+            offset += (
+                desc["trigtime_array"] + desc["ris_time_array"] + desc["res_array1"]
+            )
+            length = desc["wave_array_1"]
+        else:
+            self.write(channel + ":WAVEFORM? DAT1")
+            block = self.read_block()
+            offset = 0
+            length = len(block)
+        count = length // desc["dtype"].itemsize  # Drops a stray trailing byte
+        data = np.frombuffer(block, desc["dtype"], count=count, offset=offset)
+        x = TimeAxis(desc["hoffset"], desc["hinterval"], count)
+        return x, data, desc
+
+    def get_wf_data(self, channel="C1", cached_desc=False):  # e.g. channel = C1 or F3
+        """Returns (x, y) for a channel, with y scaled to volts as float32 and
+        x a TimeAxis (start + i*interval) that numpy, matplotlib and savemat
+        turn into an array when they need one.  See get_wf_raw for
+        cached_desc and for the unscaled int16 samples"""
+        x, data, desc = self.get_wf_raw(channel=channel, cached_desc=cached_desc)
+        if len(data) == 0:
+            return x, np.array([], np.float32)
+        return x, self.scale_wf_data(data, desc)
+
+    def scale_wf_data(self, data, desc, out=None):
+        """Converts raw samples from get_wf_raw to volts as float32, writing
+        into out if given"""
+        y = np.multiply(data, desc["vgain"], out=out, dtype=np.float32)
+        y -= desc["voffset"]
+        return y
+
+    def get_wf_segments(self, channel="C1"):
+        """Reads a sequence-mode acquisition of a channel in one transfer and
+        returns (x, y, trigtime).  y is a (segments, points) float32 array
+        reshaped from the single record, x the TimeAxis shared by every
+        segment and trigtime a (segments, 2) array holding the trigger time
+        of each segment relative to the first one and its trigger offset,
+        both in seconds.  get_wf_raw(channel)[1].reshape(segments, -1) gives
+        the same layout as an int16 view without any copy"""
+        x, data, desc = self.get_wf_raw(channel=channel)
+        if len(data) == 0:
+            return x, np.zeros((0, 0), np.float32), np.zeros((0, 2))
+        segments = max(desc["subarray_count"], 1)
+        points = len(data) // segments
+        y = self.scale_wf_data(data[: segments * points], desc)
+        trigtime = desc.get("trigtime", np.zeros((segments, 2)))
+        return x[:points], y.reshape(segments, points), trigtime
 
     def get_event_time(self, channel="C1"):
         vt_cy_time = self.vbs_ask(
@@ -313,16 +611,11 @@ class LeCroy620Zi(object):
         # print(formatted_timestamp)
         return timestamp
 
-    def get_single_trace(self, channel="C1", save_data=True):
+    def get_single_trace(self, channel="C1", save_data=True, timeout=None):
         """Sets scope to "single" trigger mode to acquire one trace, then waits until the trigger has happened
-        (indicated by the trigger mode changing to "Stopped").  Returns blank lists if no trigger occurs within 1 second"""
-        n = 0
-        x = np.array([])
-        y = np.array([])
-        self.set_trigger_mode(trigger_mode="Single")
-        while self.get_trigger_mode() == "Single" or n > 1e10:
-            time.sleep(1e-4)
-            n = n + 1
+        (indicated by the INR register, see wait_for_trigger for timeout)"""
+        self.arm()
+        self.wait_for_trigger(timeout)
         if save_data:
             x, y = self.get_wf_data(channel=channel)
             return x, y
@@ -361,6 +654,7 @@ class LeCroy620Zi(object):
     def set_math_vertical_scale(
         self, math_channel="F1", vertical_scale=10e-9, vertical_offset=0
     ):
+        self.clear_wavedesc()
         self.vbs_write(
             "app.Math.%s.Operator1Setup.VerScale = %s" % (math_channel, vertical_scale)
         )
@@ -420,9 +714,11 @@ class LeCroy620Zi(object):
         self.vbs_write("app.Math.%s.ClearSweeps" % math_channel)
 
     def histogram_find_center_width(self, math_channel="F1"):
+        self.clear_wavedesc()
         self.vbs_write("app.Math.%s.Operator1Setup.FindScale" % math_channel)
 
     def histogram_set_horiz_scale(self, math_channel="F1", horiz_scale=2e-6):
+        self.clear_wavedesc()
         self.vbs_write(
             "app.Math.%s.Operator1Setup.HorScale = %s" % (math_channel, horiz_scale)
         )
@@ -463,82 +759,56 @@ class LeCroy620Zi(object):
 
         return file_name
 
-    def get_single_trace_sequence(self, channel="C1", NumSegments=1000):
+    def get_single_trace_sequence(self, channel="C1", NumSegments=1000, timeout=None):
         """Sets scope to "single" trigger mode to acquire one trace, then waits until the trigger has happened
-        (indicated by the trigger mode changing to "Stopped")."""
+        (indicated by the INR register, see wait_for_trigger for timeout)."""
 
         self.set_sequence_mode()
         self.set_segments(NumSegments)
         self.clear_sweeps()
-        self.set_trigger_mode(trigger_mode="Single")
-        if self.get_trigger_mode() == "Single\n":
-            while self.get_trigger_mode() == "Single\n":
-                sleep(1e-4)
-        x, y = self.get_wf_data(channel=channel)
-        interval = abs(x[0] - x[1])
-        xlist = []
-        ylist = []
-        totdp = np.int64(np.size(x) / NumSegments)
-        for j in range(NumSegments):
-            xlist.append(x[0 + j * totdp : totdp + j * totdp] - totdp * interval * j)
-            ylist.append(y[0 + j * totdp : totdp + j * totdp])
-
-        data_dict = {channel + "x": xlist, channel + "y": ylist}
+        self.arm()
+        self.wait_for_trigger(timeout)
+        x, y, trigtime = self.get_wf_segments(channel=channel)
+
+        data_dict = {channel + "x": x, channel + "y": y, channel + "trigtime": trigtime}
         return data_dict
 
-    def get_multiple_trace_sequence(self, channels=["C1", "C2"], NumSegments=1000):
+    def get_multiple_trace_sequence(
+        self, channels=["C1", "C2"], NumSegments=1000, timeout=None
+    ):
         """
         If display mode (overlay, waterfall, adjacent) is not active turn off persistent trace
 
+        Returns {c+"x": shared time axis, c+"y": (segments, points) array,
+        c+"trigtime": (segments, 2) trigger times} for every channel c, see
+        get_wf_segments.  Raises TimeoutError if the sequence is not acquired
+        within timeout, see wait_for_trigger
         """
         full_dict = {}
         self.set_sequence_mode()
         self.set_segments(NumSegments)
         # self.clear_sweeps()
-        self.set_trigger_mode(trigger_mode="Single")
-        if self.get_trigger_mode() == "Single\n":
-            while self.get_trigger_mode() == "Single\n":
-                sleep(1e-4)
+        self.arm()
+        self.wait_for_trigger(timeout)
         for c in channels:
             print(c)
-            x, y = self.get_wf_data(channel=c)
-            interval = abs(x[0] - x[1])
-            xlist = []
-            ylist = []
-            totdp = np.int64(np.size(x) / NumSegments)
-
-            for j in range(NumSegments):
-                xlist.append(
-                    x[0 + j * totdp : totdp + j * totdp] - totdp * interval * j
-                )
-                ylist.append(y[0 + j * totdp : totdp + j * totdp])
-
-            data_dict = {c + "x": xlist, c + "y": ylist}
+            x, y, trigtime = self.get_wf_segments(channel=c)
+            data_dict = {c + "x": x, c + "y": y, c + "trigtime": trigtime}
             full_dict.update(data_dict)
 
         return full_dict
 
-    def my_get_single_trace_sequence(self, channel="C1", NumSegments=1000):
+    def my_get_single_trace_sequence(
+        self, channel="C1", NumSegments=1000, timeout=None
+    ):
         """Sets scope to "single" trigger mode to acquire one trace, then waits until the trigger has happened
-        (indicated by the trigger mode changing to "Stopped")."""
+        (indicated by the INR register, see wait_for_trigger for timeout)."""
         self.set_sequence_mode()
         self.set_segments(NumSegments)
-        self.set_trigger_mode(trigger_mode="Single")
-        if self.get_trigger_mode() == "Single\n":
-            while self.get_trigger_mode() == "Single\n":
-                # SRS.set_output(False)
-                sleep(1e-4)
-                # SRS.set_output(True)
-        x, y = self.get_wf_data(channel=channel)
-        interval = abs(x[0] - x[1])
-        xlist = []
-        ylist = []
-        totdp = np.int(np.size(x) / NumSegments)
-        for j in range(NumSegments):
-            xlist.append(x[0 + j * totdp : totdp + j * totdp] - totdp * interval * j)
-            ylist.append(y[0 + j * totdp : totdp + j * totdp])
-
-        return xlist, ylist
+        self.arm()
+        self.wait_for_trigger(timeout)
+        x, y, trigtime = self.get_wf_segments(channel=channel)
+        return np.broadcast_to(np.asarray(x), y.shape), y
 
     def save_traces_multiple_sequence(
         self,
@@ -550,95 +820,46 @@ class LeCroy620Zi(object):
         fname="myfile",
     ):
         """save multiple traces multiple times, threshold is set for each channel to eliminate false counts (set to )
-        0 if unused"""
-        num_ch = len(channels)
-        x1list = []
-        y1list = []
-        x2list = []
-        y2list = []
-        x3list = []
-        y3list = []
-        x4list = []
-        y4list = []
+        0 if unused.  All channels come from the same sequence acquisition,
+        which is pipelined with the transfer of the previous one (see acquire).
+        An acquisition that fails is skipped, the traces taken so far are
+        returned if acquire gives up"""
+        self.set_sequence_mode()
+        self.set_segments(NumSegments)
+        xaxes = {}
+        ylists = {c: [] for c in channels}
+        levels = list(threshold) + [0] * (len(channels) - len(threshold))
         q = 0  # number of not useless points
-        for i in range(num_traces):
-            print("Trace %d of %d" % (i, num_traces))
-            try:
-                if num_ch > 0:
-                    x, y = self.my_get_single_trace_sequence(channels[0], NumSegments)
-                    if max(abs(y[0])) > threshold[0]:
-                        x1list.append(x)
-                        y1list.append(y)
-                    else:
-                        q = q + 1
-                        print("Not useful")
-                if num_ch > 1:
-                    x, y = self.my_get_single_trace_sequence(channels[1], NumSegments)
-                    if max(abs(y[0])) > threshold[1]:
-                        x2list.append(x)
-                        y2list.append(y)
+        try:
+            for i, traces in self.acquire(
+                channels=channels, num_acquisitions=num_traces
+            ):
+                print("Trace %d of %d" % (i, num_traces))
+                try:
+                    ys = {
+                        c: self.scale_wf_data(*traces[c][1:]).reshape(NumSegments, -1)
+                        for c in channels
+                    }
+                except ValueError as e:  # ie: fewer segments than NumSegments
+                    print("error", e)
+                    continue
+                for c, level in zip(channels, levels):
+                    x, y = traces[c][0], ys[c]
+                    if max(abs(y[0])) > level:
+                        xaxes[c] = x[: y.shape[1]]
+                        ylists[c].append(y)
                     else:
                         q = q + 1
                         print("Not useful")
-                if num_ch > 2:
-                    x, y = self.my_get_single_trace_sequence(channels[2], NumSegments)
-                    if max(abs(y[0])) > threshold[2]:
-                        x3list.append(x)
-                        y3list.append(y)
-                    else:
-                        q = q + 1
-                        print("Not useful")
-                if num_ch > 3:
-                    x, y = self.my_get_single_trace_sequence(channels[3], NumSegments)
-                    if max(abs(y[0])) > threshold[3]:
-                        x4list.append(x)
-                        y4list.append(y)
-                    else:
-                        q = q + 1
-                        print("Not useful")
-                if i % 100 == 0:
-                    (print(i),)
-            except Exception:
-                print("error")
+        except TimeoutError as e:
+            print("error", e)
 
         data_dict = {}
-
-        if num_ch > 0:
-            x1list = np.reshape(
-                x1list, (len(x1list) * len(x1list[0]), len(x1list[0][0]))
-            )
-            y1list = np.reshape(
-                y1list, (len(y1list) * len(y1list[0]), len(y1list[0][0]))
-            )
-            data_dict[channels[0] + "x"] = x1list
-            data_dict[channels[0] + "y"] = y1list
-        if num_ch > 1:
-            x2list = np.reshape(
-                x2list, (len(x2list) * len(x2list[0]), len(x2list[0][0]))
-            )
-            y2list = np.reshape(
-                y2list, (len(y2list) * len(y2list[0]), len(y2list[0][0]))
-            )
-            data_dict[channels[1] + "x"] = x2list
-            data_dict[channels[1] + "y"] = y2list
-        if num_ch > 2:
-            x3list = np.reshape(
-                x3list, (len(x3list) * len(x3list[0]), len(x3list[0][0]))
-            )
-            y3list = np.reshape(
-                y3list, (len(y3list) * len(y3list[0]), len(y3list[0][0]))
-            )
-            data_dict[channels[2] + "x"] = x3list
-            data_dict[channels[2] + "y"] = y3list
-        if num_ch > 3:
-            x4list = np.reshape(
-                x4list, (len(x4list) * len(x4list[0]), len(x4list[0][0]))
-            )
-            y4list = np.reshape(
-                y4list, (len(y4list) * len(y4list[0]), len(y4list[0][0]))
-            )
-            data_dict[channels[3] + "x"] = x4list
-            data_dict[channels[3] + "y"] = y4list
+        for c in channels:
+            if len(ylists[c]) > 0:
+                y = np.concatenate(ylists[c])
+                data_dict[c + "x"] = np.broadcast_to(np.asarray(xaxes[c]), y.shape)
+                data_dict[c + "y"] = y
 
         """below saves the data and a screen shot. it has been removed such that 
         saving is consistent with qnnpy"""
@@ -660,6 +881,7 @@ class LeCroy620Zi(object):
         return data_dict
 
     def recall_setup(self, setup=1):
+        self.clear_wavedesc()
         self.vbs_write(f"app.SaveRecall.Setup.RecallInternal{setup}")
 
 
@@ -0,0 +1,105 @@
+import time
+
+import numpy as np
+
+
+class ListSweep(object):
+    """Hardware list sweeps for sourcemeters.  The whole source list is
+    loaded into the instrument and stepped by its own trigger model, so a
+    sweep costs one transfer instead of a set/sleep/read round-trip per point.
+
+    A driver using this sets list_sweep_max_points (largest list or buffer
+    the instrument accepts in one go) and implements:
+        list_sweep_load(values, delay)  load values and arm the buffer
+        list_sweep_start()              start stepping through the list
+        list_sweep_count()              number of readings in the buffer
+        list_sweep_fetch(start, stop)   (source, sense) of readings start..stop-1
+    and optionally list_sweep_running() so sweeps the instrument aborts
+    early (e.g. on compliance) end instead of timing out, and
+    list_sweep_finish() to put the source back into fixed mode.
+
+    Drivers that can only read back the whole buffer set
+    list_sweep_partial_fetch = False, their readings are then fetched once
+    per chunk, when the chunk is complete (or the instrument stopped it).
+    """
+
+    list_sweep_max_points = 2500
+    list_sweep_command_points = 100  # Values per SOUR:LIST command
+    list_sweep_partial_fetch = True  # list_sweep_fetch can read a range
+
+    def list_sweep_values(self, command, values):
+        """Writes values with command (e.g. SOUR:LIST:CURR), appending in
+        blocks of list_sweep_command_points to stay within the input buffer"""
+        n = self.list_sweep_command_points
+        for i in range(0, len(values), n):
+            block = ",".join("%0.6e" % v for v in values[i : i + n])
+            self.write("%s%s %s" % (command, ":APP" if i > 0 else "", block))
+
+    def list_sweep_running(self):
+        return True
+
+    def list_sweep_finish(self):
+        pass
+
+    def list_sweep(
+        self, values, delay=0, callback=None, poll_interval=0.1, timeout=10, **kwargs
+    ):
+        """Sources every point of values and returns (source, sense) arrays.
+
+        Lists longer than list_sweep_max_points are run as consecutive
+        chunks.  Readings are read back while the sweep runs and passed to
+        callback(source, sense) as they arrive, e.g. to plot live.  Raises
+        TimeoutError if no new reading arrives within timeout seconds on
+        top of the source delay.  If the instrument stops a chunk early only
+        the points taken so far are returned.  kwargs go to list_sweep_load"""
+        values = np.asarray(values, dtype=np.float64)
+        source = np.empty(len(values))
+        sense = np.empty(len(values))
+        offset = fetched = 0
+
+        def take(count):
+            # reads readings fetched..count-1 of the current chunk
+            s, m = self.list_sweep_fetch(fetched, count)
+            source[offset + fetched : offset + count] = s
+            sense[offset + fetched : offset + count] = m
+            if callback is not None:
+                callback(s, m)
+            return count
+
+        try:
+            for offset in range(0, len(values), self.list_sweep_max_points):
+                chunk = values[offset : offset + self.list_sweep_max_points]
+                self.list_sweep_load(chunk, delay, **kwargs)
+                self.list_sweep_start()
+                fetched = 0
+                counted = 0
+                last_progress = time.time()
+                while fetched < len(chunk):
+                    count = min(self.list_sweep_count(), len(chunk))
+                    if count > counted:
+                        counted = count
+                        last_progress = time.time()
+                    if count > fetched and (
+                        self.list_sweep_partial_fetch or count == len(chunk)
+                    ):
+                        fetched = take(count)
+                    elif time.time() - last_progress > timeout + delay:
+                        raise TimeoutError(
+                            "List sweep stalled at %d of %d points"
+                            % (offset + count, len(values))
+                        )
+                    elif (
+                        time.time() - last_progress > delay + 1
+                        and not self.list_sweep_running()
+                    ):
+                        # Aborted by the instrument, keep what it took
+                        count = min(self.list_sweep_count(), len(chunk))
+                        if count > fetched:
+                            fetched = take(count)
+                        end = offset + fetched
+                        return source[:end], sense[:end]
+                    else:
+                        time.sleep(poll_interval)
+            return source, sense
+        finally:
+            self.list_sweep_finish()
@@ -1,26 +1,16 @@
 import time
 
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class Pollux(object):
+class Pollux(VisaInstrument):
     """Python class for Pollux motor, by Di Zhu 2016"""
 
     def __init__(self, visa_name, baud_rate=19200, axis=1):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name, baud_rate=baud_rate)
+        super().__init__(visa_name, baud_rate=baud_rate)
         self.pyvisa.timeout = 5000  # set response time in milliseconds
         self.axis = str(axis)
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def position(self):
         self.query(
             self.axis + " npos"
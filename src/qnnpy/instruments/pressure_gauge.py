@@ -0,0 +1,43 @@
+import re
+
+from pyvisa import constants
+
+from qnnpy.instruments.visa_transport import VisaInstrument
+
+# "0, 1.2340E-03": status (0 is a valid reading) and pressure
+reading_pattern = re.compile(r"^\s*(\d)\s*,\s*([-+0-9.Ee]+)")
+
+
+class PressureGauge(VisaInstrument):
+    """Vacuum gauge controller on a serial port (ASRL3::INSTR is COM3) that
+    sends one "status, pressure" line per interval once continuous output is
+    switched on with COM,1, as the gauge of the free space cryostat."""
+
+    def __init__(self, visa_name, baud_rate=9600):
+        super().__init__(
+            visa_name,
+            baud_rate=baud_rate,
+            read_termination="\r\n",
+            write_termination="\r\n",
+        )
+        self.pyvisa.timeout = 3000  # Set response timeout (in milliseconds)
+        self.continuous_output()
+
+    def continuous_output(self):
+        self.write("COM,1")
+
+    def reconnect(self):
+        super().reconnect()
+        self.continuous_output()
+
+    def read_pressure(self, lines=3):
+        """Next valid pressure reading (mbar). Lines sent before the call are
+        discarded, raises ValueError if none of the next lines is valid"""
+        with self.lock:
+            self.pyvisa.flush(constants.BufferOperation.discard_read_buffer)
+            for _ in range(lines):
+                line = self.read()
+                match = reading_pattern.match(line)
+                if match and match.group(1) == "0":
+                    return float(match.group(2))
+        raise ValueError(f"no pressure reading: {line!r}")
@@ -5,10 +5,10 @@ Created on Thu Feb 10 15:02:29 2022
 @author: QNN_LabUser
 """
 
-import visa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class RedPitaya(object):
+class RedPitaya(VisaInstrument):
     """
 
     Python Class for RedPitaya. Created by Owen Medeiros 2022.
@@ -18,8 +18,7 @@ class RedPitaya(object):
     """
 
     def __init__(self, visa_name):
-        rm = visa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name, read_termination="\r\n")
+        super().__init__(visa_name, read_termination="\r\n")
         self.pyvisa.timeout = 10000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
@@ -28,15 +27,6 @@ class RedPitaya(object):
         text = text.replace("ERR!", "")
         return text
 
-    def read_raw(self):
-        return self.pyvisa.read_raw()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def get_buffer_size(self):
         return int(self.query("ACQ:BUF:SIZE?"))
 
@@ -0,0 +1,131 @@
+"""Instrument registry: which driver class a yaml entry like
+
+    Meter:
+        name: Keithley2700
+        port: GPIB0::5
+
+stands for.  Drivers are listed as "module:Class" strings and only
+imported when an instrument of that name is connected.  Other packages add
+drivers either with the register() decorator
+
+    @register("Meter", "MyMeter")
+    class MyMeter(VisaInstrument): ...
+
+or with an entry point in the "qnnpy.instruments" group named Kind.Name,
+e.g. in their pyproject.toml
+
+    [project.entry-points."qnnpy.instruments"]
+    "Meter.MyMeter" = "mypackage.mymeter:MyMeter"
+"""
+
+import importlib
+import threading
+
+entry_point_group = "qnnpy.instruments"
+
+# (kind, name) -> driver class, "module:Class", or None for names that are
+# handled without a driver (ICE and DEWAR temperatures)
+drivers = {}
+registry_lock = threading.Lock()
+entry_points_loaded = False
+
+
+def register(kind, name, driver=None):
+    """Registers driver for name entries of kind (Meter, Source, ...).
+    Without driver it returns a class decorator"""
+    if driver is None:
+
+        def decorator(cls):
+            register(kind, name, cls)
+            return cls
+
+        return decorator
+    with registry_lock:
+        drivers[(kind, name)] = driver
+    return driver
+
+
+def load_entry_points():
+    global entry_points_loaded
+    if entry_points_loaded:
+        return
+    from importlib.metadata import entry_points
+
+    found = entry_points()
+    if hasattr(found, "select"):
+        found = found.select(group=entry_point_group)
+    else:  # python < 3.10
+        found = found.get(entry_point_group, [])
+    with registry_lock:
+        for entry_point in found:
+            kind, _, name = entry_point.name.partition(".")
+            drivers.setdefault((kind, name), entry_point.value)
+        entry_points_loaded = True
+
+
+def is_registered(kind, name):
+    if (kind, name) not in drivers:
+        load_entry_points()
+    return (kind, name) in drivers
+
+
+def names(kind):
+    """Instrument names that can be used for kind"""
+    load_entry_points()
+    return sorted(name for k, name in drivers if k == kind)
+
+
+def check(kind, name):
+    """Raises NameError if name is not a known instrument of kind"""
+    if not is_registered(kind, name):
+        raise NameError(
+            f'Invalid {kind}. {kind} name: "{name}" is not configured, '
+            f"known names are {', '.join(names(kind))}"
+        )
+
+
+def driver_class(kind, name):
+    """Imports and returns the driver class of a kind/name entry, None for
+    names without a driver.  Raises NameError for unknown names"""
+    check(kind, name)
+    driver = drivers[(kind, name)]
+    if isinstance(driver, str):
+        module, _, attribute = driver.partition(":")
+        driver = getattr(importlib.import_module(module), attribute)
+        with registry_lock:
+            drivers[(kind, name)] = driver
+    return driver
+
+
+builtin_drivers = [
+    ("Attenuator", "JDSHA9", "qnnpy.instruments.jds_ha9:JDSHA9"),
+    ("Attenuator", "N7752A", "qnnpy.instruments.keysight_n7752a:N7752A"),
+    ("Counter", "Agilent53131a", "qnnpy.instruments.agilent_53131a:Agilent53131a"),
+    ("Counter", "Keysight53230a", "qnnpy.instruments.keysight_53230a:Keysight53230a"),
+    ("Scope", "LeCroy620Zi", "qnnpy.instruments.lecroy_620zi:LeCroy620Zi"),
+    ("Scope", "KeysightDSOX", "qnnpy.instruments.keysight_dsox:KeysightDSOX"),
+    ("Meter", "Keithley2700", "qnnpy.instruments.keithley_2700:Keithley2700"),
+    ("Meter", "Keithley2400", "qnnpy.instruments.keithley_2400:Keithley2400"),
+    ("Meter", "Keithley2001", "qnnpy.instruments.keithley_2001:Keithley2001"),
+    ("Source", "SIM928", "qnnpy.instruments.srs_sim928:SIM928"),
+    ("Source", "YokogawaGS200", "qnnpy.instruments.yokogawa_gs200:YokogawaGS200"),
+    ("Source", "Keithley2400", "qnnpy.instruments.keithley_2400:Keithley2400"),
+    (
+        "Sourcemeter",
+        "KeysightB2912a",
+        "qnnpy.instruments.keysight_b2912a:KeysightB2912a",
+    ),
+    ("Sourcemeter", "Keithley2400", "qnnpy.instruments.keithley_2400:Keithley2400"),
+    ("Sourcemeter", "Keithley2450", "qnnpy.instruments.keithley_2450:Keithley2450"),
+    ("AWG", "Agilent33250a", "qnnpy.instruments.agilent_33250a:Agilent33250a"),
+    ("AWG", "Agilent33600a", "qnnpy.instruments.agilent_33600a:Agilent33600a"),
+    ("VNA", "KeysightN5224a", "qnnpy.instruments.keysight_n5224a:KeysightN5224a"),
+    ("PNA", "KeysightN5224a", "qnnpy.instruments.keysight_n5224a:KeysightN5224a"),
+    ("Temperature", "Lakeshore336", "qnnpy.instruments.lakeshore336:Lakeshore336"),
+    ("Temperature", "Cryocon34", "qnnpy.instruments.cryocon34:Cryocon34"),
+    ("Temperature", "Cryocon350", "qnnpy.instruments.cryocon350:Cryocon350"),
+    ("Temperature", "ICE", None),
+    ("Pressure", "PressureGauge", "qnnpy.instruments.pressure_gauge:PressureGauge"),
+    ("Temperature", "DEWAR", None),
+]
+drivers.update(((kind, name), driver) for kind, name, driver in builtin_drivers)
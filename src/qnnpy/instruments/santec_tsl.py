@@ -2,7 +2,7 @@
 # Copyright (c) 2019 Prashanta Kharel, HyperLight Corporation
 import time
 
-import pyvisa
+from qnnpy.instruments.visa_transport import open_resource
 
 
 class SantecTSLBase:
@@ -82,10 +82,9 @@ class SantecTSLBase:
 class SantecTSL(SantecTSLBase):
     def __init__(self, rsc_name=None):
         self.rsc_name = rsc_name
-        rm = pyvisa.ResourceManager()
         if rsc_name is not None:
             self.rsc_name = rsc_name
-        self.rsc = rm.open_resource(self.rsc_name)
+        self.rsc = open_resource(self.rsc_name)
         print("IDN: " + self.rsc.query("*IDN?"))
         # wavelength limits
         self.wav_min = None
@@ -1,21 +1,11 @@
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class SPD3303(object):
+class SPD3303(VisaInstrument):
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # set response timeout (in milliseconds)
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        return self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     #### implement functions specific to this machine ####
 
     # turn on channel
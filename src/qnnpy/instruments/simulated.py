@@ -0,0 +1,502 @@
+"""Simulated instruments for running measurements without hardware.
+
+Any driver opened on a port of the form "SIM::<model>" talks to a simulated
+resource instead of a real instrument, e.g. in the .yaml file
+
+    Source:
+      name: SIM928
+      port: SIM::SIM928
+      port_alt: 1
+    Meter:
+      name: Keithley2700
+      port: SIM::Keithley2700
+    Simulation:        # optional, keyword arguments of SimulatedSNSPD
+      isw: 12.0e-6
+      latency: 2.0e-3
+
+The drivers themselves run unchanged, only the bytes on the bus are
+synthetic, so measurement classes can be run end to end and their own
+overhead measured (see qnnpy.functions.benchmark).  Simulated models:
+SIM928, YokogawaGS200 (sources), Keithley2700 (meter), Keysight53230a
+(counter), LeCroy620Zi (scope), KeysightN5224a (VNA), Lakeshore336
+(temperature) and JDSHA9 (attenuator).
+
+Every simulated instrument in a process drives the same SimulatedSNSPD: the
+source biases it, the meter reads its voltage, the counter counts its dark
+and photon counts and the scope records its pulses.
+"""
+
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+import pyvisa
+
+simulation = None  # SimulatedSNSPD shared by all simulated resources
+
+
+class SimulatedSNSPD(object):
+    """Synthetic SNSPD biased through a series resistor.
+
+    The wire switches to its normal state (r_normal) above isw and only
+    returns to the superconducting state below ir.  While superconducting it
+    has a dark count rate growing exponentially towards isw and a detection
+    efficiency that is a sigmoid around efficiency_current.  Every
+    transaction on a simulated resource costs latency plus bytes/bandwidth
+    seconds, scaled by time_scale (0 runs as fast as possible); the unscaled
+    instrument time is kept in stats."""
+
+    def __init__(
+        self,
+        isw=10e-6,
+        ir=2e-6,
+        r_normal=1e3,
+        series_resistance=10e3,
+        dark_count_rate=1e3,
+        dark_current_scale=0.3e-6,
+        photon_rate=1e7,
+        efficiency_current=6e-6,
+        efficiency_width=0.5e-6,
+        pulse_amplitude=0.2,
+        pulse_decay=20e-9,
+        noise=2e-3,
+        trace_points=1000,
+        sample_interval=1e-10,
+        temperature=2.5,
+        resonance=5e9,
+        q_internal=5e4,
+        q_coupling=2e4,
+        latency=1e-3,
+        bandwidth=100e6,
+        time_scale=1.0,
+        seed=None,
+    ):
+        self.isw = isw
+        self.ir = ir
+        self.r_normal = r_normal
+        self.series_resistance = series_resistance
+        self.dark_count_rate = dark_count_rate
+        self.dark_current_scale = dark_current_scale
+        self.photon_rate = photon_rate
+        self.efficiency_current = efficiency_current
+        self.efficiency_width = efficiency_width
+        self.pulse_amplitude = pulse_amplitude
+        self.pulse_decay = pulse_decay
+        self.noise = noise
+        self.trace_points = trace_points
+        self.sample_interval = sample_interval
+        self.temperature = temperature
+        self.resonance = resonance
+        self.q_internal = q_internal
+        self.q_coupling = q_coupling
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.time_scale = time_scale
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.RLock()
+        self.voltage = 0.0
+        self.output = False
+        self.latched = False
+        self.attenuation_db = 0.0
+        self.beam_block = True
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"transactions": 0, "bytes": 0, "instrument_time": 0.0}
+
+    def wait(self, seconds):
+        """Time spent by the instrument, e.g. a counter gate"""
+        with self.lock:
+            self.stats["instrument_time"] += seconds
+        if seconds * self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def transaction(self, nbytes):
+        with self.lock:
+            self.stats["transactions"] += 1
+            self.stats["bytes"] += nbytes
+        self.wait(self.latency + nbytes / self.bandwidth)
+
+    def set_source(self, voltage=None, output=None):
+        with self.lock:
+            if voltage is not None:
+                self.voltage = voltage
+            if output is not None:
+                self.output = output
+            self.update()
+
+    def update(self):
+        """Switching and retrapping for the present source setting"""
+        if not self.output:
+            self.latched = False
+        elif not self.latched and abs(self.voltage) > self.isw * self.series_resistance:
+            self.latched = True
+        elif self.latched and abs(self.bias_current()) < self.ir:
+            self.latched = False
+
+    def bias_current(self):
+        if not self.output:
+            return 0.0
+        if self.latched:
+            return self.voltage / (self.series_resistance + self.r_normal)
+        return self.voltage / self.series_resistance
+
+    def device_voltage(self):
+        """Voltage across the wire as read by a meter, with noise"""
+        with self.lock:
+            v = self.bias_current() * self.r_normal if self.latched else 0.0
+            return v + self.rng.normal(0, 1e-6)
+
+    def count_rate(self):
+        """Dark plus photon count rate [Hz], zero while latched"""
+        with self.lock:
+            if self.latched or not self.output:
+                return 0.0
+            i = abs(self.bias_current())
+            dark = self.dark_count_rate * np.exp(
+                min((i - self.isw) / self.dark_current_scale, 0)
+            )
+            efficiency = 1 / (
+                1 + np.exp(-(i - self.efficiency_current) / self.efficiency_width)
+            )
+            light = 0.0 if self.beam_block else 10 ** (-self.attenuation_db / 10)
+            return dark + self.photon_rate * light * efficiency
+
+    def counts(self, gate_time, num_gates=1):
+        return self.rng.poisson(self.count_rate() * gate_time, num_gates)
+
+    def pulses(self, segments, points, interval):
+        """Pulse records of segments triggers: (x0, y (segments, points) in V,
+        trigtime (segments, 2))"""
+        x0 = -points * interval / 5
+        t = x0 + np.arange(points) * interval
+        shape = np.where(t >= 0, np.exp(-np.clip(t, 0, None) / self.pulse_decay), 0)
+        amplitude = self.pulse_amplitude * (
+            1 + 0.05 * self.rng.standard_normal((segments, 1))
+        )
+        y = amplitude * shape + self.rng.normal(0, self.noise, (segments, points))
+        rate = max(self.count_rate(), 1.0)  # Stray triggers without counts
+        trigtime = np.zeros((segments, 2))
+        trigtime[1:, 0] = np.cumsum(self.rng.exponential(1 / rate, segments - 1))
+        trigtime[:, 1] = x0
+        return x0, y, trigtime
+
+    def s21(self, f):
+        """Notch-type resonator response"""
+        q_loaded = 1 / (1 / self.q_internal + 1 / self.q_coupling)
+        return 1 - (q_loaded / self.q_coupling) / (
+            1 + 2j * q_loaded * (f - self.resonance) / self.resonance
+        )
+
+
+def configure(**parameters):
+    """Replaces the shared SimulatedSNSPD, see its arguments"""
+    global simulation
+    simulation = SimulatedSNSPD(**parameters)
+    return simulation
+
+
+def device():
+    """The shared SimulatedSNSPD, created with defaults on first use"""
+    if simulation is None:
+        configure()
+    return simulation
+
+
+class SimulatedResource(object):
+    """Stand-in for a pyvisa message based resource.  Commands written are
+    passed to handle(), which returns the reply of a query (str or bytes) or
+    None; replies are queued and returned by read()/read_raw() like the
+    output buffer of a real instrument.  Unknown queries answer "0"."""
+
+    def __init__(self, resource_name, **kwargs):
+        self.resource_name = resource_name
+        self.device = device()
+        self.timeout = 2000
+        self.chunk_size = 20 * 1024
+        self.read_termination = kwargs.get("read_termination")
+        self.write_termination = kwargs.get("write_termination", "\r\n")
+        self.replies = []
+
+    def write(self, command):
+        self.device.transaction(len(command))
+        reply = self.handle(command.strip())
+        if reply is None and "?" in command:
+            reply = "0"
+        if reply is not None:
+            self.replies.append(reply)
+        return len(command)
+
+    def read_raw(self, size=None):
+        if not self.replies:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+        reply = self.replies.pop(0)
+        if isinstance(reply, str):
+            reply = (reply + "\n").encode()
+        self.device.transaction(len(reply))
+        return reply
+
+    def read(self):
+        text = self.read_raw().decode()
+        if self.read_termination:
+            text = text.rstrip("\n").rstrip(self.read_termination)
+        return text
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def clear(self):
+        self.replies = []
+
+    def close(self):
+        pass
+
+    def handle(self, command):
+        return None
+
+
+def number(text):
+    return float(re.search(r"[-+]?[\d.]+(?:[eE][-+]?\d+)?", text).group())
+
+
+class SimulatedSIM928(SimulatedResource):
+    def handle(self, command):
+        m = re.match(r'SNDT \d+,"(.*)"', command)
+        message = m.group(1) if m else command
+        if message.startswith("VOLT"):
+            self.device.set_source(voltage=number(message))
+        elif message == "OPON":
+            self.device.set_source(output=True)
+        elif message in ("OPOF", "*RST"):
+            self.device.set_source(voltage=0.0, output=False)
+
+
+class SimulatedYokogawaGS200(SimulatedResource):
+    def handle(self, command):
+        if command.startswith(":SOUR:LEV"):
+            self.device.set_source(voltage=number(command))
+        elif command.startswith(":OUTP"):
+            self.device.set_source(output=command.endswith("ON"))
+        elif command == "*RST":
+            self.device.set_source(voltage=0.0, output=False)
+
+
+class SimulatedKeithley2700(SimulatedResource):
+    def handle(self, command):
+        if command == ":READ?":
+            self.device.wait(0.02)  # 1 PLC integration
+            return "%+.8EVDC,+0.000SECS,+0RDNG#" % self.device.device_voltage()
+
+
+class SimulatedKeysight53230a(SimulatedResource):
+    def __init__(self, resource_name, **kwargs):
+        SimulatedResource.__init__(self, resource_name, **kwargs)
+        self.gate_time = 0.1
+        self.sample_count = 1
+        self.level = 0.05
+        self.memory = []
+
+    def gates(self):
+        self.device.wait(self.gate_time * self.sample_count)
+        if self.level > self.device.pulse_amplitude:
+            return np.zeros(self.sample_count)
+        return self.device.counts(self.gate_time, self.sample_count)
+
+    def handle(self, command):
+        if "GATE:TIME" in command:
+            self.gate_time = number(command)
+        elif command.startswith("SAMP:COUN"):
+            self.sample_count = int(number(command))
+        elif ":LEV" in command and "AUTO" not in command:
+            self.level = number(command)
+        elif command == "*RST":
+            self.gate_time, self.sample_count = 0.1, 1
+        elif command in (":READ?", "READ?"):
+            return ",".join("%+.14E" % c for c in self.gates())
+        elif command == "INIT":
+            self.memory = list(self.gates())
+        elif command == "*OPC?":
+            return "1"
+        elif command == "R?":
+            data = ",".join("%+.14E" % c for c in self.memory)
+            self.memory = []
+            return "#%d%d%s" % (len(str(len(data))), len(data), data)
+
+
+class SimulatedLeCroy620Zi(SimulatedResource):
+    """Single and sequence acquisitions of the device pulses, read back with
+    WAVEFORM? ALL/DAT1 in the WAVEDESC layout of the LeCroy driver"""
+
+    vgain = 1e-5  # Volts per ADC code
+
+    def __init__(self, resource_name, **kwargs):
+        SimulatedResource.__init__(self, resource_name, **kwargs)
+        self.settings = {
+            "app.Acquisition.TriggerMode": "Stopped",
+            "app.Acquisition.Horizontal.SampleMode": "RealTime",
+            "app.Acquisition.Horizontal.NumSegments": "1",
+        }
+        self.armed_at = None
+        self.acquire_time = 0.0
+        self.inr = 0
+        self.record = None
+        self.memories = {}
+
+    def segments(self):
+        if self.settings["app.Acquisition.Horizontal.SampleMode"] != "Sequence":
+            return 1
+        return int(float(self.settings["app.Acquisition.Horizontal.NumSegments"]))
+
+    def arm(self):
+        rate = max(self.device.count_rate(), 1.0)
+        self.acquire_time = self.segments() / rate
+        self.armed_at = time.time()
+
+    def check_acquisition(self):
+        if self.armed_at is None:
+            return
+        if time.time() - self.armed_at < self.acquire_time * self.device.time_scale:
+            return
+        with self.device.lock:
+            self.device.stats["instrument_time"] += self.acquire_time
+        self.record = self.device.pulses(
+            self.segments(), self.device.trace_points, self.device.sample_interval
+        )
+        self.inr |= 1
+        if self.settings["app.Acquisition.TriggerMode"] == "Single":
+            self.settings["app.Acquisition.TriggerMode"] = "Stopped"
+            self.armed_at = None
+        else:
+            self.arm()
+
+    def waveform(self, source, part):
+        self.check_acquisition()
+        record = self.memories.get(source, self.record)
+        if record is None:
+            record = self.device.pulses(
+                self.segments(), self.device.trace_points, self.device.sample_interval
+            )
+        x0, y, trigtime = record
+        data = np.clip(np.round(y / self.vgain), -32768, 32767).astype("<i2")
+        data = data.tobytes()
+        if part == "DAT1":
+            block = data
+        else:
+            segments = y.shape[0]
+            trig = trigtime.astype("<f8").tobytes() if segments > 1 else b""
+            desc = bytearray(346)
+            desc[0:8] = b"WAVEDESC"
+            struct.pack_into("<hh", desc, 32, 1, 1)  # COMM_TYPE word, LOFIRST
+            struct.pack_into(
+                "<llllllll", desc, 36, 346, 0, 0, len(trig), 0, 0, len(data), 0
+            )
+            struct.pack_into("<l", desc, 144, segments)
+            struct.pack_into("<ff", desc, 156, self.vgain, 0.0)
+            struct.pack_into("<f", desc, 176, self.device.sample_interval)
+            struct.pack_into("<d", desc, 180, x0)
+            block = bytes(desc) + trig + data
+        return b"%s,#9%09d" % (part.encode(), len(block)) + block + b"\n"
+
+    def handle(self, command):
+        m = re.match(r"VBS '(app\.[\w.]+) = \"?([^\"]*)\"?'", command)
+        if m:
+            self.settings[m.group(1)] = m.group(2)
+            if m.group(1) == "app.Acquisition.TriggerMode":
+                if m.group(2) in ("Single", "Normal", "Auto"):
+                    self.arm()
+                else:
+                    self.armed_at = None
+            return None
+        m = re.match(r"VBS\? 'return = (app\.[\w.]+)'", command)
+        if m:
+            self.check_acquisition()
+            return self.settings.get(m.group(1), "0")
+        if command == "INR?":
+            self.check_acquisition()
+            inr, self.inr = self.inr, 0
+            return str(inr)
+        if command == "*OPC?":
+            return "1"
+        m = re.match(r"STORE (\w+),(\w+)", command)
+        if m:
+            self.check_acquisition()
+            self.memories[m.group(2)] = self.memories.get(m.group(1), self.record)
+            return None
+        m = re.match(r"(\w+):WAVEFORM\? (ALL|DAT1)", command)
+        if m:
+            return self.waveform(m.group(1), m.group(2))
+
+
+class SimulatedKeysightN5224a(SimulatedResource):
+    def __init__(self, resource_name, **kwargs):
+        SimulatedResource.__init__(self, resource_name, **kwargs)
+        self.start = 4.9e9
+        self.stop = 5.1e9
+        self.points = 201
+        self.if_bandwidth = 1e3
+
+    def frequencies(self):
+        return np.linspace(self.start, self.stop, self.points)
+
+    def handle(self, command):
+        if re.match(r"SENS\d*:FREQ:STAR ", command):
+            self.start = number(command.split()[1])
+        elif re.match(r"SENS\d*:FREQ:STOP ", command):
+            self.stop = number(command.split()[1])
+        elif re.match(r"SENS\d*:SWE:POIN ", command):
+            self.points = int(number(command.split()[1]))
+        elif re.match(r"SENS\d*:BAND ", command):
+            self.if_bandwidth = number(command.split()[1])
+        elif re.match(r"SENS\d*:SWE:MODE SING", command):
+            self.device.wait(self.points / self.if_bandwidth)
+        elif re.match(r"SENS\d*:SWE:MODE\?", command):
+            return "HOLD"
+        elif re.match(r"CALC\d*:X\?", command):
+            return ",".join("%.10e" % f for f in self.frequencies())
+        elif re.match(r"CALC\d*:DATA\? SDATA", command):
+            s = self.device.s21(self.frequencies())
+            noise = self.device.rng.normal(0, 1e-3, (len(s), 2))
+            s = s + noise[:, 0] + 1j * noise[:, 1]
+            return ",".join("%.6e,%.6e" % (v.real, v.imag) for v in s)
+
+
+class SimulatedLakeshore336(SimulatedResource):
+    def handle(self, command):
+        if command.startswith("KRDG?"):
+            t = self.device.temperature + self.device.rng.normal(0, 1e-4)
+            return "%+08.4f" % t
+
+
+class SimulatedJDSHA9(SimulatedResource):
+    def handle(self, command):
+        if command.startswith("ATT"):
+            with self.device.lock:
+                self.device.attenuation_db = number(command)
+        elif command.startswith("D "):
+            with self.device.lock:
+                self.device.beam_block = bool(int(number(command)))
+
+
+models = {
+    "SIM928": SimulatedSIM928,
+    "YOKOGAWAGS200": SimulatedYokogawaGS200,
+    "KEITHLEY2700": SimulatedKeithley2700,
+    "KEYSIGHT53230A": SimulatedKeysight53230a,
+    "LECROY620ZI": SimulatedLeCroy620Zi,
+    "KEYSIGHTN5224A": SimulatedKeysightN5224a,
+    "LAKESHORE336": SimulatedLakeshore336,
+    "JDSHA9": SimulatedJDSHA9,
+}
+
+
+def open_simulated(visa_name, **kwargs):
+    """Opens SIM::<model>[::anything], see models"""
+    model = visa_name.split("::")[1].upper()
+    if model not in models:
+        raise NameError(
+            "No simulated %s. Simulated models: %s" % (model, ", ".join(models))
+        )
+    return models[model](visa_name, **kwargs)
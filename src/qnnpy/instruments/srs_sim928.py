@@ -1,26 +1,16 @@
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class SIM928(object):
+class SIM928(VisaInstrument):
     """Python class for SRS SIM928 Isolated Voltage Source inside a SIM900"""
 
     def __init__(self, visa_name, sim900port):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
         self.sim900port = sim900port
         # Anything else here that needs to happen on initialization
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def write_simport(self, message):
         write_str = "SNDT " + str(self.sim900port) + ',"' + message + '"'
         # print write_str
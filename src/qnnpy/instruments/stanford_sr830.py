@@ -1,10 +1,9 @@
-import pyvisa
+from qnnpy.instruments.visa_transport import VisaInstrument
 
 
-class StanfordSR830(object):
+class StanfordSR830(VisaInstrument):
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         self.pyvisa.write("OUTX 1")
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
@@ -5,30 +5,18 @@ Created on Feb 26, 2020
 """
 
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class RSA5126A(object):
+
+class RSA5126A(VisaInstrument):
     """Python class for TEKTRONIX RSA5126A, written by Di Zhu."""
 
     def __init__(self, visa_name, timeout=15000):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = timeout  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
-    def query_binary_values(self, string):
-        return self.pyvisa.query_binary_values(string)
-
     def idn(self):
         return self.query("*IDN?")
 
@@ -1,25 +1,16 @@
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class ThorlabsPM100D(object):
+
+class ThorlabsPM100D(VisaInstrument):
     """Python class for Thorlabs PM100, written by Adam McCaughan."""
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name, read_termination="\n")
+        super().__init__(visa_name, read_termination="\n")
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
         self.set_wavelength(1550)
@@ -1,8 +1,9 @@
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class ThorlabsPM101A(object):
+
+class ThorlabsPM101A(VisaInstrument):
     """Python class for Thorlabs PM101A, written by Di Zhu.
     PM101A shares most of the SCIP commands as PM100D.
     One difference is the way it sets unit. In PM100D, it's POW:DC:UNIT, but PM101A uses SENS:POW:DC:UNIT
@@ -10,20 +11,10 @@ class ThorlabsPM101A(object):
     """
 
     def __init__(self, visa_name):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name, read_termination="\n")
+        super().__init__(visa_name, read_termination="\n")
         self.pyvisa.timeout = 5000  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def reset(self):
         self.write("*RST")
         self.set_wavelength(1550.0)
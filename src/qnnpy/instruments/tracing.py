@@ -0,0 +1,256 @@
+"""Opt-in tracing of the VISA traffic of the drivers.
+
+When tracing is on, every write/query/read/read_raw of a VisaInstrument is
+recorded (resource, driver method, command, bytes, latency) in a ring
+buffer.  qf.save and qf.data_saver write the events of each measurement
+next to the data:
+
+    <file>_visa.json        totals by command, latency histograms
+    <file>_visa_trace.json  timeline, open in chrome://tracing or Perfetto
+
+Turn it on with a "Tracing" entry in the yaml file, e.g.
+
+    Tracing:
+        buffer_size: 100000
+        slow_ms: 50         # print commands slower than this
+
+or from python with tracing.enable(), and print_summary() to see where a
+loop spends its time.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+Event = namedtuple(
+    "Event",
+    "start duration resource op command caller sent received thread error",
+)
+
+events = None  # deque of Event while tracing is on
+slow_threshold = None  # s
+recorded = 0  # events recorded since enable(), including the dropped ones
+taken = 0  # value of recorded at the last take()
+origin = 0.0  # perf_counter at enable(), time zero of the timeline
+trace_lock = threading.Lock()
+
+# latency histogram bin edges, 10 us to 100 s
+histogram_edges = np.logspace(-5, 2, 29)
+number_pattern = re.compile(r"(?<![A-Za-z_])[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?")
+
+
+def enable(buffer_size=100000, slow_ms=None):
+    """Starts recording, keeping the last buffer_size events"""
+    global events, slow_threshold, recorded, taken, origin
+    with trace_lock:
+        events = deque(maxlen=buffer_size)
+        slow_threshold = None if slow_ms is None else slow_ms * 1e-3
+        recorded = 0
+        taken = 0
+        origin = time.perf_counter()
+
+
+def disable():
+    global events
+    with trace_lock:
+        events = None
+
+
+def enabled():
+    return events is not None
+
+
+def record(start, resource, op, command, caller, sent, received, error=None):
+    """Called by VisaInstrument after each transaction, start is the
+    perf_counter value before it"""
+    global recorded
+    duration = time.perf_counter() - start
+    event = Event(
+        start - origin,
+        duration,
+        resource,
+        op,
+        command,
+        caller,
+        sent,
+        received,
+        threading.current_thread().name,
+        error,
+    )
+    with trace_lock:
+        if events is None:
+            return
+        events.append(event)
+        recorded += 1
+    if slow_threshold is not None and duration > slow_threshold:
+        print(
+            "Slow VISA %s on %s: %r took %0.1f ms (%s)"
+            % (op, resource, command, duration * 1e3, caller)
+        )
+
+
+def take():
+    """Returns the events recorded since the previous take(), so each saved
+    measurement gets its own, or None when tracing is off"""
+    global taken
+    with trace_lock:
+        if events is None:
+            return None
+        new = min(recorded - taken, len(events))
+        taken = recorded
+        return list(events)[len(events) - new :]
+
+
+def snapshot():
+    """All events in the buffer, without moving the take() mark"""
+    with trace_lock:
+        return [] if events is None else list(events)
+
+
+def command_key(command):
+    """Command with its numbers replaced by #, so VOLT 0.1 and VOLT 0.2 are
+    counted together"""
+    if command is None:
+        return ""
+    return number_pattern.sub("#", command.strip())
+
+
+def summary(events):
+    """Totals by command and resource and latency histograms of events"""
+    if not events:
+        return {"events": 0}
+    durations = np.array([e.duration for e in events])
+    span = max(e.start + e.duration for e in events) - min(e.start for e in events)
+    commands = {}
+    resources = {}
+    for e in events:
+        key = (e.resource, e.caller, e.op, command_key(e.command))
+        entry = commands.setdefault(
+            key,
+            {
+                "resource": e.resource,
+                "caller": e.caller,
+                "op": e.op,
+                "command": key[3],
+                "count": 0,
+                "total_s": 0.0,
+                "max_ms": 0.0,
+                "sent": 0,
+                "received": 0,
+                "errors": 0,
+                "slow": 0,
+            },
+        )
+        entry["count"] += 1
+        entry["total_s"] += e.duration
+        entry["max_ms"] = max(entry["max_ms"], e.duration * 1e3)
+        entry["sent"] += e.sent
+        entry["received"] += e.received
+        entry["errors"] += e.error is not None
+        if slow_threshold is not None and e.duration > slow_threshold:
+            entry["slow"] += 1
+        resource = resources.setdefault(e.resource, {"count": 0, "total_s": 0.0})
+        resource["count"] += 1
+        resource["total_s"] += e.duration
+    for entry in commands.values():
+        entry["mean_ms"] = entry["total_s"] / entry["count"] * 1e3
+    histograms = {}
+    for op in sorted(set(e.op for e in events)):
+        d = [e.duration for e in events if e.op == op]
+        histograms[op] = np.histogram(d, histogram_edges)[0].tolist()
+    return {
+        "events": len(events),
+        "span_s": span,
+        "visa_s": float(durations.sum()),
+        "visa_fraction": float(durations.sum() / span) if span > 0 else 1.0,
+        "latency_ms": {
+            "mean": float(durations.mean() * 1e3),
+            "median": float(np.median(durations) * 1e3),
+            "p99": float(np.percentile(durations, 99) * 1e3),
+            "max": float(durations.max() * 1e3),
+        },
+        "by_command": sorted(commands.values(), key=lambda c: -c["total_s"]),
+        "by_resource": resources,
+        "histogram_edges_ms": (histogram_edges * 1e3).tolist(),
+        "histograms": histograms,
+    }
+
+
+def chrome_trace(events):
+    """events in the chrome trace event format, one row per resource"""
+    rows = {}
+    trace = []
+    for e in events:
+        if e.resource not in rows:
+            rows[e.resource] = len(rows) + 1
+            trace.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": rows[e.resource],
+                    "args": {"name": e.resource},
+                }
+            )
+        args = {"caller": e.caller, "sent": e.sent, "received": e.received}
+        if e.error is not None:
+            args["error"] = e.error
+        trace.append(
+            {
+                "name": e.command if e.command is not None else e.op,
+                "cat": e.op,
+                "ph": "X",
+                "ts": e.start * 1e6,
+                "dur": e.duration * 1e6,
+                "pid": 1,
+                "tid": rows[e.resource],
+                "args": dict(args, thread=e.thread),
+            }
+        )
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def write(path, events):
+    """Writes path_visa.json and path_visa_trace.json"""
+    if not events:
+        return
+    with open(path + "_visa.json", "w") as f:
+        json.dump(summary(events), f, indent=1)
+    with open(path + "_visa_trace.json", "w") as f:
+        json.dump(chrome_trace(events), f)
+
+
+def print_summary(events=None, top=10):
+    """Prints the commands that took the most time, events defaults to
+    everything in the buffer"""
+    s = summary(snapshot() if events is None else events)
+    if not s["events"]:
+        print("No VISA events recorded")
+        return
+    print(
+        "%d VISA transactions, %0.3f s of %0.3f s (%0.0f%%), median %0.2f ms"
+        % (
+            s["events"],
+            s["visa_s"],
+            s["span_s"],
+            100 * s["visa_fraction"],
+            s["latency_ms"]["median"],
+        )
+    )
+    for c in s["by_command"][:top]:
+        print(
+            "%8.3f s %6d x %8.2f ms  %-5s %-30s %s (%s)"
+            % (
+                c["total_s"],
+                c["count"],
+                c["mean_ms"],
+                c["op"],
+                c["command"][:30],
+                c["caller"],
+                c["resource"],
+            )
+        )
@@ -0,0 +1,308 @@
+"""Shared VISA transport for the instrument drivers.
+
+Drivers derive from VisaInstrument, which opens the resource through one
+cached pyvisa ResourceManager and guards it with a lock per VISA resource,
+so an instrument can be used from several threads.  Slow calls can be run
+on a shared thread pool, either with submit() (returns a Future) or from
+asyncio with the a* methods, e.g. reading a meter, a temperature controller
+and a scope in the same sweep step:
+
+    v, t, trace = run_concurrently(
+        meter.read_voltage, temp.read_temp, (scope.get_wf_data, "C1")
+    )
+or
+    v, t = await asyncio.gather(
+        meter.arun(meter.read_voltage), temp.aquery("KRDG? A")
+    )
+"""
+
+import asyncio
+import atexit
+import functools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pyvisa
+
+from qnnpy.instruments import tracing
+
+transport_lock = threading.Lock()
+resource_managers = {}  # visa library -> ResourceManager
+resource_locks = {}  # normalized resource name -> RLock
+resource_states = {}  # normalized resource name -> {command header: last write}
+executor_instance = None
+executor_workers = 16
+
+
+def resource_manager(visa_library=""):
+    """Returns the ResourceManager of visa_library, created on first use.
+    Starting a ResourceManager loads the VISA library, so it is shared by
+    every driver instead of being created in each constructor"""
+    with transport_lock:
+        if visa_library not in resource_managers:
+            resource_managers[visa_library] = pyvisa.ResourceManager(visa_library)
+        return resource_managers[visa_library]
+
+
+def resource_key(visa_name):
+    """GPIB0::5 and gpib0::5::INSTR are the same resource"""
+    key = visa_name.strip().upper()
+    if key.endswith("::INSTR"):
+        key = key[: -len("::INSTR")]
+    return key
+
+
+def resource_lock(visa_name):
+    """Lock shared by every driver talking to visa_name, e.g. several SIM928
+    modules in one SIM900 mainframe"""
+    key = resource_key(visa_name)
+    with transport_lock:
+        if key not in resource_locks:
+            resource_locks[key] = threading.RLock()
+        return resource_locks[key]
+
+
+def resource_state(visa_name):
+    """Last write of each cached setter of visa_name, shared by every driver
+    talking to it like the lock"""
+    key = resource_key(visa_name)
+    with transport_lock:
+        return resource_states.setdefault(key, {})
+
+
+def short_mnemonic(node):
+    """SCPI short form of one header node: 'PRESet' -> 'PRES', 'input1' ->
+    'INP1', 'TIMed' -> 'TIM'.  Long forms are cut to 4 characters, 3 if the
+    4th is a vowel, numeric suffixes and a trailing ? are kept"""
+    node = node.upper()
+    query = "?" if node.endswith("?") else ""
+    node = node.rstrip("?")
+    name = node.rstrip("0123456789")
+    suffix = node[len(name) :]
+    if len(name) > 4 and not name.startswith("*"):
+        name = name[:3] if name[3] in "AEIOU" else name[:4]
+    return name + suffix + query
+
+
+def command_header(command):
+    """':SENSe:TOTalize:GATE:TIME 0.100' -> 'TOT:GATE:TIME'.  Every node is
+    reduced to its uppercase short form and the optional SENSe root is
+    dropped, so SENS:FUNC, sense:function and FUNC are the same setting"""
+    words = command.strip().split(None, 1)
+    return short_header(words[0]) if words else ""
+
+
+@functools.lru_cache(maxsize=1024)
+def short_header(header):
+    nodes = [short_mnemonic(node) for node in header.lstrip(":").split(":")]
+    if len(nodes) > 1 and nodes[0] == "SENS":
+        nodes = nodes[1:]
+    return ":".join(nodes)
+
+
+@functools.lru_cache(maxsize=None)
+def command_headers(commands):
+    """command_header of every entry of cached_commands/reset_commands"""
+    return tuple(command_header(command) for command in commands)
+
+
+def error_code(reply):
+    """Code of a SYST:ERR? reply ('+0,"No error"' -> 0), None if unreadable"""
+    try:
+        return int(reply.split(",", 1)[0])
+    except ValueError:
+        return None
+
+
+def open_resource(visa_name, **kwargs):
+    """Opens visa_name with the shared ResourceManager, kwargs go to
+    ResourceManager.open_resource (read_termination, baud_rate, ...).
+    SIM::<model> names open a simulated instrument, see simulated.py"""
+    if resource_key(visa_name).startswith("SIM::"):
+        from qnnpy.instruments.simulated import open_simulated
+
+        return open_simulated(visa_name, **kwargs)
+    return resource_manager().open_resource(visa_name, **kwargs)
+
+
+def executor():
+    """Thread pool used for submit(), the a* methods and run_concurrently"""
+    global executor_instance
+    with transport_lock:
+        if executor_instance is None:
+            executor_instance = ThreadPoolExecutor(
+                max_workers=executor_workers, thread_name_prefix="visa"
+            )
+            atexit.register(executor_instance.shutdown)
+        return executor_instance
+
+
+def run_concurrently(*calls):
+    """Runs calls on the shared thread pool and returns their results in
+    order.  A call is a function or a tuple (function, *args).  Bound methods
+    of a VisaInstrument hold that instrument's lock while they run"""
+    futures = []
+    for call in calls:
+        function, *args = call if isinstance(call, tuple) else (call,)
+        instrument = getattr(function, "__self__", None)
+        if isinstance(instrument, VisaInstrument):
+            futures.append(instrument.submit(function, *args))
+        else:
+            futures.append(executor().submit(function, *args))
+    return [future.result() for future in futures]
+
+
+class VisaInstrument(object):
+    """Base class of the VISA instrument drivers.
+
+    self.pyvisa is the open resource and self.lock the lock of that resource.
+    write/read/query hold the lock for one transaction, submit() and arun()
+    hold it for a whole driver method so multi-command sequences are not
+    interleaved with other threads.  With tracing on (see tracing.py) they
+    also record every transaction.
+
+    Drivers list the headers of idempotent setters in cached_commands.  A
+    write of one of them is skipped when it repeats the last write of that
+    header, so hot loops can call set_trigger() etc. every iteration.
+    Headers are compared in their short uppercase form (see command_header).
+    The cache is cleared by the reset_commands (*RST, CONF, ...), by a
+    SYST:ERR? query that returns an error, reconnect() and invalidate().
+    Writes are remembered without checking the error queue (that would cost
+    the round trip the cache saves), so call invalidate() after a setter
+    the instrument rejected, after changing settings on the front panel or
+    through self.pyvisa directly."""
+
+    cached_commands = ()
+    reset_commands = ("*RST", "*RCL", "SYST:PRES", "CONF")
+
+    def __init__(self, visa_name, **kwargs):
+        self.visa_name = visa_name
+        self.visa_kwargs = kwargs
+        self.lock = resource_lock(visa_name)
+        self.state = resource_state(visa_name)
+        self.pyvisa = open_resource(visa_name, **kwargs)
+
+    def invalidate(self):
+        """Forgets the cached settings, the next write of each is sent"""
+        with self.lock:
+            self.state.clear()
+
+    def read(self):
+        with self.lock:
+            if tracing.events is None:
+                return self.pyvisa.read()
+            return self._traced("read", None, self.pyvisa.read)
+
+    def read_raw(self):
+        with self.lock:
+            if tracing.events is None:
+                return self.pyvisa.read_raw()
+            return self._traced("read_raw", None, self.pyvisa.read_raw)
+
+    def write(self, string):
+        with self.lock:
+            header = None
+            if self.cached_commands:
+                header = command_header(string)
+                if self.state.get(header) == string:
+                    return
+            if tracing.events is None:
+                self.pyvisa.write(string)
+            else:
+                self._traced("write", string, self.pyvisa.write, string)
+            if header is not None:
+                self._remember(header, string)
+
+    def _remember(self, header, string):
+        if header in command_headers(self.cached_commands):
+            self.state[header] = string
+        elif header.startswith(command_headers(self.reset_commands)):
+            self.state.clear()
+
+    def query(self, string):
+        with self.lock:
+            header = None
+            if self.state:
+                header = command_header(string)
+                self._remember(header, None)
+            if tracing.events is None:
+                reply = self.pyvisa.query(string)
+            else:
+                reply = self._traced("query", string, self.pyvisa.query, string)
+            if header == "SYST:ERR?" and error_code(reply) != 0:
+                # an error is queued, a cached setter may not have been applied
+                self.state.clear()
+            return reply
+
+    def query_binary_values(self, string, **kwargs):
+        """pyvisa query_binary_values (IEEE 488.2 block reply, ie: waveform
+        data) under the lock and traced like query().  kwargs go to pyvisa
+        (datatype, is_big_endian, container, ...)"""
+        with self.lock:
+            if self.state:
+                self._remember(command_header(string), None)
+            function = functools.partial(self.pyvisa.query_binary_values, **kwargs)
+            if tracing.events is None:
+                return function(string)
+            return self._traced("query", string, function, string)
+
+    def _traced(self, op, command, function, *args):
+        # Frame 0 is this method, 1 read/write/query, 2 the driver method
+        frame = sys._getframe(2)
+        caller = "%s.%s" % (type(self).__name__, frame.f_code.co_name)
+        sent = 0 if command is None else len(command)
+        start = time.perf_counter()
+        try:
+            reply = function(*args)
+        except Exception as e:
+            tracing.record(start, self.visa_name, op, command, caller, sent, 0, repr(e))
+            raise
+        if isinstance(reply, (str, bytes)):
+            received = len(reply)
+        else:  # binary values
+            received = getattr(reply, "nbytes", 0)
+        tracing.record(start, self.visa_name, op, command, caller, sent, received)
+        return reply
+
+    def close(self):
+        with self.lock:
+            self.pyvisa.close()
+
+    def reconnect(self):
+        """Closes and reopens the resource, keeping its timeout"""
+        with self.lock:
+            self.state.clear()
+            timeout = self.pyvisa.timeout
+            try:
+                self.pyvisa.close()
+            except Exception:
+                pass
+            self.pyvisa = open_resource(self.visa_name, **self.visa_kwargs)
+            self.pyvisa.timeout = timeout
+
+    def locked(self, function, *args, **kwargs):
+        with self.lock:
+            return function(*args, **kwargs)
+
+    def submit(self, function, *args, **kwargs):
+        """Runs function(*args, **kwargs) on the shared thread pool while
+        holding this instrument's lock, returns a Future"""
+        return executor().submit(self.locked, function, *args, **kwargs)
+
+    async def arun(self, function, *args, **kwargs):
+        """Awaitable version of submit()"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor(), functools.partial(self.locked, function, *args, **kwargs)
+        )
+
+    async def aread(self):
+        return await self.arun(self.read)
+
+    async def awrite(self, string):
+        return await self.arun(self.write, string)
+
+    async def aquery(self, string):
+        return await self.arun(self.query, string)
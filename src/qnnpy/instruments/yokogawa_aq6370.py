@@ -8,27 +8,18 @@ Created on Fri Dec 27 2019
 from time import sleep
 
 import numpy as np
-import pyvisa
 
+from qnnpy.instruments.visa_transport import VisaInstrument
 
-class AQ6370(object):
+
+class AQ6370(VisaInstrument):
     """Python class for YOKOGAWA AQ6370 OSA, written by Di Zhu."""
 
     def __init__(self, visa_name, timeout=15000):
-        rm = pyvisa.ResourceManager()
-        self.pyvisa = rm.open_resource(visa_name)
+        super().__init__(visa_name)
         self.pyvisa.timeout = timeout  # Set response timeout (in milliseconds)
         # self.pyvisa.query_delay = 1 # Set extra delay time between write and read commands
 
-    def read(self):
-        return self.pyvisa.read()
-
-    def write(self, string):
-        self.pyvisa.write(string)
-
-    def query(self, string):
-        return self.pyvisa.query(string)
-
     def idn(self):
         return self.query("*IDN?").strip()
 
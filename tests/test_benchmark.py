@@ -0,0 +1,18 @@
+"""Runs the hardware-free benchmark cases on the simulated instruments and
+checks the import budget of qnnpy.functions.functions, see
+qnnpy/functions/benchmark.py"""
+
+import pytest
+from qnnpy.functions import benchmark
+
+
+@pytest.mark.parametrize("name", sorted(benchmark.cases))
+def test_benchmark_case(name):
+    result = benchmark.run_case(name, 20, latency=0, memory=False)
+    assert result["points"] >= 20
+    assert result["transactions"] > 0
+    assert result["overhead_s"] > 0
+
+
+def test_import_budget():
+    assert benchmark.check_imports() == []
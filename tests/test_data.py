@@ -0,0 +1,111 @@
+"""DataColumn and Data storage, see qnnpy/functions/functions.py"""
+
+import numpy as np
+import qnnpy.functions.functions as qf
+
+
+def test_column_grows_past_capacity():
+    col = qf.DataColumn(0.0, capacity=2)
+    for i in range(1, 100):
+        col.append(float(i))
+    assert len(col) == 100
+    assert col.dtype == np.float64
+    np.testing.assert_array_equal(col.values(), np.arange(100.0))
+
+
+def test_column_promotes_dtype():
+    col = qf.DataColumn(1)
+    col.append(2.5)
+    assert col.dtype == np.float64
+    np.testing.assert_array_equal(col.values(), [1.0, 2.5])
+
+
+def test_column_promotes_to_object():
+    col = qf.DataColumn(np.arange(3.0))
+    col.append(np.arange(3.0) + 1)
+    assert col.values().shape == (2, 3)
+    col.append(np.arange(5.0))  # ragged trace
+    assert col.dtype.kind == "O"
+    values = col.values()
+    assert values.shape == (3,)
+    np.testing.assert_array_equal(values[1], [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(values[2], np.arange(5.0))
+    col.append("text")
+    assert col.last() == "text"
+
+
+def test_column_missing_cells():
+    col = qf.DataColumn(1.5, missing=2)
+    col.append_missing()
+    col.append(3.5)
+    values = col.values()
+    assert isinstance(values, np.ma.MaskedArray)
+    assert values.mask.tolist() == [True, True, False, True, False]
+    assert col.tolist() == ["", "", 1.5, "", 3.5]
+    assert col.last() == 3.5
+    col.append_missing()
+    assert col.last() is np.ma.masked
+
+
+def test_column_export_fills_nan():
+    col = qf.DataColumn(3, missing=1)
+    exported = col.export()
+    assert exported.dtype == np.float64
+    assert np.isnan(exported[0]) and exported[1] == 3
+
+    col = qf.DataColumn(True)
+    col.append_missing()
+    exported = col.export()
+    assert exported.dtype == np.float64
+    assert exported[0] == 1 and np.isnan(exported[1])
+
+    col = qf.DataColumn("a")
+    col.append_missing()
+    assert col.export().tolist() == ["a", ""]
+
+
+def test_column_clear():
+    col = qf.DataColumn(1.0, missing=1)
+    col.clear()
+    assert len(col) == 0
+    assert not isinstance(col.values(), np.ma.MaskedArray)
+    col.append(2.0)
+    assert col.tolist() == [2.0]
+
+
+def test_data_store_and_get(tmp_path):
+    data = qf.Data(path=str(tmp_path))
+    for i in range(5):
+        data.store(i=i, v=i * 1e-3)
+    np.testing.assert_array_equal(data.get("i"), np.arange(5))
+    assert data.last("v") == 4e-3
+    assert list(data.to_dict()) == ["i", "v"]
+
+
+def test_data_preserve_pos_order():
+    data = qf.Data(preserve_pos_order=True)
+    data.store(v1=1, v2=2)
+    data.store(v2=3, v3=4)
+    assert list(data.rows()) == [(1, 2, ""), ("", 3, 4)]
+    exported = data.to_dict()
+    assert np.isnan(exported["v1"][1]) and np.isnan(exported["v3"][0])
+    assert data.last("v1") is np.ma.masked
+
+
+def test_data_legacy_lists():
+    data = qf.Data(preserve_pos_order=True, columnar=False)
+    data.store(v1=1, v2=2)
+    data.store(v2=3, v3=4)
+    assert data.get("v2") == [2, 3]
+    assert data.last("v1") == ""
+    assert data.to_dict() == {"v1": [1, ""], "v2": [2, 3], "v3": ["", 4]}
+
+
+def test_data_csv(tmp_path):
+    path = str(tmp_path / "data.csv")
+    data = qf.Data(path=path)
+    data.store(i=1, v=0.5)
+    data.store(i=2, v=1.5)
+    data.save()
+    with open(path) as f:
+        assert f.read().split() == ["i,v", "1,0.5", "2,1.5"]
@@ -0,0 +1,171 @@
+"""Buffering, trimming, spill file and replay of DatabaseLogger, see
+qnnpy/functions/db.py. Runs against a fake connection, the mariadb module is
+replaced by its exception classes when it is not installed."""
+
+import importlib
+import importlib.util
+import json
+import sys
+import types
+
+import pytest
+
+
+def fake_mariadb():
+    mariadb = types.ModuleType("mariadb")
+    mariadb.Error = type("Error", (Exception,), {})
+    for name in ("DataError", "IntegrityError", "ProgrammingError"):
+        setattr(mariadb, name, type(name, (mariadb.Error,), {}))
+    mariadb.OperationalError = type("OperationalError", (mariadb.Error,), {})
+    mariadb.Connection = object
+    return mariadb
+
+
+@pytest.fixture
+def db():
+    fake = importlib.util.find_spec("mariadb") is None
+    names = ("mariadb", "qnnpy.functions.db")
+    modules = {name: sys.modules.get(name) for name in names}
+    if fake:
+        sys.modules["mariadb"] = fake_mariadb()
+        sys.modules.pop("qnnpy.functions.db", None)
+    try:
+        yield importlib.import_module("qnnpy.functions.db")
+    finally:
+        if fake:
+            for name, module in modules.items():
+                if module is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = module
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, command, row):
+        mariadb = sys.modules["mariadb"]
+        if self.connection.down:
+            raise mariadb.OperationalError("server has gone away")
+        if "bad" in row:
+            raise mariadb.DataError("incorrect value")
+        self.connection.pending.append((command.split("`")[1], tuple(row)))
+
+    def executemany(self, command, rows):
+        for row in rows:
+            self.execute(command, row)
+
+    def close(self):
+        pass
+
+
+class Connection:
+    """keeps committed rows as (table, row), rollback drops the others"""
+
+    def __init__(self):
+        self.down = False
+        self.closed = False
+        self.reconnects = 0
+        self.pending = []
+        self.rows = []
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self.rows += self.pending
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def reconnect(self):
+        self.reconnects += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_log_trims_oldest_rows(db):
+    conn = Connection()
+    conn.down = True
+    logger = db.DatabaseLogger(conn, batch_size=100, flush_interval=0, max_buffer=3)
+    logger.log("a", x=1)
+    for i in range(10):
+        logger.log("b", y=i)
+    assert logger.num_buffered == 3
+    assert logger.buffer == {("b", ("y",)): [(7,), (8,), (9,)]}
+
+
+def test_log_rows_trims_across_tables(db):
+    conn = Connection()
+    logger = db.DatabaseLogger(conn, batch_size=100, flush_interval=0, max_buffer=4)
+    logger.log_rows("a", ["x"], [(1,), (2,)])
+    logger.log_rows("b", ["y"], [(3,), (4,), (5,)])
+    assert logger.num_buffered == 4
+    assert logger.buffer == {("a", ("x",)): [(2,)], ("b", ("y",)): [(3,), (4,), (5,)]}
+
+
+def test_batches(db):
+    conn = Connection()
+    logger = db.DatabaseLogger(conn, batch_size=3, flush_interval=0)
+    logger.log("t", x=1)
+    logger.log("t", x=2)
+    assert conn.rows == []
+    assert logger.log("t", x=3)
+    assert conn.rows == [("t", (1,)), ("t", (2,)), ("t", (3,))]
+    assert logger.num_buffered == 0
+
+
+def test_external_connection_is_kept_open(db):
+    conn = Connection()
+    conn.down = True
+    logger = db.DatabaseLogger(conn, batch_size=100, flush_interval=0)
+    logger.log("t", x=1)
+    assert not logger.flush()
+    assert not conn.closed
+    assert conn.reconnects >= 1
+    conn.down = False
+    assert logger.flush()
+    assert conn.rows == [("t", (1,))]
+    logger.close()
+    assert not conn.closed
+
+
+def test_rejected_rows_without_spill_file(db):
+    conn = Connection()
+    logger = db.DatabaseLogger(conn, batch_size=100, flush_interval=0)
+    logger.log("t", x=1)
+    logger.log("t", x="bad")
+    logger.log("t", x=2)
+    assert logger.flush()
+    assert conn.rows == [("t", (1,)), ("t", (2,))]
+    logger.log("t", x=3)
+    assert logger.flush()
+    assert conn.rows[-1] == ("t", (3,))
+
+
+def test_spill_and_replay(db, tmp_path):
+    spill_file = str(tmp_path / "spill.jsonl")
+    conn = Connection()
+    conn.down = True
+    logger = db.DatabaseLogger(
+        conn, batch_size=100, flush_interval=0, spill_file=spill_file
+    )
+    logger.log("t", x=1)
+    logger.log("t", x="bad")
+    logger.log("u", y=2)
+    assert not logger.flush()
+    assert logger.num_buffered == 0
+    with open(spill_file) as f:
+        assert len(f.readlines()) == 3
+
+    conn.down = False
+    logger.log("t", x=3)
+    assert logger.flush()
+    assert sorted(conn.rows) == [("t", (1,)), ("t", (3,)), ("u", (2,))]
+    assert not (tmp_path / "spill.jsonl").exists()
+    with open(spill_file + ".rejected") as f:
+        rejected = [json.loads(line) for line in f]
+    assert [entry["row"] for entry in rejected] == [["bad"]]
@@ -0,0 +1,77 @@
+"""Appending to .h5 files, see append_hdf5 in qnnpy/functions/saving.py"""
+
+import numpy as np
+import pytest
+import qnnpy.functions.functions as qf
+
+pytest.importorskip("h5py")
+
+
+def test_round_trip(tmp_path):
+    file_name = str(tmp_path / "data.h5")
+    qf.append_hdf5(
+        file_name,
+        {"i": np.arange(3), "trace": np.ones((3, 4)), "name": ["a", "b", "c"]},
+    )
+    qf.append_hdf5(
+        file_name,
+        {"i": np.arange(3, 5), "trace": np.zeros((2, 4)), "name": ["d", "e"]},
+    )
+    data = qf.load_hdf5(file_name)
+    np.testing.assert_array_equal(data["i"], np.arange(5))
+    assert data["trace"].shape == (5, 4)
+    assert data["name"].tolist() == ["a", "b", "c", "d", "e"]
+
+
+def test_row_shape_mismatch(tmp_path):
+    file_name = str(tmp_path / "data.h5")
+    qf.append_hdf5(file_name, {"trace": np.ones((2, 4))})
+    with pytest.raises(ValueError):
+        qf.append_hdf5(file_name, {"trace": np.ones((2, 5))})
+
+
+def test_ragged_traces(tmp_path):
+    file_name = str(tmp_path / "data.h5")
+    traces = np.empty(3, dtype=object)
+    traces[:] = [np.arange(2.0), np.arange(5.0), ""]  # "" is a missing cell
+    qf.append_hdf5(file_name, {"trace": traces})
+    stored = qf.load_hdf5(file_name)["trace"]
+    np.testing.assert_array_equal(stored[1], np.arange(5.0))
+    assert len(stored[2]) == 0
+
+
+def test_unsupported_objects(tmp_path):
+    values = np.empty(2, dtype=object)
+    values[:] = [{"a": 1}, np.ones(2)]
+    with pytest.raises(TypeError):
+        qf.append_hdf5(str(tmp_path / "data.h5"), {"x": values})
+
+
+def test_int_promoted_for_nan(tmp_path):
+    file_name = str(tmp_path / "data.h5")
+    qf.append_hdf5(file_name, {"n": np.arange(2)})
+    qf.append_hdf5(file_name, {"n": np.array([np.nan, 3.0])})
+    n = qf.load_hdf5(file_name)["n"]
+    assert n.dtype == np.float64
+    assert n[1] == 1 and np.isnan(n[2])
+
+
+def test_new_key_mid_run(tmp_path):
+    """a key first stored after an autosave lines up with the other keys"""
+    data = qf.Data(
+        autosave=True,
+        save_increment=4,
+        path=str(tmp_path / "data.h5"),
+        preserve_pos_order=True,
+    )
+    for i in range(6):
+        if i < 5:
+            data.store(i=i)
+        else:
+            data.store(i=i, late=2.5, label="x")
+    data.save()
+    stored = qf.load_hdf5(str(tmp_path / "data.h5"))
+    np.testing.assert_array_equal(stored["i"], np.arange(6))
+    assert len(stored["late"]) == 6
+    assert np.isnan(stored["late"][:5]).all() and stored["late"][5] == 2.5
+    assert stored["label"].tolist() == [""] * 5 + ["x"]
@@ -0,0 +1,64 @@
+"""Isw/Ir analysis in one pass and streamed, see
+qnnpy/functions/iv_analysis.py"""
+
+import numpy as np
+import pytest
+import qnnpy.functions.functions as qf
+
+
+def iv_sweep(isw=20.5e-6, ir=4.5e-6, r_normal=1e4, i_hotspot=3e-6, noise=0):
+    """0 -> 30 uA -> 0 -> -30 uA -> 0 in 1 uA steps through a hysteretic
+    device: it switches above isw and retraps below ir"""
+    up = np.linspace(0, 30e-6, 31)
+    i = np.concatenate([up, up[::-1][1:]])
+    i = np.concatenate([i, -i[1:]])
+    v = np.zeros_like(i)
+    normal = False
+    for n, x in enumerate(i):
+        if abs(x) > isw:
+            normal = True
+        elif abs(x) < ir:
+            normal = False
+        if normal:
+            v[n] = np.sign(x) * r_normal * (abs(x) - i_hotspot)
+    v += noise * np.random.default_rng(0).standard_normal(len(v))
+    return i, v
+
+
+def test_analyze_iv():
+    i, v = iv_sweep()
+    result = qf.analyze_iv(i, v)
+    assert result["n_switch"][0] == 2 and result["n_retrap"][0] == 2
+    assert result["isw_avg"] == pytest.approx(20e-6)
+    assert result["ir_avg"] == pytest.approx(4e-6)
+    assert result["r_normal"][0] == pytest.approx(1e4)
+    assert result["i_hotspot"][0] == pytest.approx(3e-6)
+
+
+def test_sweeps_are_analyzed_separately():
+    sweeps = [iv_sweep(isw=isw) for isw in (15.5e-6, 20.5e-6, 25.5e-6)]
+    i = np.concatenate([s[0] for s in sweeps])
+    v = np.concatenate([s[1] for s in sweeps])
+    result = qf.analyze_iv(i, v, sweeps=3)
+    np.testing.assert_allclose(result["isw"], [15e-6, 20e-6, 25e-6])
+    assert result["isw_avg"] == pytest.approx(20e-6)
+
+
+def test_no_switch():
+    i = np.linspace(0, 10e-6, 11)
+    result = qf.analyze_iv(i, np.zeros_like(i))
+    assert result["n_switch"][0] == 0
+    assert np.isnan(result["isw"][0])
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 1000])
+def test_stream_matches_batch(chunk):
+    i, v = iv_sweep(noise=1e-3)
+    batch = qf.analyze_iv(i, v)
+    stream = qf.IvStream()
+    for start in range(0, len(i), chunk):
+        stream.update(i[start : start + chunk], v[start : start + chunk])
+    for key in ("isw", "ir", "n_switch", "n_retrap", "r_normal", "i_hotspot"):
+        assert getattr(stream, key) == pytest.approx(batch[key][0]), key
+    assert stream.points == len(i)
+    assert not stream.normal
@@ -0,0 +1,143 @@
+"""Chunked hardware list sweeps, see qnnpy/instruments/list_sweep.py"""
+
+import numpy as np
+import pytest
+from qnnpy.instruments.keysight_b2912a import KeysightB2912a
+from qnnpy.instruments.list_sweep import ListSweep
+
+
+class Sweep(ListSweep):
+    """takes per_poll points per count, sense = 2 * source. The chunk
+    numbered abort_chunk is stopped by the instrument after abort_at points"""
+
+    list_sweep_max_points = 100
+    list_sweep_command_points = 40
+
+    def __init__(self, per_poll=30, abort_chunk=None, abort_at=None, partial=True):
+        self.per_poll = per_poll
+        self.abort_chunk = abort_chunk
+        self.abort_at = abort_at
+        self.list_sweep_partial_fetch = partial
+        self.writes = []
+        self.chunks = []
+        self.fetches = []
+        self.finished = False
+
+    def write(self, command):
+        self.writes.append(command)
+
+    def limit(self):
+        if len(self.chunks) - 1 == self.abort_chunk:
+            return self.abort_at
+        return len(self.chunks[-1])
+
+    def list_sweep_load(self, values, delay):
+        self.list_sweep_values("SOUR:LIST:CURR", values)
+        self.chunks.append(values)
+        self.taken = 0
+
+    def list_sweep_start(self):
+        pass
+
+    def list_sweep_count(self):
+        self.taken = min(self.taken + self.per_poll, self.limit())
+        return self.taken
+
+    def list_sweep_running(self):
+        return self.taken < self.limit()
+
+    def list_sweep_fetch(self, start, stop):
+        self.fetches.append((start, stop))
+        values = self.chunks[-1][start:stop]
+        return values, 2 * values
+
+    def list_sweep_finish(self):
+        self.finished = True
+
+
+def test_chunks():
+    sweep = Sweep()
+    values = np.arange(250) * 1e-6
+    received = []
+    source, sense = sweep.list_sweep(
+        values, callback=lambda s, m: received.extend(s), poll_interval=0
+    )
+    np.testing.assert_array_equal(source, values)
+    np.testing.assert_array_equal(sense, 2 * values)
+    np.testing.assert_array_equal(received, values)
+    assert [len(chunk) for chunk in sweep.chunks] == [100, 100, 50]
+    assert sweep.finished
+
+
+def test_values_are_sent_in_blocks():
+    sweep = Sweep()
+    sweep.list_sweep_values("SOUR:LIST:CURR", np.arange(100.0))
+    assert [w.split()[0] for w in sweep.writes] == [
+        "SOUR:LIST:CURR",
+        "SOUR:LIST:CURR:APP",
+        "SOUR:LIST:CURR:APP",
+    ]
+    assert [len(w.split()[1].split(",")) for w in sweep.writes] == [40, 40, 20]
+
+
+def test_whole_buffer_fetch():
+    sweep = Sweep(partial=False)
+    source, sense = sweep.list_sweep(np.arange(250.0), poll_interval=0)
+    assert sweep.fetches == [(0, 100), (0, 100), (0, 50)]
+    np.testing.assert_array_equal(source, np.arange(250.0))
+
+
+def test_abort_returns_points_taken():
+    sweep = Sweep(abort_chunk=1, abort_at=30)
+    source, sense = sweep.list_sweep(np.arange(250.0), poll_interval=0.01)
+    np.testing.assert_array_equal(source, np.arange(130.0))
+    assert len(sweep.chunks) == 2
+    assert sweep.finished
+
+
+def test_stall_times_out():
+    sweep = Sweep(per_poll=0)
+    sweep.list_sweep_running = lambda: True
+    with pytest.raises(TimeoutError):
+        sweep.list_sweep(np.arange(10.0), poll_interval=0.01, timeout=0.1)
+    assert sweep.finished
+
+
+class FakeB2912a:
+    """buffer of a B2912A that stops acquiring after stop_at points"""
+
+    def __init__(self, stop_at):
+        self.stop_at = stop_at
+        self.count = 0
+        self.points = 0
+
+    def write(self, command):
+        if command.startswith(":TRAC:POIN "):
+            self.points = int(command.split()[1])
+        elif command.startswith(":INIT"):
+            self.count = 0
+
+    def query(self, command):
+        if command == ":TRAC:POIN:ACT?":
+            self.count = min(self.count + 50, self.stop_at, self.points)
+            return str(self.count)
+        if command == ":STAT:OPER:COND?":
+            idle = self.count >= min(self.stop_at, self.points)
+            return "18" if idle else "2"
+        if command.startswith(":TRAC:DATA?"):
+            start, size = (int(n) for n in command.split(None, 1)[1].split(","))
+            # VOLT,CURR pairs, the current is the sourced value
+            return ",".join(
+                "%e,%e" % (n * 1e-3, n * 1e-6) for n in range(start, start + size)
+            )
+        return "0"
+
+
+def test_b2912a_abort():
+    smu = KeysightB2912a.__new__(KeysightB2912a)
+    fake = FakeB2912a(stop_at=120)
+    smu.write, smu.query = fake.write, fake.query
+    smu.isrc = True
+    source, sense = smu.list_sweep(np.arange(200) * 1e-6, poll_interval=0.01)
+    np.testing.assert_allclose(source, np.arange(120) * 1e-6)
+    np.testing.assert_allclose(sense, np.arange(120) * 1e-3)
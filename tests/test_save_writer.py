@@ -0,0 +1,100 @@
+"""Background saves: retries, local spool and drain, see SaveWriter in
+qnnpy/functions/saving.py"""
+
+import os
+
+import numpy as np
+import pytest
+from qnnpy.functions import saving
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = saving.SaveWriter(
+        retries=3, backoff=0, spool_dir=str(tmp_path / "spool"), drain_interval=3600
+    )
+    yield writer
+    writer.flush()
+
+
+class Share:
+    """write job that fails with OSError until up is set"""
+
+    def __init__(self, root, failures=0):
+        self.root = str(root)
+        self.failures = failures
+        self.attempts = 0
+
+    def write(self, path):
+        if path.startswith(self.root):
+            self.attempts += 1
+            if self.failures:
+                self.failures -= 1
+                raise OSError("share not reachable")
+        for suffix in (".mat", "_visa.json"):
+            with open(path + suffix, "w") as f:
+                f.write(suffix)
+
+
+def test_retry(tmp_path, writer):
+    share = Share(tmp_path / "share", failures=2)
+    full_path = os.path.join(share.root, "a", "meas")
+    assert writer.submit(share.write, full_path, share.root).result() == full_path
+    assert share.attempts == 3
+    assert os.path.exists(full_path + ".mat")
+
+
+def test_spool_and_drain(tmp_path, writer):
+    share = Share(tmp_path / "share", failures=3)
+    full_path = os.path.join(share.root, "a", "meas")
+    spool_path = writer.submit(share.write, full_path, share.root).result()
+    assert spool_path == os.path.join(writer.spool_dir, "a", "meas")
+    assert os.path.exists(spool_path + ".mat")
+    assert not os.path.exists(full_path + ".mat")
+    # another save whose name starts with this one stays in the spool
+    other = spool_path + "_(1).mat"
+    with open(other, "w") as f:
+        f.write("other")
+
+    assert writer.drain_spool() == 0
+    assert os.path.exists(full_path + ".mat")
+    assert os.path.exists(full_path + "_visa.json")
+    assert not os.path.exists(spool_path + ".mat")
+    assert os.path.exists(other)
+    assert writer.drain_spool() == 0  # the manifest is empty now
+
+
+def test_drain_keeps_entries_while_share_is_down(tmp_path, writer, monkeypatch):
+    share = Share(tmp_path / "share", failures=3)
+    full_path = os.path.join(share.root, "meas")
+    spool_path = writer.submit(share.write, full_path, share.root).result()
+
+    def move(source, target):
+        raise OSError("share not reachable")
+
+    monkeypatch.setattr(saving.shutil, "move", move)
+    assert writer.drain_spool() == 1
+    monkeypatch.undo()
+    assert writer.drain_spool() == 0
+    assert os.path.exists(full_path + ".mat")
+    assert not os.path.exists(spool_path + ".mat")
+
+
+def test_background_save_returns_path(tmp_path, writer, monkeypatch):
+    monkeypatch.setattr(saving, "save_writer_instance", writer)
+    monkeypatch.setattr(saving, "visa_trace", lambda: None)
+    parameters = {
+        "Save Root": str(tmp_path),
+        "User": {"name": "user"},
+        "Save File": {
+            "sample name": "SPX1",
+            "device name": "A1",
+            "device type": "snspd",
+        },
+    }
+    data = {"x": np.arange(3)}
+    full_path, time_str = saving.save(parameters, "iv_sweep", data, background=True)
+    data["x"][0] = 10  # the queued save keeps its own copy
+    assert full_path.endswith(time_str)
+    assert writer.future(full_path).result() == full_path
+    assert saving.scipy.io.loadmat(full_path + ".mat")["x"].ravel()[0] == 0
@@ -0,0 +1,68 @@
+"""Setter cache of VisaInstrument, see qnnpy/instruments/visa_transport.py"""
+
+import threading
+
+import pytest
+from qnnpy.instruments.keithley_2700 import Keithley2700
+from qnnpy.instruments.visa_transport import command_header
+
+
+@pytest.mark.parametrize(
+    "command, header",
+    [
+        (":SENSe:TOTalize:GATE:TIME 0.1", "TOT:GATE:TIME"),
+        ("TOT:GATE:TIME 0.1", "TOT:GATE:TIME"),
+        ("SYSTEM:PRESET", "SYST:PRES"),
+        ("*rst", "*RST"),
+        ("input1:level 0.05", "INP1:LEV"),
+        ("SYSTem:ERRor?", "SYST:ERR?"),
+        ("R?", "R?"),
+    ],
+)
+def test_command_header(command, header):
+    assert command_header(command) == header
+
+
+class Resource:
+    def __init__(self, error='+0,"No error"'):
+        self.error = error
+        self.sent = []
+
+    def write(self, command):
+        self.sent.append(command)
+
+    def query(self, command):
+        self.sent.append(command)
+        return self.error if "ERR" in command.upper() else "1"
+
+
+def dmm(resource):
+    dmm = Keithley2700.__new__(Keithley2700)
+    dmm.pyvisa = resource
+    dmm.lock = threading.RLock()
+    dmm.state = {}
+    return dmm
+
+
+def test_long_and_short_forms_share_the_cache():
+    resource = Resource()
+    d = dmm(resource)
+    d.write("VOLTage:AVERage:COUNt 10")
+    assert list(d.state) == ["VOLT:AVER:COUN"]
+    d.write("VOLTage:AVERage:COUNt 10")
+    assert len(resource.sent) == 1
+    d.write("system:preset")
+    assert d.state == {}
+    d.write("VOLTage:AVERage:COUNt 10")
+    assert len(resource.sent) == 3
+
+
+def test_queued_error_clears_cache():
+    d = dmm(Resource())
+    d.write("VOLT:AVER:COUN 10")
+    d.query("SYST:ERR?")
+    assert d.state
+    d = dmm(Resource('-222,"Data out of range"'))
+    d.write("VOLT:AVER:COUN 1e9")
+    d.query("SYST:ERR?")
+    assert d.state == {}